@@ -0,0 +1,75 @@
+"""Compares the time taken to parse an interactions-sized GtoP response with
+each available JSON decoder, against the old approach of decoding the response
+to text and parsing that with the standard library.
+
+Run from the repository root with
+``python -m benchmarks.json_decoding [number of interactions]``."""
+
+import json
+import random
+import sys
+import time
+from pygtop import gtop
+
+def make_interactions(count):
+    """Returns a list of interaction dictionaries shaped like those from the
+    GtoP ``interactions`` endpoint."""
+
+    random.seed(0)
+    return [{
+     "interactionId": n,
+     "targetId": random.randint(1, 3000),
+     "ligandAsTargetId": 0,
+     "targetSpecies": random.choice(["Human", "Rat", "Mouse"]),
+     "primaryTarget": random.random() < 0.2,
+     "targetBindingSite": "",
+     "ligandId": random.randint(1, 10000),
+     "ligandContext": "",
+     "endogenous": random.random() < 0.1,
+     "type": "Agonist",
+     "action": "Full agonist",
+     "actionComment": "",
+     "selectivity": "None",
+     "concentrationRange": "-",
+     "affinity": "%.1f - %.1f" % (random.uniform(5, 7), random.uniform(7, 10)),
+     "affinityParameter": "pKi",
+     "originalAffinity": "6x10<sup>-8</sup>",
+     "originalAffinityType": "Ki",
+     "originalAffinityRelation": "",
+     "assayDescription": "Binding to human receptor expressed in HEK293 cells",
+     "assayConditions": "",
+     "useDependent": False,
+     "voltageDependent": False,
+     "voltage": "-",
+     "physiologicalVoltage": False,
+     "conciseView": False,
+     "dataPoints": [],
+     "refs": [random.randint(1, 50000) for _ in range(3)]
+    } for n in range(count)]
+
+
+def best_time(func, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(count):
+    body = json.dumps(make_interactions(count)).encode()
+    print("Payload: %i interactions, %.1f MB" % (count, len(body) / 1e6))
+    baseline = best_time(lambda: json.loads(body.decode("utf-8")))
+    print("%-28s %8.1f ms" % ("text + json (previous)", baseline * 1000))
+    for name in sorted(gtop.JSON_DECODERS):
+        decoder = gtop.JSON_DECODERS[name]
+        elapsed = best_time(lambda: decoder(body))
+        print("%-28s %8.1f ms  (%.1fx)" % (
+         "bytes + %s" % name, elapsed * 1000, baseline / elapsed
+        ))
+    print("Default decoder: %s" % gtop.json_decoder_default)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60000)
@@ -0,0 +1,53 @@
+"""Times some typical pyGtoP pipelines - fetching every ligand, hydrating a
+sample of them, and looking up their PDB structures - against a recording of
+the web services rather than the live ones, so that the results are
+reproducible and can be compared between changes.
+
+Record a cassette once, with network access, and then replay it as often as
+needed, from the repository root:
+
+``python -m benchmarks.pipelines record pipelines.json.gz``
+
+``python -m benchmarks.pipelines replay pipelines.json.gz [latency]``
+
+The latency is the number of seconds each replayed response is delayed by,
+or ``recorded`` to use the times taken when recording."""
+
+import sys
+import time
+import pygtop
+from pygtop import transport
+
+SAMPLE_SIZE = 20
+
+def run_pipelines():
+    timings = []
+    start = time.perf_counter()
+    ligands = pygtop.get_all_ligands()
+    timings.append(("get_all_ligands", time.perf_counter() - start))
+    sample = sorted(ligands, key=lambda ligand: ligand.ligand_id())[:SAMPLE_SIZE]
+
+    start = time.perf_counter()
+    for ligand in sample:
+        ligand.smiles(), ligand.synonyms(), ligand.database_links()
+    timings.append(("hydrate %i ligands" % len(sample), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for ligand in sample:
+        ligand.all_pdbs()
+    timings.append(("PDBs for %i ligands" % len(sample), time.perf_counter() - start))
+    return timings
+
+
+def main(mode, path, latency=None):
+    if latency is not None and latency != "recorded":
+        latency = float(latency)
+    with transport.use_cassette(path, mode=mode, latency=latency) as cassette:
+        timings = run_pipelines()
+    for name, elapsed in timings:
+        print("%-28s %8.1f ms" % (name, elapsed * 1000))
+    print("%s: %s" % (cassette, cassette.stats()))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:4])
@@ -2,6 +2,9 @@ from .ligands import *
 from .targets import *
 from .interactions import *
 from .exceptions import *
+from .transport import deadline
+from . import snapshot
+from .snapshot import use_snapshot
 
 __version__ = "2.1.3"
 __author__ = "Sam Ireland"
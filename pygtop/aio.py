@@ -0,0 +1,294 @@
+"""Asynchronous versions of the pyGtoP functions and objects, for use with
+asyncio.
+
+Every function and method here mirrors its synchronous counterpart, but
+anything which needs the web services must be awaited:
+
+    >>> from pygtop import aio
+    >>> ligand = await aio.get_ligand_by_id(5239)
+    >>> ligand.name()
+    'paracetamol'
+    >>> await ligand.smiles()
+    'CC(=O)Nc1ccc(cc1)O'
+
+Requests are run on a pool of worker threads which all share the
+:py:mod:`.transport` connection pool, so many sub-requests can be overlapped
+with ``asyncio.gather``. All parsing is done by the ordinary
+:py:class:`.Ligand`, :py:class:`.Target`, :py:class:`.TargetFamily` and
+:py:class:`.Interaction` classes, which these objects wrap."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import functools
+from . import ligands as _ligands
+from . import targets as _targets
+from . import interactions as _interactions
+from . import transport
+
+_executor = None
+
+def set_max_concurrency(workers, resize_pool=True):
+    """Sets how many requests can be in progress at once.
+
+    :param int workers: The number of worker threads to run requests on.
+    :param bool resize_pool: If ``True`` (the default), the shared connection \
+    pool will be resized to match, so that every worker can hold a connection. \
+    The session's other settings are kept.
+    :rtype: ``ThreadPoolExecutor``"""
+
+    if not isinstance(workers, int):
+        raise TypeError("workers must be int, not '%s'" % str(workers))
+    if workers < 1:
+        raise ValueError("workers must be greater than zero, not %i" % workers)
+    global _executor
+    old_executor, _executor = _executor, ThreadPoolExecutor(max_workers=workers)
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+    if resize_pool:
+        transport.configure_session(
+         **dict(transport.session_settings, pool_maxsize=workers)
+        )
+    return _executor
+
+
+async def _run(func, *args, **kwargs):
+    if _executor is None:
+        set_max_concurrency(transport.POOL_MAXSIZE, resize_pool=False)
+    loop = asyncio.get_event_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+     _executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def _to_async(result):
+    if isinstance(result, list) or isinstance(result, tuple):
+        return type(result)([_to_async(item) for item in result])
+    for sync_class, async_class in _ASYNC_CLASSES.items():
+        if type(result) is sync_class:
+            return async_class(result)
+    return result
+
+
+def _asynchronous(func):
+    """Turns a method of one of the synchronous classes into a coroutine
+    method of the asynchronous class which wraps it."""
+
+    async def new_func(self, *args, **kwargs):
+        return _to_async(await _run(func, self._sync, *args, **kwargs))
+    new_func.__name__ = func.__name__
+    new_func.__doc__ = func.__doc__
+    return new_func
+
+
+def _asynchronous_list(func):
+    """Turns a list-returning module function into one whose result can be
+    awaited as a list or iterated over with ``async for``."""
+
+    def new_func(*args, **kwargs):
+        return AsyncResults(func, *args, **kwargs)
+    new_func.__name__ = func.__name__
+    new_func.__doc__ = func.__doc__
+    return new_func
+
+
+def _asynchronous_function(func):
+    async def new_func(*args, **kwargs):
+        return _to_async(await _run(func, *args, **kwargs))
+    new_func.__name__ = func.__name__
+    new_func.__doc__ = func.__doc__
+    return new_func
+
+
+
+class AsyncResults:
+    """The result of a query which returns many objects. It can either be
+    awaited, giving a list, or iterated over with ``async for``.
+
+    :param func: The synchronous function which makes the query."""
+
+    def __init__(self, func, *args, **kwargs):
+        self._call = functools.partial(func, *args, **kwargs)
+        self._results = None
+
+
+    def __repr__(self):
+        return "<AsyncResults (%s)>" % self._call.func.__name__
+
+
+    def __await__(self):
+        return self._fetch().__await__()
+
+
+    def __aiter__(self):
+        return self._iterate()
+
+
+    async def _fetch(self):
+        if self._results is None:
+            self._results = _to_async(await _run(self._call))
+        return self._results
+
+
+    async def _iterate(self):
+        for result in await self._fetch():
+            yield result
+
+
+
+class _AsyncObject:
+    """Base class for the asynchronous wrappers. Properties which don't need
+    the web services are passed straight through to the wrapped object."""
+
+    def __init__(self, sync_object):
+        self._sync = sync_object
+        self.json_data = sync_object.json_data
+
+
+    def __repr__(self):
+        return repr(self._sync)
+
+
+    def __getattr__(self, name):
+        if name == "_sync":
+            raise AttributeError(name)
+        return getattr(self._sync, name)
+
+
+
+class Ligand(_AsyncObject):
+    """An asynchronous wrapper around a :py:class:`.Ligand`.
+
+    :param sync_object: The :py:class:`.Ligand` to wrap."""
+
+    subunits = _asynchronous(_ligands.Ligand.subunits)
+    complexes = _asynchronous(_ligands.Ligand.complexes)
+    prodrugs = _asynchronous(_ligands.Ligand.prodrugs)
+    active_drugs = _asynchronous(_ligands.Ligand.active_drugs)
+    iupac_name = _asynchronous(_ligands.Ligand.iupac_name)
+    smiles = _asynchronous(_ligands.Ligand.smiles)
+    inchi = _asynchronous(_ligands.Ligand.inchi)
+    inchi_key = _asynchronous(_ligands.Ligand.inchi_key)
+    one_letter_sequence = _asynchronous(_ligands.Ligand.one_letter_sequence)
+    three_letter_sequence = _asynchronous(_ligands.Ligand.three_letter_sequence)
+    post_translational_modifications = _asynchronous(
+     _ligands.Ligand.post_translational_modifications
+    )
+    chemical_modifications = _asynchronous(_ligands.Ligand.chemical_modifications)
+    hydrogen_bond_acceptors = _asynchronous(_ligands.Ligand.hydrogen_bond_acceptors)
+    hydrogen_bond_donors = _asynchronous(_ligands.Ligand.hydrogen_bond_donors)
+    rotatable_bonds = _asynchronous(_ligands.Ligand.rotatable_bonds)
+    topological_polar_surface_area = _asynchronous(
+     _ligands.Ligand.topological_polar_surface_area
+    )
+    molecular_weight = _asynchronous(_ligands.Ligand.molecular_weight)
+    log_p = _asynchronous(_ligands.Ligand.log_p)
+    lipinski_rules_broken = _asynchronous(_ligands.Ligand.lipinski_rules_broken)
+    synonyms = _asynchronous(_ligands.Ligand.synonyms)
+    general_comments = _asynchronous(_ligands.Ligand.general_comments)
+    bioactivity_comments = _asynchronous(_ligands.Ligand.bioactivity_comments)
+    clinical_use_comments = _asynchronous(_ligands.Ligand.clinical_use_comments)
+    mechanism_of_action_comments = _asynchronous(
+     _ligands.Ligand.mechanism_of_action_comments
+    )
+    absorption_and_distribution_comments = _asynchronous(
+     _ligands.Ligand.absorption_and_distribution_comments
+    )
+    metabolism_comments = _asynchronous(_ligands.Ligand.metabolism_comments)
+    elimination_comments = _asynchronous(_ligands.Ligand.elimination_comments)
+    population_pharmacokinetics_comments = _asynchronous(
+     _ligands.Ligand.population_pharmacokinetics_comments
+    )
+    organ_function_impairments_comments = _asynchronous(
+     _ligands.Ligand.organ_function_impairments_comments
+    )
+    mutations_and_pathophysiology_comments = _asynchronous(
+     _ligands.Ligand.mutations_and_pathophysiology_comments
+    )
+    database_links = _asynchronous(_ligands.Ligand.database_links)
+    interactions = _asynchronous(_ligands.Ligand.interactions)
+    get_interaction_by_id = _asynchronous(_ligands.Ligand.get_interaction_by_id)
+    targets = _asynchronous(_ligands.Ligand.targets)
+    gtop_pdbs = _asynchronous(_ligands.Ligand.gtop_pdbs)
+    smiles_pdbs = _asynchronous(_ligands.Ligand.smiles_pdbs)
+    inchi_pdbs = _asynchronous(_ligands.Ligand.inchi_pdbs)
+    name_pdbs = _asynchronous(_ligands.Ligand.name_pdbs)
+    sequence_pdbs = _asynchronous(_ligands.Ligand.sequence_pdbs)
+    het_pdbs = _asynchronous(_ligands.Ligand.het_pdbs)
+    all_external_pdbs = _asynchronous(_ligands.Ligand.all_external_pdbs)
+    all_pdbs = _asynchronous(_ligands.Ligand.all_pdbs)
+    find_in_pdb_by_smiles = _asynchronous(_ligands.Ligand.find_in_pdb_by_smiles)
+    find_in_pdb_by_name = _asynchronous(_ligands.Ligand.find_in_pdb_by_name)
+    find_in_pdb_by_mass = _asynchronous(_ligands.Ligand.find_in_pdb_by_mass)
+    find_in_pdb_by_peptide_string = _asynchronous(
+     _ligands.Ligand.find_in_pdb_by_peptide_string
+    )
+
+
+
+class Target(_AsyncObject):
+    """An asynchronous wrapper around a :py:class:`.Target`.
+
+    :param sync_object: The :py:class:`.Target` to wrap."""
+
+    families = _asynchronous(_targets.Target.families)
+    subunits = _asynchronous(_targets.Target.subunits)
+    complexes = _asynchronous(_targets.Target.complexes)
+    synonyms = _asynchronous(_targets.Target.synonyms)
+    database_links = _asynchronous(_targets.Target.database_links)
+    genes = _asynchronous(_targets.Target.genes)
+    interactions = _asynchronous(_targets.Target.interactions)
+    get_interaction_by_id = _asynchronous(_targets.Target.get_interaction_by_id)
+    ligands = _asynchronous(_targets.Target.ligands)
+    gtop_pdbs = _asynchronous(_targets.Target.gtop_pdbs)
+    uniprot_pdbs = _asynchronous(_targets.Target.uniprot_pdbs)
+    all_pdbs = _asynchronous(_targets.Target.all_pdbs)
+
+
+
+class TargetFamily(_AsyncObject):
+    """An asynchronous wrapper around a :py:class:`.TargetFamily`.
+
+    :param sync_object: The :py:class:`.TargetFamily` to wrap."""
+
+    targets = _asynchronous(_targets.TargetFamily.targets)
+    parent_families = _asynchronous(_targets.TargetFamily.parent_families)
+    sub_families = _asynchronous(_targets.TargetFamily.sub_families)
+
+
+
+class Interaction(_AsyncObject):
+    """An asynchronous wrapper around an :py:class:`.Interaction`.
+
+    :param sync_object: The :py:class:`.Interaction` to wrap."""
+
+    ligand = _asynchronous(_interactions.Interaction.ligand)
+    target = _asynchronous(_interactions.Interaction.target)
+    gtop_pdbs = _asynchronous(_interactions.Interaction.gtop_pdbs)
+    all_external_pdbs = _asynchronous(_interactions.Interaction.all_external_pdbs)
+    all_pdbs = _asynchronous(_interactions.Interaction.all_pdbs)
+
+
+
+_ASYNC_CLASSES = {
+ _ligands.Ligand: Ligand,
+ _targets.Target: Target,
+ _targets.TargetFamily: TargetFamily,
+ _interactions.Interaction: Interaction
+}
+
+get_ligand_by_id = _asynchronous_function(_ligands.get_ligand_by_id)
+get_ligand_by_name = _asynchronous_function(_ligands.get_ligand_by_name)
+get_all_ligands = _asynchronous_list(_ligands.get_all_ligands)
+get_ligands_by = _asynchronous_list(_ligands.get_ligands_by)
+get_ligands_by_smiles = _asynchronous_list(_ligands.get_ligands_by_smiles)
+
+get_target_by_id = _asynchronous_function(_targets.get_target_by_id)
+get_target_by_name = _asynchronous_function(_targets.get_target_by_name)
+get_all_targets = _asynchronous_list(_targets.get_all_targets)
+get_targets_by = _asynchronous_list(_targets.get_targets_by)
+get_target_family_by_id = _asynchronous_function(_targets.get_target_family_by_id)
+get_all_target_families = _asynchronous_list(_targets.get_all_target_families)
+
+get_all_interactions = _asynchronous_list(_interactions.get_all_interactions)
@@ -32,3 +32,33 @@ class NoSuchTypeError(Exception):
     """The exception raised if a random ligand or target is requested of a type
     which does not exist."""
     pass
+
+
+
+class ServiceUnavailableError(Exception):
+    """The exception raised if a request is refused without being sent,
+    because the circuit breaker for that web service is open after too many
+    consecutive failures."""
+    pass
+
+
+
+class DeadlineExceededError(Exception):
+    """The exception raised if a request cannot be completed before the
+    current :py:func:`.deadline` runs out."""
+    pass
+
+
+
+class UnrecordedRequestError(Exception):
+    """The exception raised if a request is made while replaying a
+    :py:class:`.Cassette` which has no recording of it."""
+    pass
+
+
+
+class NoResponseError(Exception):
+    """The exception raised, when asked for, if the web services give no
+    valid answer to a query even after retrying - as opposed to answering
+    that there is nothing there."""
+    pass
@@ -1,20 +1,75 @@
 """Functions for interacting with the Guide to PHARMACOLOGY web services."""
 
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+import codecs
+import hashlib
 import json
-import requests
+import re
+import threading
+import time
+from . import transport
+from .exceptions import NoResponseError
 
 ROOT_URL = "http://www.guidetopharmacology.org/services/"
 
-def get_json_from_gtop(query, attempts=5):
+JSON_DECODERS = {"json": json.loads}
+try:
+    import ujson
+    JSON_DECODERS["ujson"] = ujson.loads
+except ImportError:
+    pass
+try:
+    import orjson
+    JSON_DECODERS["orjson"] = orjson.loads
+except ImportError:
+    pass
+
+json_decoder_default = [
+ name for name in ("orjson", "ujson", "json") if name in JSON_DECODERS
+][0]
+json_decoder = json_decoder_default
+
+response_store = None
+response_cache = None
+negative_cache = None
+offline_data = None
+release_tracker = None
+
+RELEASE_QUERY = "targets/families"
+
+def get_json_from_gtop(query, attempts=5, raise_errors=False):
     """Issues a query to the GtoP web services, and returns the resulting JSON.
 
-    If it does not get a valid response, it will try again, and if it still
-    doesn't get JSON back, it will return None.
+    If it does not get a valid response, it will try again after a delay
+    chosen by the current :py:class:`.RetryPolicy`, and if it still doesn't
+    get JSON back, it will return None. Responses which definitively say there
+    is nothing there (such as a 404) are not retried.
+
+    If a :py:class:`ResponseCache` has been set with
+    :py:func:`set_response_cache`, queries it holds are answered from it
+    without any request being made. Likewise, if a :py:class:`NegativeCache`
+    has been set with :py:func:`set_negative_cache`, queries it knows have
+    nothing there return None straight away.
+
+    If offline data has been set with :py:func:`set_offline_data`, the query
+    is answered from it alone, and no request is ever made.
+
+    If a :py:class:`ReleaseTracker` has been set with
+    :py:func:`set_release_tracker`, it is given the chance to check for a new
+    GtoP release first.
 
     :param str query: The query to append to the base URL.
     :param int attempts: The number of attempts to make before giving up \
     (default is 5).
-    :return: JSON object or None"""
+    :param bool raise_errors: If ``True``, raise rather than return None when \
+    no valid response is received - None is then only returned for a 404.
+    :return: JSON object or None
+    :raises: :class:`.NoResponseError` if ``raise_errors`` is ``True`` and no \
+    valid response was received
+    :raises: :class:`.ServiceUnavailableError` if the circuit breaker for GtoP \
+    is open
+    :raises: :class:`.DeadlineExceededError` if the current deadline runs out"""
 
     if not isinstance(attempts, int):
         raise TypeError(
@@ -25,14 +80,856 @@ def get_json_from_gtop(query, attempts=5):
          "attempts must be an integer greater than zero, not %s", str(attempts)
         )
 
+    data = offline_data
+    if data is not None:
+        path, _, query_string = query.partition("?")
+        return data.query(path, query_string)
+    tracker = release_tracker
+    if tracker is not None:
+        tracker.poll()
+    cache = response_cache
+    if cache is not None:
+        json_data = cache.get(query)
+        if json_data is not None:
+            return json_data
+    missing = negative_cache
+    if missing is not None and missing.is_missing(query):
+        return None
+    url = "%s%s" % (ROOT_URL, query)
+    store = response_store
+    policy = transport.retry_policy
     try_count = 0
     while try_count < attempts:
-        response = requests.get("%s%s" % (ROOT_URL, query))
+        headers = store.conditional_headers(url) if store is not None else None
+        if headers:
+            response = transport.service_get("gtop", ROOT_URL, query, headers=headers)
+        else:
+            response = transport.service_get("gtop", ROOT_URL, query)
+        policy.record("requests")
         try:
-            if response.status_code == 200 and len(response.text) > 1:
-                return json.loads(response.text)
+            if store is not None and response.status_code == 304:
+                json_data = store.revalidated(url)
+                if json_data is None:
+                    raise ValueError
+                size = store.size(url)
+            elif response.status_code == 200 and len(response.content) > 1:
+                if store is not None:
+                    json_data = store.load(url, response)
+                else:
+                    json_data = decode_json(response.content)
+                size = len(response.content)
             else:
                 raise ValueError
+            if cache is not None:
+                cache.put(query, json_data, size)
+            return json_data
         except ValueError:
             try_count += 1
+            if not policy.should_retry(response):
+                policy.record("fast_failures")
+                if response.status_code == 404:
+                    if missing is not None:
+                        missing.record_missing(query)
+                elif raise_errors:
+                    raise NoResponseError("GtoP answered %s with %i" % (
+                     query, response.status_code
+                    ))
+                return None
+            if try_count < attempts:
+                policy.record("retries")
+                transport.sleep(policy.backoff(try_count, response))
+    policy.record("exhausted")
+    if raise_errors:
+        raise NoResponseError("GtoP gave no valid response to %s after %i attempts" % (
+         query, attempts
+        ))
     return None
+
+
+def decode_json(data):
+    """Parses JSON with the fastest decoder available - orjson or ujson if
+    either is installed, and the standard library's json module otherwise.
+    The decoder can be changed with :py:func:`set_json_decoder`.
+
+    :param bytes data: The JSON to parse, as bytes or str.
+    :raises ValueError: if the data is not valid JSON."""
+
+    return JSON_DECODERS[json_decoder](data)
+
+
+def set_json_decoder(name):
+    """Sets which JSON decoder is used to parse responses.
+
+    :param str name: One of the installed decoders - ``"json"``, and \
+    ``"orjson"`` or ``"ujson"`` if they are installed.
+    :rtype: str"""
+
+    if name not in JSON_DECODERS:
+        raise ValueError("'%s' is not an available JSON decoder - use one of %s" % (
+         name, ", ".join(sorted(JSON_DECODERS))
+        ))
+    global json_decoder
+    json_decoder = name
+    return name
+
+
+def iter_json_from_gtop(query, attempts=5, chunk_size=65536, raise_errors=False):
+    """Issues a query to the GtoP web services which returns a JSON array, and
+    yields the array's items one at a time as they are read from the network.
+    The full response is never held in memory at once.
+
+    Failed requests are retried as in :py:func:`get_json_from_gtop`, but only
+    before any items have been yielded. If no valid response is received,
+    nothing is yielded. Responses already in the :py:class:`ResponseCache`
+    are yielded from there, but streamed responses are not added to it. When
+    offline data has been set, the items are yielded from that instead.
+
+    :param str query: The query to append to the base URL.
+    :param int attempts: The number of attempts to make before giving up \
+    (default is 5).
+    :param int chunk_size: The number of bytes to read from the network at a \
+    time (default is 65536).
+    :param bool raise_errors: If ``True``, raise :class:`.NoResponseError` \
+    rather than yield nothing when no valid response is received - nothing \
+    is then only yielded for a 404 or an empty array."""
+
+    if not isinstance(attempts, int):
+        raise TypeError(
+         "attempts must be an integer greater than zero, not %s", str(attempts)
+        )
+    if attempts < 1:
+        raise ValueError(
+         "attempts must be an integer greater than zero, not %s", str(attempts)
+        )
+
+    data = offline_data
+    if data is not None:
+        path, _, query_string = query.partition("?")
+        yield from data.query(path, query_string) or []
+        return
+    tracker = release_tracker
+    if tracker is not None:
+        tracker.poll()
+    cache = response_cache
+    if cache is not None:
+        json_data = cache.get(query)
+        if json_data is not None:
+            yield from json_data
+            return
+    policy = transport.retry_policy
+    try_count = 0
+    while try_count < attempts:
+        response = transport.service_get("gtop", ROOT_URL, query, stream=True)
+        policy.record("requests")
+        if response.status_code == 200:
+            try:
+                yield from iter_json_array(response.iter_content(chunk_size))
+            finally:
+                response.close()
+            return
+        response.close()
+        try_count += 1
+        if not policy.should_retry(response):
+            policy.record("fast_failures")
+            if raise_errors and response.status_code != 404:
+                raise NoResponseError("GtoP answered %s with %i" % (
+                 query, response.status_code
+                ))
+            return
+        if try_count < attempts:
+            policy.record("retries")
+            transport.sleep(policy.backoff(try_count, response))
+    policy.record("exhausted")
+    if raise_errors:
+        raise NoResponseError("GtoP gave no valid response to %s after %i attempts" % (
+         query, attempts
+        ))
+
+
+def iter_json_array(chunks):
+    """Incrementally parses a JSON array which arrives as a series of byte
+    chunks, yielding each item as soon as it is complete.
+
+    :param chunks: An iterable of ``bytes`` which together make a JSON array.
+    :raises ValueError: if the chunks do not make a valid JSON array."""
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer, position, started = "", 0, False
+    # After the opening bracket either an item or the closing bracket may
+    # come, after an item a separator, and after a comma only an item
+    expecting = "first"
+    chunks = iter(chunks)
+    finished = False
+    while True:
+        if not finished:
+            chunk = next(chunks, None)
+            if chunk is None:
+                finished = True
+                buffer += utf8.decode(b"", final=True)
+            else:
+                buffer += utf8.decode(chunk)
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Response is not a JSON array")
+                started, position = True, position + 1
+                continue
+            if buffer[position] == "]":
+                if expecting == "item":
+                    raise ValueError("Invalid JSON array")
+                return
+            if buffer[position] == ",":
+                if expecting != "separator":
+                    raise ValueError("Invalid JSON array")
+                position, expecting = position + 1, "item"
+                continue
+            if expecting == "separator":
+                raise ValueError("Invalid JSON array")
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if finished:
+                    raise
+                break
+            # An item is only complete once the delimiter after it has arrived,
+            # as otherwise a number such as 2.5 could be cut short at 2
+            delimiter = end
+            while delimiter < len(buffer) and buffer[delimiter] in " \t\r\n":
+                delimiter += 1
+            if delimiter == len(buffer) or buffer[delimiter] not in ",]":
+                if not finished:
+                    break
+                raise ValueError("Invalid JSON array")
+            position, expecting = end, "separator"
+            yield item
+        buffer, position = buffer[position:], 0
+        if finished:
+            raise ValueError("JSON array ended unexpectedly")
+
+
+def set_offline_data(data):
+    """Sets the data which all GtoP queries are answered from, with no
+    requests made at all. Pass ``None`` to go back to using the web services.
+
+    :param data: The new :py:class:`.ServerData`, such as a \
+    :py:class:`.Snapshot`, or ``None``.
+    :rtype: :py:class:`.ServerData`"""
+
+    from .server import ServerData
+    if data is not None and not isinstance(data, ServerData):
+        raise TypeError("data must be ServerData, not '%s'" % str(data))
+    global offline_data
+    offline_data = data
+    return data
+
+
+def set_response_store(store):
+    """Sets the store used to revalidate GtoP responses rather than download
+    them again. Pass ``None`` to stop revalidating.
+
+    :param store: The new :py:class:`ResponseStore`, or ``None``.
+    :rtype: :py:class:`ResponseStore`"""
+
+    if store is not None and not isinstance(store, ResponseStore):
+        raise TypeError("store must be ResponseStore, not '%s'" % str(store))
+    global response_store
+    response_store = store
+    return store
+
+
+
+class ResponseStore:
+    """Remembers GtoP responses, so that they can be cheaply revalidated
+    rather than downloaded and parsed again.
+
+    The ``ETag`` and ``Last-Modified`` validators of each response are kept
+    and sent back as ``If-None-Match`` and ``If-Modified-Since`` on the next
+    request for the same URL, and if the server replies 304 Not Modified the
+    stored JSON is returned. When a server sends no validators, a hash of the
+    response body is kept instead, so that an unchanged body is recognised and
+    the stored JSON returned without being parsed again.
+
+    :param int max_entries: The number of responses to remember, after which \
+    the least recently used are forgotten (default is 1000)."""
+
+    def __init__(self, max_entries=1000):
+        if not isinstance(max_entries, int):
+            raise TypeError("max_entries must be int, not '%s'" % str(max_entries))
+        if max_entries < 1:
+            raise ValueError("max_entries must be greater than zero, not %i" % max_entries)
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "not_modified": 0, "unchanged": 0}
+
+
+    def __repr__(self):
+        return "<ResponseStore (%i entries)>" % len(self._entries)
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def conditional_headers(self, url):
+        """Returns the headers which will ask the server to only send the
+        response for a URL if it has changed.
+
+        :param str url: The URL about to be requested.
+        :rtype: dict"""
+
+        with self._lock:
+            entry = self._entries.get(url)
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+
+    def revalidated(self, url):
+        """Returns the stored JSON for a URL the server has said is unchanged,
+        or ``None`` if nothing is stored for it.
+
+        :param str url: The URL which was requested."""
+
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            self._entries.move_to_end(url)
+            self._stats["not_modified"] += 1
+            return entry["json"]
+
+
+    def load(self, url, response):
+        """Returns the JSON in a successful response, parsing it only if the
+        body differs from the one already stored, and stores it.
+
+        :param str url: The URL which was requested.
+        :param response: The ``requests.Response`` which was received."""
+
+        digest = hashlib.sha1(response.content).hexdigest()
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry and entry["digest"] == digest:
+            json_data = entry["json"]
+            with self._lock:
+                self._stats["unchanged"] += 1
+        else:
+            json_data = decode_json(response.content)
+        with self._lock:
+            self._entries[url] = {
+             "etag": response.headers.get("ETag"),
+             "last_modified": response.headers.get("Last-Modified"),
+             "digest": digest,
+             "size": len(response.content),
+             "json": json_data
+            }
+            self._entries.move_to_end(url)
+            self._stats["stored"] += 1
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return json_data
+
+
+    def size(self, url):
+        """Returns the size in bytes of the response stored for a URL, or 0 if
+        nothing is stored for it.
+
+        :param str url: The URL which was requested.
+        :rtype: int"""
+
+        with self._lock:
+            entry = self._entries.get(url)
+        return entry["size"] if entry else 0
+
+
+    def stats(self):
+        """Returns the number of responses ``stored``, answered by a 304
+        ``not_modified``, and found ``unchanged`` by their hash.
+
+        :rtype: dict"""
+
+        with self._lock:
+            return dict(self._stats)
+
+
+    def clear(self):
+        """Forgets every stored response."""
+
+        with self._lock:
+            self._entries.clear()
+
+
+
+def normalise_query(query):
+    """Returns a query in a standard form, so that equivalent queries - such
+    as ones with their parameters in a different order - look the same.
+
+    :param str query: The query to append to the base URL.
+    :rtype: str"""
+
+    path, _, parameters = query.partition("?")
+    path = path.strip("/")
+    if parameters:
+        return "%s?%s" % (path, urlencode(sorted(parse_qsl(parameters))))
+    return path
+
+
+def set_response_cache(cache):
+    """Sets the cache which GtoP responses are kept in, so that repeated
+    queries are answered without a request. Pass ``None`` to stop caching.
+
+    :param cache: The new :py:class:`ResponseCache`, or ``None``.
+    :rtype: :py:class:`ResponseCache`"""
+
+    if cache is not None and not isinstance(cache, ResponseCache):
+        raise TypeError("cache must be ResponseCache, not '%s'" % str(cache))
+    global response_cache
+    response_cache = cache
+    return cache
+
+
+
+class ResponseCache:
+    """An in-memory cache of GtoP responses, shared by every thread in the
+    process, so that different objects for the same ligand or target - and
+    repeated queries generally - don't fetch the same JSON again.
+
+    Responses are kept under their normalised query (see
+    :py:func:`normalise_query`) until they expire, or until the cache is full
+    and they are the least recently used. The cached JSON is shared between
+    callers, so should not be modified.
+
+    :param int max_entries: The most responses to hold (default is 10000).
+    :param int max_bytes: The most bytes of response body to hold (default is \
+    64 MB).
+    :param float ttl: The number of seconds a response is kept for, or \
+    ``None`` to keep responses until evicted (default is 3600).
+    :param dict ttls: Time-to-live values for particular endpoints, which \
+    override ``ttl``. Keys are query patterns, in which ``*`` matches any \
+    ID, such as ``"ligands/*/interactions"`` or ``"targets/families"``; the \
+    first matching pattern is used."""
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=3600, ttls=None):
+        for name, value in (("max_entries", max_entries), ("max_bytes", max_bytes)):
+            if not isinstance(value, int):
+                raise TypeError("%s must be int, not '%s'" % (name, str(value)))
+            if value < 1:
+                raise ValueError("%s must be greater than zero, not %i" % (name, value))
+        if ttls is not None and not isinstance(ttls, dict):
+            raise TypeError("ttls must be dict, not '%s'" % str(ttls))
+        for value in [ttl] + list((ttls or {}).values()):
+            if value is not None and not isinstance(value, (int, float)):
+                raise TypeError("TTLs must be numeric, not '%s'" % str(value))
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._ttls = [(re.compile("[^/]*".join(
+         re.escape(part) for part in pattern.strip("/").split("*")
+        ) + "$"), value) for pattern, value in (ttls or {}).items()]
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+
+    def __repr__(self):
+        return "<ResponseCache (%i entries, %i bytes)>" % (len(self._entries), self._bytes)
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def get(self, query):
+        """Returns the cached JSON for a query, or ``None`` if it is not
+        cached or has expired.
+
+        :param str query: The query to append to the base URL."""
+
+        key = normalise_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] is not None and (
+             entry["expires"] <= time.monotonic()):
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry["json"]
+
+
+    def put(self, query, json_data, size):
+        """Caches the JSON for a query, evicting the least recently used
+        responses if the cache is now too full. Responses larger than the
+        whole cache are not cached.
+
+        :param str query: The query to append to the base URL.
+        :param json_data: The JSON returned for it.
+        :param int size: The size of the response body in bytes."""
+
+        key = normalise_query(query)
+        ttl = self.ttl(key)
+        if size > self._max_bytes or ttl == 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+             "json": json_data, "size": size,
+             "expires": None if ttl is None else time.monotonic() + ttl
+            }
+            self._bytes += size
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+
+    def ttl(self, query):
+        """Returns the number of seconds a response to a query is kept for.
+
+        :param str query: The query to append to the base URL.
+        :rtype: float"""
+
+        path = normalise_query(query).partition("?")[0]
+        for pattern, ttl in self._ttls:
+            if pattern.match(path):
+                return ttl
+        return self._ttl
+
+
+    def stats(self):
+        """Returns the number of cache ``hits`` and ``misses``, the number of
+        responses evicted to make room (``evictions``) and dropped because
+        they had expired (``expirations``), and the number of ``entries`` and
+        ``bytes`` currently held.
+
+        :rtype: dict"""
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+    def clear(self):
+        """Empties the cache."""
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)["size"]
+
+
+
+def set_negative_cache(cache):
+    """Sets the cache which remembers which GtoP queries have nothing there,
+    so that looking them up again doesn't need a request. Pass ``None`` to
+    stop remembering.
+
+    :param cache: The new :py:class:`NegativeCache`, or ``None``.
+    :rtype: :py:class:`NegativeCache`"""
+
+    if cache is not None and not isinstance(cache, NegativeCache):
+        raise TypeError("cache must be NegativeCache, not '%s'" % str(cache))
+    global negative_cache
+    negative_cache = cache
+    return cache
+
+
+def record_ids(collection, ids):
+    """Tells the current :py:class:`NegativeCache`, if there is one, every ID
+    in a collection, so that it knows any other ID is missing.
+
+    :param str collection: The collection's query, such as ``"ligands"``.
+    :param ids: Every ID in the collection."""
+
+    cache = negative_cache
+    if cache is not None:
+        cache.record_ids(collection, ids)
+
+
+
+class NegativeCache:
+    """Remembers which GtoP queries have nothing there, so that looking up a
+    missing ligand, target or target family a second time fails straight away
+    rather than making another request.
+
+    A query is known to be missing if the server answered it with a 404, or if
+    it asks for an ID - such as ``ligands/123`` - in a collection whose full
+    set of IDs has been seen (by :py:func:`.get_all_ligands` and the like), and
+    that ID was not in the set.
+
+    :param float ttl: The number of seconds to remember a query is missing, \
+    and a collection's IDs, for (default is 3600)."""
+
+    def __init__(self, ttl=3600):
+        if not isinstance(ttl, (int, float)):
+            raise TypeError("ttl must be numeric, not '%s'" % str(ttl))
+        if ttl <= 0:
+            raise ValueError("ttl must be greater than zero, not %s" % str(ttl))
+        self._ttl = ttl
+        self._missing = {}
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "recorded": 0}
+
+
+    def __repr__(self):
+        return "<NegativeCache (%i queries, %i collections)>" % (
+         len(self._missing), len(self._collections)
+        )
+
+
+    def is_missing(self, query):
+        """Returns ``True`` if a query is known to have nothing there.
+
+        :param str query: The query to append to the base URL.
+        :rtype: bool"""
+
+        query = normalise_query(query)
+        collection, _, id_ = query.rpartition("/")
+        now = time.monotonic()
+        with self._lock:
+            expires = self._missing.get(query)
+            missing = expires is not None and expires > now
+            if not missing and id_.isdigit() and collection in self._collections:
+                ids, expires = self._collections[collection]
+                missing = expires > now and int(id_) not in ids
+            if missing:
+                self._stats["hits"] += 1
+            return missing
+
+
+    def record_missing(self, query):
+        """Records that a query has nothing there.
+
+        :param str query: The query to append to the base URL."""
+
+        with self._lock:
+            self._missing[normalise_query(query)] = time.monotonic() + self._ttl
+            self._stats["recorded"] += 1
+
+
+    def record_ids(self, collection, ids):
+        """Records every ID in a collection, so that queries for any other ID
+        in it are known to be missing.
+
+        :param str collection: The collection's query, such as ``"ligands"``.
+        :param ids: Every ID in the collection."""
+
+        with self._lock:
+            self._collections[normalise_query(collection)] = (
+             frozenset(ids), time.monotonic() + self._ttl
+            )
+
+
+    def stats(self):
+        """Returns the number of queries answered as missing (``hits``), and
+        the number of 404s ``recorded``.
+
+        :rtype: dict"""
+
+        with self._lock:
+            return dict(self._stats)
+
+
+    def clear(self):
+        """Forgets everything."""
+
+        with self._lock:
+            self._missing.clear()
+            self._collections.clear()
+
+
+
+def probe_release(query=RELEASE_QUERY):
+    """Asks the GtoP web services which release of the database they are
+    serving, by requesting a query which changes with every release and
+    hashing the response. The :py:class:`.DiskCache` is bypassed.
+
+    Note that the default query downloads the whole list of target families -
+    a few hundred kilobytes each time. If a cheaper way of telling releases
+    apart is available, pass it to :py:class:`ReleaseTracker` as its probe.
+
+    :param str query: The query to request (default is the list of target \
+    families).
+    :returns: An identifier for the release, or ``None`` if the web services \
+    could not be reached.
+    :rtype: str"""
+
+    response = transport.service_get(
+     "gtop", ROOT_URL, query, headers={"Cache-Control": "no-cache"}
+    )
+    if response.status_code != 200 or len(response.content) <= 1:
+        return None
+    return hashlib.sha1(response.content).hexdigest()[:16]
+
+
+def current_release():
+    """Returns the GtoP release currently being served - as known to the
+    current :py:class:`ReleaseTracker` if there is one, otherwise probed with
+    :py:func:`probe_release`.
+
+    :rtype: str"""
+
+    tracker = release_tracker
+    if tracker is not None:
+        tracker.poll()
+        return tracker.release()
+    return probe_release()
+
+
+def set_release_tracker(tracker):
+    """Sets the tracker which watches for new GtoP releases, and invalidates
+    the caches when one comes out. Pass ``None`` to stop watching.
+
+    :param tracker: The new :py:class:`ReleaseTracker`, or ``None``.
+    :rtype: :py:class:`ReleaseTracker`"""
+
+    if tracker is not None and not isinstance(tracker, ReleaseTracker):
+        raise TypeError("tracker must be ReleaseTracker, not '%s'" % str(tracker))
+    global release_tracker
+    release_tracker = tracker
+    return tracker
+
+
+
+class ReleaseTracker:
+    """Watches which release of the GtoP database is being served, so that
+    cached data can be kept for as long as the release lasts - and no longer.
+
+    The release is probed before the first query, and again whenever
+    ``interval`` seconds have passed. The :py:class:`.DiskCache` is tagged
+    with it, and emptied if it was tagged with a different one. When the
+    release changes, the :py:class:`ResponseCache`, :py:class:`NegativeCache`
+    and :py:class:`.IdentityMap` are cleared too, and any callbacks registered
+    with :py:meth:`on_change` are called, so that other derived data can be
+    rebuilt.
+
+    If the probe raises an exception - because the web services can't be
+    reached, for example - the error is counted and the release is treated as
+    unknown for that probe, so queries carry on to the caches as normal.
+
+    :param probe: A function which takes no arguments and returns the current \
+    release as a string, or ``None`` if it can't tell (default is \
+    :py:func:`probe_release`, which downloads the whole list of target \
+    families - a cheaper probe is recommended where one is available).
+    :param float interval: The number of seconds between probes (default is \
+    86400, one day)."""
+
+    def __init__(self, probe=None, interval=86400):
+        if probe is not None and not callable(probe):
+            raise TypeError("probe must be callable, not '%s'" % str(probe))
+        if not isinstance(interval, (int, float)):
+            raise TypeError("interval must be numeric, not '%s'" % str(interval))
+        if interval <= 0:
+            raise ValueError("interval must be greater than zero, not %s" % str(interval))
+        self._probe = probe or probe_release
+        self._interval = interval
+        self._release = None
+        self._checked = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stats = {"probes": 0, "changes": 0, "errors": 0}
+
+
+    def __repr__(self):
+        return "<ReleaseTracker (%s)>" % (self._release or "unknown release")
+
+
+    def release(self):
+        """Returns the release last probed, or ``None`` if it isn't known yet.
+
+        :rtype: str"""
+
+        return self._release
+
+
+    def on_change(self, callback):
+        """Registers a function to be called with the old and new releases
+        whenever the release changes.
+
+        :param callback: The function to call."""
+
+        if not callable(callback):
+            raise TypeError("callback must be callable, not '%s'" % str(callback))
+        self._callbacks.append(callback)
+        return callback
+
+
+    def poll(self):
+        """Probes the release if it is due to be probed. Only one thread
+        probes at a time - others carry on with the release already known."""
+
+        if self._checked is not None and time.monotonic() - self._checked < self._interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._checked is None or time.monotonic() - self._checked >= self._interval:
+                self._check()
+        finally:
+            self._lock.release()
+
+
+    def check(self):
+        """Probes the release now, and invalidates the caches if it has
+        changed.
+
+        :returns: ``True`` if the release has changed."""
+
+        with self._lock:
+            return self._check()
+
+
+    def stats(self):
+        """Returns the number of ``probes`` made, the number of probe
+        ``errors``, and the number of release ``changes`` seen.
+
+        :rtype: dict"""
+
+        return dict(self._stats)
+
+
+    def _check(self):
+        self._checked = time.monotonic()
+        self._stats["probes"] += 1
+        try:
+            release = self._probe()
+        except Exception:
+            self._stats["errors"] += 1
+            release = None
+        if release is None:
+            return False
+        old_release, self._release = self._release, release
+        disk_cache = transport.disk_cache
+        if disk_cache is not None:
+            disk_cache.set_release(release)
+        if old_release is None or old_release == release:
+            return False
+        self._stats["changes"] += 1
+        from . import shared
+        for cache in (response_cache, negative_cache, shared.identity_map):
+            if cache is not None:
+                cache.clear()
+        for callback in list(self._callbacks):
+            callback(old_release, release)
+        return True
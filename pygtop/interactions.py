@@ -1,4 +1,5 @@
 from .exceptions import NoSuchLigandError, NoSuchTargetError, NoSuchInteractionError
+from .exceptions import DeadlineExceededError
 from . import gtop
 from .pdb import ask_about_molecupy
 
@@ -21,6 +22,17 @@ def get_all_interactions():
     return [Interaction(t) for t in json_data]
 
 
+def iter_all_interactions():
+    """Yields every interaction in the Guide to PHARMACOLOGY database, one at
+    a time as they are read from the network, so that the full list never has
+    to be held in memory.
+
+    :returns: generator of :py:class:`Interaction` objects"""
+
+    for json_data in gtop.iter_json_from_gtop("interactions"):
+        yield Interaction(json_data)
+
+
 
 class Interaction:
     """A Guide to PHARMACOLOGY interaction object.
@@ -55,6 +67,16 @@ class Interaction:
         )
 
 
+    def __eq__(self, other):
+        return isinstance(other, Interaction) and (
+         other._interaction_id == self._interaction_id
+        )
+
+
+    def __hash__(self):
+        return hash((Interaction, self._interaction_id))
+
+
     def interaction_id(self):
         """Returns the interaction's GtoP ID.
 
@@ -125,30 +147,44 @@ class Interaction:
 
 
     @ask_about_molecupy
-    def all_external_pdbs(self):
+    def all_external_pdbs(self, partial=False):
         """Queries the RSCB PDB database for PDBs containing this interaction
         by all parameters.
 
+        :param bool partial: If ``True``, return the PDBs from whichever \
+        searches finished before the current :py:func:`.deadline`.
         :param bool as_molecupy: Returns the PDBs as \
         `molecuPy <http://molecupy.readthedocs.io>`_ PDB objects.
         :returns: list of ``str`` PDB codes"""
 
-        ligand_external_pdbs = self.ligand().all_external_pdbs()
-        target_external_pdbs = self.target().uniprot_pdbs(species=self.species())
+        try:
+            ligand_external_pdbs = self.ligand().all_external_pdbs(partial=partial)
+            target_external_pdbs = self.target().uniprot_pdbs(species=self.species())
+        except DeadlineExceededError:
+            if not partial:
+                raise
+            return []
         return [code for code in ligand_external_pdbs if code in target_external_pdbs]
 
 
     @ask_about_molecupy
-    def all_pdbs(self):
+    def all_pdbs(self, partial=False):
         """Get a list of PDB codes containing this interaction using all means
         available - annotated and external.
 
+        :param bool partial: If ``True``, return the PDBs from whichever \
+        searches finished before the current :py:func:`.deadline`.
         :param bool as_molecupy: Returns the PDBs as \
         `molecuPy <http://molecupy.readthedocs.io>`_ PDB objects.
         :returns: list of ``str`` PDB codes"""
 
-        ligand_pdbs = self.ligand().all_pdbs()
-        target_pdbs = self.target().all_pdbs(species=self.species())
+        try:
+            ligand_pdbs = self.ligand().all_pdbs(partial=partial)
+            target_pdbs = self.target().all_pdbs(species=self.species(), partial=partial)
+        except DeadlineExceededError:
+            if not partial:
+                raise
+            return []
         return [code for code in ligand_pdbs if code in target_pdbs]
 
 
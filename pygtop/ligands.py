@@ -5,7 +5,8 @@ from . import gtop
 from . import pdb
 from .interactions import Interaction, get_interaction_by_id
 from .exceptions import NoSuchLigandError
-from .shared import DatabaseLink, strip_html
+from .shared import DatabaseLink, strip_html, fetch_by_ids, memoise
+from .shared import canonical, live_object
 
 def get_ligand_by_id(ligand_id):
     """Returns a Ligand object of the ligand with the given ID.
@@ -16,13 +17,31 @@ def get_ligand_by_id(ligand_id):
 
     if not isinstance(ligand_id, int):
         raise TypeError("ligand_id must be int, not '%s'" % str(ligand_id))
+    ligand = live_object(Ligand, ligand_id)
+    if ligand is not None:
+        return ligand
     json_data = gtop.get_json_from_gtop("ligands/%i" % ligand_id)
     if json_data:
-        return Ligand(json_data)
+        return canonical(Ligand, ligand_id, json_data)
     else:
         raise NoSuchLigandError("There is no ligand with ID %i" % ligand_id)
 
 
+def get_ligands_by_ids(ligand_ids, max_workers=None):
+    """Returns the ligands with the given IDs, fetching them concurrently.
+    Ligands are returned in the order their IDs were given, with repeated IDs
+    only fetched once. Missing ligands do not cause an exception - their IDs
+    are available from the result's ``missing_ids`` method.
+
+    :param ligand_ids: The GtoP IDs of the Ligands desired.
+    :param int max_workers: The number of requests to have in progress at once.
+    :rtype: :py:class:`.BatchResult` of :py:class:`Ligand` objects"""
+
+    return fetch_by_ids(
+     get_ligand_by_id, ligand_ids, NoSuchLigandError, max_workers=max_workers
+    )
+
+
 def get_all_ligands():
     """Returns a list of all ligands in the Guide to PHARMACOLOGY database. This
     can take a few seconds.
@@ -30,7 +49,23 @@ def get_all_ligands():
     :returns: list of :py:class:`Ligand` objects"""
 
     json_data = gtop.get_json_from_gtop("ligands")
-    return [Ligand(l) for l in json_data]
+    gtop.record_ids("ligands", [l["ligandId"] for l in json_data])
+    return [canonical(Ligand, l["ligandId"], l) for l in json_data]
+
+
+def iter_all_ligands():
+    """Yields every ligand in the Guide to PHARMACOLOGY database, one at a
+    time as they are read from the network, so that the full list never has to
+    be held in memory.
+
+    :returns: generator of :py:class:`Ligand` objects"""
+
+    ligand_ids = []
+    for json_data in gtop.iter_json_from_gtop("ligands"):
+        ligand_ids.append(json_data["ligandId"])
+        yield canonical(Ligand, json_data["ligandId"], json_data)
+    if ligand_ids:
+        gtop.record_ids("ligands", ligand_ids)
 
 
 def get_ligands_by(criteria):
@@ -47,7 +82,7 @@ def get_ligands_by(criteria):
     search_string = "&".join(["%s=%s" % (key, criteria[key]) for key in criteria])
     json_data = gtop.get_json_from_gtop("ligands?%s" % search_string)
     if json_data:
-        return [Ligand(l) for l in json_data]
+        return [canonical(Ligand, l["ligandId"], l) for l in json_data]
     else:
         return []
 
@@ -98,7 +133,7 @@ def get_ligands_by_smiles(smiles, search_type="exact", cutoff=0.8):
     )
     json_data = gtop.get_json_from_gtop(query)
     if json_data:
-        return [Ligand(l) for l in json_data]
+        return [canonical(Ligand, l["ligandId"], l) for l in json_data]
     else:
         return []
 
@@ -127,12 +162,30 @@ class Ligand:
         self._complex_ids = json_data["complexIds"]
         self._prodrug_ids = json_data["prodrugIds"]
         self._active_drug_ids = json_data["activeDrugIds"]
+        self._memos = {}
 
 
     def __repr__(self):
         return "<Ligand %i (%s)>" % (self._ligand_id, self._name)
 
 
+    def __eq__(self, other):
+        return isinstance(other, Ligand) and other._ligand_id == self._ligand_id
+
+
+    def __hash__(self):
+        return hash((Ligand, self._ligand_id))
+
+
+    def refresh(self):
+        """Forgets the ligand's structure, properties, synonyms, comments,
+        database links and interactions, so that they are fetched from the web
+        services again the next time they are needed. Otherwise each is only
+        fetched once per ligand object."""
+
+        self._memos.clear()
+
+
     def ligand_id(self):
         """Returns the ligand's GtoP ID.
 
@@ -532,15 +585,16 @@ class Ligand:
 
     def targets(self):
         """Returns a list of all targets which this ligand interacts with.
+        Each distinct target is fetched once, concurrently, however many
+        interactions it has with the ligand.
 
         :returns: list of :py:class:`.Target` objects"""
 
-        targets = []
-        for interaction in self.interactions():
-            target = interaction.target()
-            if target not in targets:
-                targets.append(target)
-        return targets
+        from .targets import get_targets_by_ids
+        return list(get_targets_by_ids(
+         [interaction.target_id() for interaction in self.interactions()
+          if interaction.target_id() is not None]
+        ))
 
 
     @pdb.ask_about_molecupy
@@ -661,35 +715,39 @@ class Ligand:
 
 
     @pdb.ask_about_molecupy
-    def all_external_pdbs(self):
+    def all_external_pdbs(self, partial=False):
         """Queries the RSCB PDB database by all parameters.
 
+        :param bool partial: If ``True``, return the PDBs from whichever \
+        searches finished before the current :py:func:`.deadline`.
         :param bool as_molecupy: Returns the PDBs as \
         `molecuPy <http://molecupy.readthedocs.io>`_ PDB objects.
         :returns: list of ``str`` PDB codes"""
 
-        return list(set(
-         self.smiles_pdbs() +
-         self.inchi_pdbs() +
-         self.name_pdbs() +
-         self.sequence_pdbs() +
-         self.het_pdbs()
-        ))
+        return pdb.gather_pdbs([
+         self.smiles_pdbs,
+         self.inchi_pdbs,
+         self.name_pdbs,
+         self.sequence_pdbs,
+         self.het_pdbs
+        ], partial=partial)
 
 
     @pdb.ask_about_molecupy
-    def all_pdbs(self):
+    def all_pdbs(self, partial=False):
         """Get a list of PDB codes using all means available - annotated and
         external.
 
+        :param bool partial: If ``True``, return the PDBs from whichever \
+        searches finished before the current :py:func:`.deadline`.
         :param bool as_molecupy: Returns the PDBs as \
         `molecuPy <http://molecupy.readthedocs.io>`_ PDB objects.
         :returns: list of ``str`` PDB codes"""
 
-        return list(set(
-         self.gtop_pdbs() +
-         self.all_external_pdbs()
-        ))
+        return pdb.gather_pdbs([
+         self.gtop_pdbs,
+         lambda: self.all_external_pdbs(partial=partial)
+        ], partial=partial)
 
 
     def find_in_pdb_by_smiles(self, molecupy_pdb):
@@ -760,43 +818,43 @@ class Ligand:
                     return chain
 
 
+    @memoise(dict)
     def _get_structure_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "ligands/%i/structure" % self._ligand_id
+        return gtop.get_json_from_gtop(
+         "ligands/%i/structure" % self._ligand_id, raise_errors=True
         )
-        return json_object if json_object else {}
 
 
+    @memoise(dict)
     def _get_molecular_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "ligands/%i/molecularProperties" % self._ligand_id
+        return gtop.get_json_from_gtop(
+         "ligands/%i/molecularProperties" % self._ligand_id, raise_errors=True
         )
-        return json_object if json_object else {}
 
 
+    @memoise(list)
     def _get_synonym_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "ligands/%i/synonyms" % self._ligand_id
+        return gtop.get_json_from_gtop(
+         "ligands/%i/synonyms" % self._ligand_id, raise_errors=True
         )
-        return json_object if json_object else []
 
 
+    @memoise(dict)
     def _get_comments_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "ligands/%i/comments" % self._ligand_id
+        return gtop.get_json_from_gtop(
+         "ligands/%i/comments" % self._ligand_id, raise_errors=True
         )
-        return json_object if json_object else {}
 
 
+    @memoise(list)
     def _get_database_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "ligands/%i/databaseLinks" % self._ligand_id
+        return gtop.get_json_from_gtop(
+         "ligands/%i/databaseLinks" % self._ligand_id, raise_errors=True
         )
-        return json_object if json_object else []
 
 
+    @memoise(list)
     def _get_interactions_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "ligands/%i/interactions" % self._ligand_id
+        return gtop.get_json_from_gtop(
+         "ligands/%i/interactions" % self._ligand_id, raise_errors=True
         )
-        return json_object if json_object else []
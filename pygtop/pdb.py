@@ -1,6 +1,7 @@
 """Functions for interacting with the RSCB PDB web services."""
 
-import requests
+from . import transport
+from .exceptions import DeadlineExceededError
 import xml.etree.ElementTree as ElementTree
 import molecupy
 
@@ -19,8 +20,8 @@ def query_rcsb(query_type, criteria):
     :rtype: ``ElementTree`` XML element"""
 
     param_string = "&".join(["%s=%s" % (key, criteria[key]) for key in criteria])
-    response = requests.get(
-     "%s%s?%s" % (ROOT_URL, query_type, param_string)
+    response = transport.service_get(
+     "rcsb", ROOT_URL, "%s?%s" % (query_type, param_string)
     )
     if "xml" in response.headers["Content-Type"]:
         return ElementTree.fromstring(response.text)
@@ -37,8 +38,8 @@ def query_rcsb_advanced(query_type, criteria):
 
     param_elements = "\n".join(["<%s>%s</%s>" % (key, criteria[key], key) for key in criteria])
     query_xml = advanced_search_xml % (query_type, param_elements)
-    response = requests.post(
-     "%ssearch" % ROOT_URL,
+    response = transport.service_post(
+     "rcsb", ROOT_URL, "search",
      data=query_xml.encode(),
      headers={"Content-Type": "application/x-www-form-urlencoded"}
     )
@@ -48,6 +49,26 @@ def query_rcsb_advanced(query_type, criteria):
         return None
 
 
+def gather_pdbs(lookups, partial=False):
+    """Runs several PDB lookups in turn and returns all the codes they find,
+    without duplicates.
+
+    :param lookups: Functions which each return a list of PDB codes.
+    :param bool partial: If ``True``, lookups which can't finish before the \
+    current :py:func:`.deadline` are skipped, and the codes from the others \
+    are returned, rather than :class:`.DeadlineExceededError` being raised.
+    :returns: list of ``str`` PDB codes"""
+
+    codes = []
+    for lookup in lookups:
+        try:
+            codes += lookup()
+        except DeadlineExceededError:
+            if not partial:
+                raise
+    return list(set(codes))
+
+
 def ask_about_molecupy(func):
     """A decorator which, when applied to a function, will add a 'as_molecupy'
     keyword argument - if set to True this will convert any PDB codes the
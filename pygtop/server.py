@@ -0,0 +1,554 @@
+"""A lightweight local stand-in for the GtoP web services, for testing and
+load-testing code which uses pyGtoP without touching the public service.
+
+The server answers the same paths pyGtoP requests - ``ligands/1``,
+``ligands/1/structure``, ``targets/1/interactions``, ``targets/families`` and
+so on - with JSON of the same shape, served either from a snapshot directory
+or from generated data:
+
+    >>> from pygtop import server, transport
+    >>> stand_in = server.StandInServer(server.SyntheticData()).start()
+    >>> transport.configure_endpoints("gtop", [stand_in.url()])
+    >>> pygtop.get_ligand_by_id(1)
+    <Ligand 1 (Synthetic ligand 1)>
+
+A snapshot directory holds one JSON file per path, so that ``ligands/1/structure``
+is read from ``ligands/1/structure.json`` within it. Collection queries such as
+``ligands?type=Peptide`` are answered by filtering the collection's file. A
+snapshot written by :py:func:`.snapshot.download` can be served too, by
+passing it in as a :py:class:`.Snapshot`.
+
+It is built on asyncio streams with keep-alive connections and pre-encoded
+responses, so that it can answer thousands of requests a second and is never
+the bottleneck in a benchmark. It can also be run from the command line - see
+``python -m pygtop.server --help``.
+
+The same data can also be served without any sockets at all, by installing an
+:py:class:`InProcessBackend` with :py:func:`.set_backend`."""
+
+from collections import OrderedDict
+from urllib.parse import unquote, parse_qsl
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import requests
+from . import transport
+
+REASONS = {200: "OK", 404: "Not Found", 500: "Internal Server Error",
+ 502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+def snapshot_file(directory, path):
+    """Returns the file within a snapshot directory which holds the JSON for a
+    web services path.
+
+    :param str directory: The snapshot directory.
+    :param str path: The path, relative to the web services root.
+    :rtype: str"""
+
+    return os.path.join(directory, *path.strip("/").split("/")) + ".json"
+
+
+def split_target(target):
+    """Splits the target of a request into the path relative to the web
+    services root, and the query string.
+
+    :param str target: The request target, such as ``/services/ligands?type=x``.
+    :rtype: tuple"""
+
+    path, _, query = target.partition("?")
+    path = unquote(path).strip("/")
+    if path.startswith("services/") or path == "services":
+        path = path[len("services/"):]
+    return path, query
+
+
+
+class ServerData:
+    """The data a :py:class:`StandInServer` serves - a mapping of paths to
+    JSON documents.
+
+    Encoded responses are kept for reuse, up to ``MAX_ENCODED`` of them, with
+    the least recently used dropped first. Misses are never kept.
+
+    :param dict documents: The documents, keyed by path relative to the web \
+    services root."""
+
+    MAX_ENCODED = 10000
+
+    def __init__(self, documents=None):
+        self._documents = dict(documents or {})
+        self._encoded = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return "<%s (%i documents)>" % (type(self).__name__, len(self._documents))
+
+
+    def document(self, path):
+        """Returns the JSON document at a path, or ``None`` if there isn't one.
+
+        :param str path: The path, relative to the web services root."""
+
+        return self._documents.get(path)
+
+
+    def query(self, path, query=""):
+        """Returns the JSON for a path and query string, or ``None`` if there
+        is nothing there. Queries are answered by keeping the items of the
+        collection at the path whose fields match every parameter, ignoring
+        case.
+
+        :param str path: The path, relative to the web services root.
+        :param str query: The query string, if any."""
+
+        json_data = self.document(path)
+        if json_data is not None and query:
+            if not isinstance(json_data, list):
+                return None
+            criteria = [(field, value.lower()) for field, value in parse_qsl(query)]
+            json_data = [item for item in json_data if all(
+             str(item.get(field)).lower() == value for field, value in criteria
+            )]
+        return json_data
+
+
+    def respond(self, path, query=""):
+        """Returns the encoded JSON response for a path and query string, or
+        ``None`` if there is nothing there (see :py:meth:`query`).
+
+        :param str path: The path, relative to the web services root.
+        :param str query: The query string, if any.
+        :rtype: bytes"""
+
+        key = (path, query)
+        with self._lock:
+            if key in self._encoded:
+                self._encoded.move_to_end(key)
+                return self._encoded[key]
+        json_data = self.query(path, query)
+        if json_data is None:
+            return None
+        body = json.dumps(json_data).encode()
+        with self._lock:
+            self._encoded[key] = body
+            while len(self._encoded) > self.MAX_ENCODED:
+                self._encoded.popitem(last=False)
+        return body
+
+
+
+class SnapshotData(ServerData):
+    """Data read from a snapshot directory, which holds one JSON file per
+    path (see :py:func:`snapshot_file`). Files are read when first requested.
+
+    :param str directory: The snapshot directory."""
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            raise ValueError("'%s' is not a directory" % str(directory))
+        ServerData.__init__(self)
+        self._directory = directory
+
+
+    def __repr__(self):
+        return "<SnapshotData '%s'>" % self._directory
+
+
+    def document(self, path):
+        if ".." in path.split("/"):
+            return None
+        try:
+            with open(snapshot_file(self._directory, path), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+
+class SyntheticData(ServerData):
+    """Randomly generated data with the same shape as the GtoP web services,
+    in which every ID refers to something which exists.
+
+    :param int ligands: The number of ligands (default is 1000).
+    :param int targets: The number of targets (default is 200).
+    :param int families: The number of target families (default is 20).
+    :param int interactions: The number of interactions (default is 5000).
+    :param int seed: The random seed, so that the same data is generated \
+    every time (default is 0)."""
+
+    SPECIES = ("Human", "Mouse", "Rat")
+    LIGAND_TYPES = ("Synthetic organic", "Metabolite", "Natural product", "Peptide")
+    TARGET_TYPES = ("GPCR", "LGIC", "VGIC", "NHR", "Enzyme", "Transporter")
+
+    def __init__(self, ligands=1000, targets=200, families=20, interactions=5000, seed=0):
+        for name, value in (("ligands", ligands), ("targets", targets),
+         ("families", families), ("interactions", interactions)):
+            if not isinstance(value, int):
+                raise TypeError("%s must be int, not '%s'" % (name, str(value)))
+            if value < 1:
+                raise ValueError("%s must be greater than zero, not %i" % (name, value))
+        ServerData.__init__(self, self._generate(
+         ligands, targets, families, interactions, random.Random(seed)
+        ))
+
+
+    def _generate(self, ligand_count, target_count, family_count,
+     interaction_count, rng):
+        documents = OrderedDict()
+        ligands, targets, families, interactions = [], [], [], []
+        for family_id in range(1, family_count + 1):
+            families.append({
+             "familyId": family_id, "name": "Synthetic family %i" % family_id,
+             "targetIds": [], "parentFamilyIds": [], "subFamilyIds": []
+            })
+        for target_id in range(1, target_count + 1):
+            family = families[(target_id - 1) % family_count]
+            family["targetIds"].append(target_id)
+            targets.append({
+             "targetId": target_id, "name": "Synthetic target %i" % target_id,
+             "abbreviation": "ST%i" % target_id, "systematicName": None,
+             "type": rng.choice(self.TARGET_TYPES),
+             "familyIds": [family["familyId"]], "subunitIds": [], "complexIds": []
+            })
+        for ligand_id in range(1, ligand_count + 1):
+            ligands.append({
+             "ligandId": ligand_id, "name": "Synthetic ligand %i" % ligand_id,
+             "abbreviation": "", "inn": None,
+             "type": rng.choice(self.LIGAND_TYPES), "species": None,
+             "radioactive": False, "labelled": False,
+             "approved": rng.random() < 0.1, "withdrawn": False,
+             "approvalSource": "", "subunitIds": [], "complexIds": [],
+             "prodrugIds": [], "activeDrugIds": []
+            })
+        for interaction_id in range(1, interaction_count + 1):
+            low = round(rng.uniform(4, 9), 1)
+            interactions.append({
+             "interactionId": interaction_id,
+             "targetId": rng.randint(1, target_count), "ligandAsTargetId": 0,
+             "targetSpecies": rng.choice(self.SPECIES),
+             "primaryTarget": rng.random() < 0.2, "targetBindingSite": "",
+             "ligandId": rng.randint(1, ligand_count), "ligandContext": "",
+             "endogenous": rng.random() < 0.1, "type": "Agonist",
+             "action": "Agonist", "actionComment": "", "selectivity": "None",
+             "concentrationRange": "-",
+             "affinity": "%.1f - %.1f" % (low, low + 1),
+             "affinityParameter": "pKi", "originalAffinity": "",
+             "originalAffinityType": "Ki", "originalAffinityRelation": "",
+             "assayDescription": "", "assayConditions": "",
+             "useDependent": False, "voltageDependent": False, "voltage": "-",
+             "physiologicalVoltage": False, "conciseView": False,
+             "dataPoints": [], "refs": []
+            })
+
+        documents["ligands"] = ligands
+        documents["targets"] = targets
+        documents["targets/families"] = families
+        documents["interactions"] = interactions
+        for family in families:
+            documents["targets/families/%i" % family["familyId"]] = family
+        for ligand in ligands:
+            path = "ligands/%i" % ligand["ligandId"]
+            documents[path] = ligand
+            documents[path + "/structure"] = {
+             "ligandId": ligand["ligandId"], "iupacName": ligand["name"],
+             "smiles": "C" * rng.randint(1, 20), "inchi": "", "inchiKey": "",
+             "oneLetterSeq": None, "threeLetterSeq": None,
+             "postTranslationalModifications": "", "chemicalModifications": ""
+            }
+            documents[path + "/molecularProperties"] = {
+             "hydrogenBondAcceptors": rng.randint(0, 10),
+             "hydrogenBondDonors": rng.randint(0, 5),
+             "rotatableBonds": rng.randint(0, 10),
+             "topologicalPolarSurfaceArea": round(rng.uniform(0, 150), 2),
+             "molecularWeight": round(rng.uniform(100, 800), 2),
+             "logP": round(rng.uniform(-2, 6), 2),
+             "lipinskisRuleOfFive": rng.randint(0, 2)
+            }
+            documents[path + "/synonyms"] = [{"name": "SL-%i" % ligand["ligandId"]}]
+            documents[path + "/comments"] = {"comments": ""}
+            documents[path + "/databaseLinks"] = []
+            documents[path + "/interactions"] = []
+        for target in targets:
+            path = "targets/%i" % target["targetId"]
+            documents[path] = target
+            documents[path + "/synonyms"] = [{"name": target["abbreviation"]}]
+            documents[path + "/databaseLinks"] = []
+            documents[path + "/geneProteinInformation"] = [{
+             "targetId": target["targetId"], "species": species,
+             "geneSymbol": "GENE%i" % target["targetId"], "geneName": target["name"],
+             "officialGeneId": str(target["targetId"]), "genomicLocation": "",
+             "aminoAcids": str(rng.randint(100, 1500)),
+             "transmembraneDomains": "7", "poreLoops": "0", "refs": []
+            } for species in self.SPECIES]
+            documents[path + "/interactions"] = []
+            documents[path + "/pdbStructure"] = []
+        for interaction in interactions:
+            documents["ligands/%i/interactions" % interaction["ligandId"]].append(interaction)
+            documents["targets/%i/interactions" % interaction["targetId"]].append(interaction)
+        return documents
+
+
+
+class StandInServer:
+    """A local asyncio HTTP server which answers GtoP web services requests
+    from a :py:class:`ServerData`. Once started, point pyGtoP at
+    :py:meth:`url` with :py:func:`.configure_endpoints`.
+
+    :param data: The :py:class:`ServerData` to serve.
+    :param str host: The address to listen on (default is ``127.0.0.1``).
+    :param int port: The port to listen on - by default a free one is chosen.
+    :param latency: The number of seconds to wait before each response, or a \
+    ``(minimum, maximum)`` tuple to wait a random time in that range.
+    :param float error_rate: The fraction of requests which are answered with \
+    ``error_status`` instead (default is 0).
+    :param int error_status: The status code of injected errors (default is 503).
+    :param int seed: A random seed, to make latency and errors repeatable."""
+
+    def __init__(self, data, host="127.0.0.1", port=0, latency=0, error_rate=0,
+     error_status=503, seed=None):
+        if not isinstance(data, ServerData):
+            raise TypeError("data must be ServerData, not '%s'" % str(data))
+        latencies = latency if isinstance(latency, tuple) else (latency, latency)
+        for value in latencies:
+            if not isinstance(value, (int, float)):
+                raise TypeError("latency must be numeric, not '%s'" % str(value))
+            if value < 0:
+                raise ValueError("latency cannot be negative, not %s" % str(value))
+        if not isinstance(error_rate, (int, float)):
+            raise TypeError("error_rate must be numeric, not '%s'" % str(error_rate))
+        if not 0 <= error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1, not %s" % str(error_rate))
+        self._data = data
+        self._host = host
+        self._port = port
+        self._latency = latencies
+        self._error_rate = error_rate
+        self._error_status = error_status
+        self._random = random.Random(seed)
+        self._loop = None
+        self._thread = None
+        self._error = None
+        self._stats = {"requests": 0, "not_found": 0, "errors_injected": 0}
+
+
+    def __repr__(self):
+        return "<StandInServer (%s)>" % (self.url() if self._thread else "stopped")
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def url(self):
+        """Returns the root URL the server answers web services requests at.
+
+        :rtype: str"""
+
+        return "http://%s:%i/services/" % (self._host, self._port)
+
+
+    def start(self):
+        """Starts the server on a background thread.
+
+        :rtype: :py:class:`StandInServer`"""
+
+        if self._thread is not None:
+            return self
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread, error, self._error = None, self._error, None
+            raise error
+        return self
+
+
+    def stop(self):
+        """Stops the server, closing any open connections."""
+
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+
+    def serve_forever(self):
+        """Starts the server and blocks until interrupted."""
+
+        self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            self.stop()
+
+
+    def stats(self):
+        """Returns the number of ``requests`` received, answered as
+        ``not_found``, and answered with an injected error.
+
+        :rtype: dict"""
+
+        return dict(self._stats)
+
+
+    def _run(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            server = self._loop.run_until_complete(
+             asyncio.start_server(self._handle, self._host, self._port)
+            )
+        except OSError as e:
+            self._error = e
+            ready.set()
+            self._loop.close()
+            return
+        self._port = server.sockets[0].getsockname()[1]
+        ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(
+             asyncio.gather(*tasks, return_exceptions=True)
+            )
+            self._loop.close()
+
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("content-length"):
+                    await reader.readexactly(int(headers["content-length"]))
+                method, target, version = request_line.decode("latin-1").split()
+                status, body = await self._respond(target)
+                keep_alive = version == "HTTP/1.1" and (
+                 headers.get("connection", "").lower() != "close"
+                )
+                writer.write((
+                 "HTTP/1.1 %i %s\r\nContent-Type: application/json\r\n"
+                 "Content-Length: %i\r\nConnection: %s\r\n\r\n" % (
+                  status, REASONS.get(status, ""), len(body),
+                  "keep-alive" if keep_alive else "close"
+                 )
+                ).encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def _respond(self, target):
+        self._stats["requests"] += 1
+        low, high = self._latency
+        if high:
+            await asyncio.sleep(self._random.uniform(low, high))
+        if self._error_rate and self._random.random() < self._error_rate:
+            self._stats["errors_injected"] += 1
+            return self._error_status, b""
+        body = self._data.respond(*split_target(target))
+        if body is None:
+            self._stats["not_found"] += 1
+            return 404, b""
+        return 200, body
+
+
+
+class InProcessBackend(transport.Backend):
+    """A transport backend which answers GtoP requests straight from a
+    :py:class:`ServerData`, in the same process and with no sockets, so that
+    the rest of pyGtoP's request handling can be exercised with no network:
+
+        >>> transport.set_backend(server.InProcessBackend(server.SyntheticData()))
+
+    Requests to any other service are answered with a 404.
+
+    :param data: The :py:class:`ServerData` to serve.
+    :param str root_url: The root URL of the web services being stood in for \
+    (default is the GtoP root URL)."""
+
+    def __init__(self, data, root_url="http://www.guidetopharmacology.org/services/"):
+        if not isinstance(data, ServerData):
+            raise TypeError("data must be ServerData, not '%s'" % str(data))
+        self._data = data
+        self._root_url = root_url
+
+
+    def send(self, method, url, **kwargs):
+        response = requests.Response()
+        response.url = url
+        response.headers = requests.structures.CaseInsensitiveDict(
+         {"Content-Type": "application/json"}
+        )
+        body = None
+        if url.startswith(self._root_url):
+            body = self._data.respond(*split_target(url[len(self._root_url):]))
+        response.status_code = 404 if body is None else 200
+        response._content = body or b""
+        response._content_consumed = True
+        return response
+
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+     prog="python -m pygtop.server",
+     description="Serve a stand-in for the GtoP web services."
+    )
+    parser.add_argument("--snapshot", help="a snapshot directory to serve")
+    parser.add_argument("--synthetic", type=int, default=1000, metavar="LIGANDS",
+     help="the number of ligands to generate if there is no snapshot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0,
+     help="seconds to wait before each response")
+    parser.add_argument("--error-rate", type=float, default=0,
+     help="the fraction of requests to answer with a 503")
+    args = parser.parse_args(args)
+    if args.snapshot and os.path.exists(os.path.join(args.snapshot, "manifest.json")):
+        from .snapshot import Snapshot
+        data = Snapshot(args.snapshot)
+    elif args.snapshot:
+        data = SnapshotData(args.snapshot)
+    else:
+        data = SyntheticData(ligands=args.synthetic)
+    server = StandInServer(
+     data, host=args.host, port=args.port,
+     latency=args.latency, error_rate=args.error_rate
+    )
+    server.start()
+    print("Serving %s at %s" % (data, server.url()))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,12 @@
 
 import re
 import html
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+import weakref
+from . import transport
+from .exceptions import NoResponseError
 
 class DatabaseLink:
     """A link to an external database, containing accession and species
@@ -129,6 +135,72 @@ class Gene:
 
 
 
+class BatchResult(list):
+    """A list of objects fetched by ID, in the order their IDs were first
+    given. IDs which had no object in the database are not included, but can be
+    obtained with :py:meth:`missing_ids`.
+
+    :param objects: The objects which were found.
+    :param missing_ids: The IDs which were not found."""
+
+    def __init__(self, objects, missing_ids):
+        list.__init__(self, objects)
+        self._missing_ids = missing_ids
+
+
+    def __repr__(self):
+        return "<BatchResult (%i found, %i missing)>" % (
+         len(self), len(self._missing_ids)
+        )
+
+
+    def missing_ids(self):
+        """The IDs for which no object exists in the database.
+
+        :returns: list of ``int``"""
+
+        return self._missing_ids
+
+
+
+def fetch_by_ids(getter, ids, missing_error, max_workers=None):
+    """Calls a get-by-ID function on many IDs concurrently, using a bounded
+    pool of worker threads. Repeated IDs are only fetched once.
+
+    :param getter: The function which takes an ID and returns an object.
+    :param ids: The IDs to fetch.
+    :param missing_error: The exception the getter raises for a missing ID.
+    :param int max_workers: The number of requests to have in progress at \
+    once (default is the connection pool size).
+    :rtype: :py:class:`BatchResult`"""
+
+    ids = list(ids)
+    for id_ in ids:
+        if not isinstance(id_, int):
+            raise TypeError("IDs must be int, not '%s'" % str(id_))
+    if max_workers is None:
+        max_workers = transport.POOL_MAXSIZE
+    if not isinstance(max_workers, int):
+        raise TypeError("max_workers must be int, not '%s'" % str(max_workers))
+    if max_workers < 1:
+        raise ValueError("max_workers must be greater than zero, not %i" % max_workers)
+
+    unique_ids = list(dict.fromkeys(ids))
+    objects, missing_ids = [], []
+    if unique_ids:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_ids))) as executor:
+            futures = [executor.submit(
+             contextvars.copy_context().run, getter, id_
+            ) for id_ in unique_ids]
+        for id_, future in zip(unique_ids, futures):
+            try:
+                objects.append(future.result())
+            except missing_error:
+                missing_ids.append(id_)
+    return BatchResult(objects, missing_ids)
+
+
+
 def strip_html(func):
     """A decorator which, when applied to a function, will add a 'strip_html'
     keyword argument - if set to True this will strip any HTML from the
@@ -147,3 +219,139 @@ def strip_html(func):
     new_func.__name__ = func.__name__
     new_func.__doc__ = func.__doc__
     return new_func
+
+
+def memoise(func):
+    """A decorator which, when applied to a method which fetches JSON from the
+    web services, makes it fetch the JSON only the first time it is called on
+    each object, and return the same JSON on later calls. The object must
+    have a ``_memos`` dictionary to store it in - clearing this makes the JSON
+    be fetched again.
+
+    It can be given a type, as in ``@memoise(dict)``, in which case an empty
+    instance of it is returned when the method returns ``None`` - because
+    there is nothing there. If the method raises :class:`.NoResponseError`,
+    because the fetch failed, the empty value is returned but nothing is
+    stored, so the next call tries again."""
+
+    if isinstance(func, type):
+        empty = func
+        return lambda func: _memoise(func, empty)
+    return _memoise(func, None)
+
+
+def _memoise(func, empty):
+    def new_func(self):
+        if func.__name__ in self._memos:
+            return self._memos[func.__name__]
+        try:
+            json_data = func(self)
+        except NoResponseError:
+            return None if empty is None else empty()
+        if json_data is None and empty is not None:
+            json_data = empty()
+        self._memos[func.__name__] = json_data
+        return json_data
+    new_func.__name__ = func.__name__
+    new_func.__doc__ = func.__doc__
+    return new_func
+
+
+
+class IdentityMap:
+    """Keeps track of the ligands, targets and target families which are
+    currently in use, so that there is only ever one live object for each
+    GtoP ID. Looking up an ID which already has an object returns that object,
+    with whatever sub-resources it has already fetched, rather than a new one.
+
+    Objects are only weakly referenced, so they are forgotten once nothing
+    else is using them. Install a map with :py:func:`set_identity_map`."""
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return "<IdentityMap (%i objects)>" % len(self._objects)
+
+
+    def __len__(self):
+        return len(self._objects)
+
+
+    def get(self, cls, id_):
+        """Returns the live object of a class with a given ID, or ``None`` if
+        there isn't one.
+
+        :param cls: The class - such as :py:class:`.Ligand`.
+        :param int id_: The GtoP ID."""
+
+        with self._lock:
+            return self._objects.get((cls, id_))
+
+
+    def canonical(self, cls, id_, json_data):
+        """Returns the live object of a class with a given ID, creating it
+        from JSON if there isn't one.
+
+        :param cls: The class - such as :py:class:`.Ligand`.
+        :param int id_: The GtoP ID.
+        :param json_data: A dictionary obtained from the web services."""
+
+        with self._lock:
+            obj = self._objects.get((cls, id_))
+            if obj is None:
+                obj = cls(json_data)
+                self._objects[(cls, id_)] = obj
+            return obj
+
+
+    def clear(self):
+        """Forgets every object."""
+
+        with self._lock:
+            self._objects.clear()
+
+
+
+identity_map = None
+
+def set_identity_map(new_map):
+    """Sets the :py:class:`IdentityMap` which ligands, targets and target
+    families are looked up in. Pass ``None`` (the default) to create a new
+    object every time one is requested.
+
+    :param new_map: The new :py:class:`IdentityMap`, or ``None``.
+    :rtype: :py:class:`IdentityMap`"""
+
+    if new_map is not None and not isinstance(new_map, IdentityMap):
+        raise TypeError("identity map must be IdentityMap, not '%s'" % str(new_map))
+    global identity_map
+    identity_map = new_map
+    return new_map
+
+
+def live_object(cls, id_):
+    """Returns the live object of a class with a given ID from the current
+    :py:class:`IdentityMap`, or ``None`` if there isn't one.
+
+    :param cls: The class - such as :py:class:`.Ligand`.
+    :param int id_: The GtoP ID."""
+
+    current = identity_map
+    return None if current is None else current.get(cls, id_)
+
+
+def canonical(cls, id_, json_data):
+    """Creates an object from JSON - or, if an :py:class:`IdentityMap` is set
+    and already has a live object with that ID, returns that instead.
+
+    :param cls: The class - such as :py:class:`.Ligand`.
+    :param int id_: The GtoP ID.
+    :param json_data: A dictionary obtained from the web services."""
+
+    current = identity_map
+    if current is None:
+        return cls(json_data)
+    return current.canonical(cls, id_, json_data)
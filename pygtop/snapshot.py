@@ -0,0 +1,433 @@
+"""Functions for downloading a complete local copy of the Guide to
+PHARMACOLOGY database.
+
+A snapshot is a directory holding a ``manifest.json`` file and one JSON Lines
+file per kind of record - ligands, targets, target families and interactions.
+Each ligand and target record holds the object itself along with every one of
+its sub-resources, so that nothing more needs to be fetched:
+
+    >>> from pygtop import snapshot
+    >>> snapshot.download("gtop-snapshot", workers=16)
+    ligands: 9412/9412 (100%) 88.2/s ETA 0s
+    targets: 2989/2989 (100%) 91.5/s ETA 0s
+
+Downloads can be interrupted and resumed - records already written are kept,
+and only the missing ones are fetched when :py:func:`download` is run again on
+the same directory. Once complete, the files are compressed with gzip.
+
+A complete snapshot can then stand in for the web services entirely, so that
+pyGtoP can be used with no network access at all:
+
+    >>> pygtop.use_snapshot("gtop-snapshot")
+    >>> pygtop.get_ligand_by_id(5239).smiles()
+    'CC1=C(C(=O)CC1(C)C)/C=C/C(=C/C=C/C(=C/C(=O)O)/C)/C'
+
+Every record is held in memory and indexed by the path it would have been
+requested from, so lookups take microseconds. SMILES searches need the web
+services, and return nothing while a snapshot is in use."""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import contextvars
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import requests
+from . import gtop
+from .server import ServerData
+from .exceptions import NoResponseError, ServiceUnavailableError
+
+FORMAT = 1
+
+LIGAND_RESOURCES = (
+ "structure", "molecularProperties", "synonyms", "comments",
+ "databaseLinks", "interactions"
+)
+
+TARGET_RESOURCES = (
+ "synonyms", "databaseLinks", "geneProteinInformation", "interactions",
+ "pdbStructure"
+)
+
+KINDS = ("ligands", "targets", "families", "interactions")
+
+def download(path, workers=8, progress=True, compress=True):
+    """Downloads every ligand, target, target family and interaction - with
+    all their sub-resources - to a snapshot directory, fetching them
+    concurrently. If the directory already holds a partial snapshot, only the
+    records it is missing are downloaded.
+
+    A ligand or target whose sub-resources could not all be fetched is left
+    out, and once everything else is written :py:class:`.NoResponseError` is
+    raised, so that running it again fetches just those. The snapshot is only
+    marked complete when nothing failed. Sub-resources which GtoP says do not
+    exist (a 404) are recorded as ``None``.
+
+    The snapshot is tagged with the GtoP release it was downloaded from (see
+    :py:func:`.current_release`). If the directory holds a snapshot of an
+    older release, it is downloaded again from scratch.
+
+    :param str path: The directory to write the snapshot to, which is created \
+    if needed.
+    :param int workers: The number of requests to have in progress at once \
+    (default is 8).
+    :param bool progress: If ``True`` (the default), the throughput and \
+    estimated time remaining are printed to standard error as it runs.
+    :param bool compress: If ``True`` (the default), the files are compressed \
+    with gzip once the snapshot is complete.
+    :returns: The snapshot's manifest, as a ``dict``."""
+
+    if not isinstance(path, str):
+        raise TypeError("path must be str, not '%s'" % str(path))
+    if not isinstance(workers, int):
+        raise TypeError("workers must be int, not '%s'" % str(workers))
+    if workers < 1:
+        raise ValueError("workers must be greater than zero, not %i" % workers)
+    os.makedirs(path, exist_ok=True)
+    manifest = read_manifest(path)
+    release = gtop.current_release()
+    if manifest and release and manifest.get("release") not in (None, release):
+        # The records are from an older release, so start again
+        for kind in KINDS:
+            for filename in (_filename(path, kind), _filename(path, kind) + ".gz"):
+                if os.path.exists(filename):
+                    os.remove(filename)
+        manifest = None
+    if manifest and manifest["complete"]:
+        return manifest
+    manifest = {
+     "format": FORMAT,
+     "release": release,
+     "started": manifest["started"] if manifest else _now(),
+     "completed": None,
+     "complete": False,
+     "counts": {}
+    }
+    _write_manifest(path, manifest)
+
+    ligands = gtop.get_json_from_gtop("ligands", raise_errors=True)
+    targets = gtop.get_json_from_gtop("targets", raise_errors=True)
+    families = gtop.get_json_from_gtop("targets/families", raise_errors=True)
+    if ligands is None or targets is None or families is None:
+        raise IOError("Could not get the ligand, target and family lists from GtoP")
+    if not _has_records(path, "families"):
+        _write_all(path, "families", families)
+    if not _has_records(path, "interactions"):
+        _write_all(path, "interactions", gtop.iter_json_from_gtop(
+         "interactions", raise_errors=True
+        ))
+    manifest["counts"]["families"] = len(families)
+    manifest["counts"]["interactions"] = sum(1 for _ in iter_records(path, "interactions"))
+
+    failed = {}
+    manifest["counts"]["ligands"], failed["ligands"] = _crawl(
+     path, "ligands", "ligandId", ligands, LIGAND_RESOURCES, workers, progress
+    )
+    manifest["counts"]["targets"], failed["targets"] = _crawl(
+     path, "targets", "targetId", targets, TARGET_RESOURCES, workers, progress
+    )
+    if any(failed.values()):
+        manifest["failed"] = failed
+        _write_manifest(path, manifest)
+        raise NoResponseError(
+         "%i ligands and %i targets could not be downloaded - run download "
+         "again to fetch them" % (failed["ligands"], failed["targets"])
+        )
+    if compress:
+        for kind in KINDS:
+            _compress(path, kind)
+    manifest["completed"] = _now()
+    manifest["complete"] = True
+    _write_manifest(path, manifest)
+    return manifest
+
+
+def load(path):
+    """Loads a complete snapshot from a directory.
+
+    :param str path: The snapshot directory.
+    :rtype: :py:class:`Snapshot`"""
+
+    return Snapshot(path)
+
+
+def use_snapshot(path):
+    """Answers every GtoP query from a snapshot from now on, making no
+    requests at all. Pass ``None`` to go back to using the web services.
+
+    :param path: The snapshot directory, an already loaded \
+    :py:class:`Snapshot`, or ``None``.
+    :rtype: :py:class:`Snapshot`"""
+
+    if path is not None and not isinstance(path, Snapshot):
+        path = load(path)
+    return gtop.set_offline_data(path)
+
+
+def read_manifest(path):
+    """Returns the manifest of the snapshot in a directory, or ``None`` if
+    there isn't one.
+
+    :param str path: The snapshot directory.
+    :rtype: dict"""
+
+    try:
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != FORMAT:
+        raise ValueError("%s is a format %s snapshot - this version of pyGtoP reads format %i" % (
+         path, manifest.get("format"), FORMAT
+        ))
+    return manifest
+
+
+def iter_records(path, kind):
+    """Yields the records of one kind in a snapshot directory, one at a time.
+
+    :param str path: The snapshot directory.
+    :param str kind: ``"ligands"``, ``"targets"``, ``"families"`` or \
+    ``"interactions"``.
+    :returns: generator of ``dict``"""
+
+    if kind not in KINDS:
+        raise ValueError("'%s' is not a kind of snapshot record" % str(kind))
+    filename = _filename(path, kind)
+    if os.path.exists(filename + ".gz"):
+        f = gzip.open(filename + ".gz", "rt", encoding="utf-8")
+    elif os.path.exists(filename):
+        f = open(filename, encoding="utf-8")
+    else:
+        return
+    with f:
+        for line in f:
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+
+class Snapshot(ServerData):
+    """A complete snapshot, read into memory and indexed by the path each
+    record would be requested from - ``ligands/1``, ``ligands/1/structure``,
+    ``targets/families`` and so on. As a :py:class:`.ServerData`, it can also
+    be served by a :py:class:`.StandInServer`.
+
+    :param str path: The snapshot directory."""
+
+    def __init__(self, path):
+        manifest = read_manifest(path)
+        if manifest is None or not manifest["complete"]:
+            raise ValueError("'%s' is not a complete snapshot" % str(path))
+        ServerData.__init__(self)
+        self._path = path
+        self._manifest = manifest
+        documents = self._documents
+        for kind, id_key, resources in (
+         ("ligands", "ligandId", LIGAND_RESOURCES),
+         ("targets", "targetId", TARGET_RESOURCES)):
+            records = sorted(iter_records(path, kind), key=lambda r: r[id_key])
+            documents[kind] = [record[kind[:-1]] for record in records]
+            for record in records:
+                prefix = "%s/%i" % (kind, record[id_key])
+                documents[prefix] = record[kind[:-1]]
+                for resource in resources:
+                    if record[resource] is not None:
+                        documents["%s/%s" % (prefix, resource)] = record[resource]
+        documents["targets/families"] = list(iter_records(path, "families"))
+        for family in documents["targets/families"]:
+            documents["targets/families/%i" % family["familyId"]] = family
+        documents["interactions"] = list(iter_records(path, "interactions"))
+        for interaction in documents["interactions"]:
+            documents["interactions/%i" % interaction["interactionId"]] = interaction
+
+
+    def __repr__(self):
+        return "<Snapshot '%s' (%i ligands, %i targets)>" % (
+         self._path, len(self._documents["ligands"]),
+         len(self._documents["targets"])
+        )
+
+
+    def release(self):
+        """Returns the GtoP release the snapshot was downloaded from, or
+        ``None`` if it isn't known.
+
+        :rtype: str"""
+
+        return self._manifest.get("release")
+
+
+    def manifest(self):
+        """Returns the snapshot's manifest.
+
+        :rtype: ``dict``"""
+
+        return self._manifest
+
+
+
+def _crawl(path, kind, id_key, objects, resources, workers, progress):
+    done = _resume(path, kind, id_key)
+    remaining = [obj for obj in objects if obj[id_key] not in done]
+    meter = _Progress(kind, len(done) + len(remaining), len(done), progress)
+    prefix = "ligands" if kind == "ligands" else "targets"
+    with open(_filename(path, kind), "a", encoding="utf-8") as f:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(
+             contextvars.copy_context().run, _hydrate,
+             prefix, id_key, obj, resources
+            ) for obj in remaining]
+            failed = 0
+            try:
+                for future in as_completed(futures):
+                    try:
+                        record = future.result()
+                    except (NoResponseError, ServiceUnavailableError,
+                     requests.RequestException):
+                        # Left out of the file, so that a resume fetches it
+                        failed += 1
+                        continue
+                    f.write(_encode(record))
+                    meter.update()
+                    if meter.done % 100 == 0:
+                        f.flush()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    meter.finish()
+    return meter.done, failed
+
+
+def _hydrate(prefix, id_key, obj, resources):
+    record = {id_key: obj[id_key], prefix[:-1]: obj}
+    for resource in resources:
+        record[resource] = gtop.get_json_from_gtop(
+         "%s/%i/%s" % (prefix, obj[id_key], resource), raise_errors=True
+        )
+    return record
+
+
+def _resume(path, kind, id_key):
+    filename = _filename(path, kind)
+    if os.path.exists(filename + ".gz") and not os.path.exists(filename):
+        with gzip.open(filename + ".gz", "rb") as source:
+            with open(filename, "wb") as destination:
+                shutil.copyfileobj(source, destination)
+        os.remove(filename + ".gz")
+    if not os.path.exists(filename):
+        return set()
+    done, good_bytes = set(), 0
+    with open(filename, "rb") as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError
+                done.add(json.loads(line)[id_key])
+            except (ValueError, KeyError):
+                break
+            good_bytes += len(line)
+    # Drop anything written after the last complete record
+    with open(filename, "r+b") as f:
+        f.truncate(good_bytes)
+    return done
+
+
+def _has_records(path, kind):
+    filename = _filename(path, kind)
+    return os.path.exists(filename) or os.path.exists(filename + ".gz")
+
+
+def _write_all(path, kind, records):
+    filename = _filename(path, kind)
+    with open(filename + ".part", "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(_encode(record))
+    os.replace(filename + ".part", filename)
+
+
+def _compress(path, kind):
+    filename = _filename(path, kind)
+    if not os.path.exists(filename):
+        return
+    with open(filename, "rb") as source:
+        with gzip.open(filename + ".gz.part", "wb") as destination:
+            shutil.copyfileobj(source, destination)
+    os.replace(filename + ".gz.part", filename + ".gz")
+    os.remove(filename)
+
+
+def _write_manifest(path, manifest):
+    filename = os.path.join(path, "manifest.json")
+    with open(filename + ".part", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(filename + ".part", filename)
+
+
+def _filename(path, kind):
+    return os.path.join(path, "%s.jsonl" % kind)
+
+
+def _encode(record):
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+
+class _Progress:
+    """Prints how far through a crawl the download is, how fast it is going,
+    and how long it is likely to take, at most once a second."""
+
+    def __init__(self, label, total, done, enabled, stream=None):
+        self.label = label
+        self.total = total
+        self.done = done
+        self._enabled = enabled
+        self._stream = stream or sys.stderr
+        self._start = time.monotonic()
+        self._start_count = done
+        self._printed = 0
+        self._lock = threading.Lock()
+
+
+    def update(self, count=1):
+        with self._lock:
+            self.done += count
+            if self._enabled and time.monotonic() - self._printed >= 1:
+                self._print("\r")
+
+
+    def finish(self):
+        if self._enabled:
+            self._print("\r")
+            self._stream.write("\n")
+
+
+    def _print(self, start):
+        self._printed = time.monotonic()
+        elapsed = self._printed - self._start
+        rate = (self.done - self._start_count) / elapsed if elapsed > 0 else 0
+        remaining = (self.total - self.done) / rate if rate else 0
+        self._stream.write("%s%s: %i/%i (%.0f%%) %.1f/s ETA %s" % (
+         start, self.label, self.done, self.total,
+         100 * self.done / self.total if self.total else 100,
+         rate, _duration(remaining)
+        ))
+        self._stream.flush()
+
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "%ih%02im" % (seconds // 3600, seconds % 3600 // 60)
+    if seconds >= 60:
+        return "%im%02is" % (seconds // 60, seconds % 60)
+    return "%is" % seconds
@@ -4,7 +4,8 @@ from . import gtop
 from . import pdb
 from .interactions import Interaction, get_interaction_by_id
 from .exceptions import NoSuchTargetError, NoSuchTargetFamilyError
-from .shared import DatabaseLink, Gene, strip_html
+from .shared import DatabaseLink, Gene, strip_html, fetch_by_ids, memoise
+from .shared import canonical, live_object
 
 def get_target_by_id(target_id):
     """Returns a Target object of the target with the given ID.
@@ -15,13 +16,31 @@ def get_target_by_id(target_id):
 
     if not isinstance(target_id, int):
         raise TypeError("target_id must be int, not '%s'" % str(target_id))
+    target = live_object(Target, target_id)
+    if target is not None:
+        return target
     json_data = gtop.get_json_from_gtop("targets/%i" % target_id)
     if json_data:
-        return Target(json_data)
+        return canonical(Target, target_id, json_data)
     else:
         raise NoSuchTargetError("There is no target with ID %i" % target_id)
 
 
+def get_targets_by_ids(target_ids, max_workers=None):
+    """Returns the targets with the given IDs, fetching them concurrently.
+    Targets are returned in the order their IDs were given, with repeated IDs
+    only fetched once. Missing targets do not cause an exception - their IDs
+    are available from the result's ``missing_ids`` method.
+
+    :param target_ids: The GtoP IDs of the Targets desired.
+    :param int max_workers: The number of requests to have in progress at once.
+    :rtype: :py:class:`.BatchResult` of :py:class:`Target` objects"""
+
+    return fetch_by_ids(
+     get_target_by_id, target_ids, NoSuchTargetError, max_workers=max_workers
+    )
+
+
 def get_all_targets():
     """Returns a list of all targets in the Guide to PHARMACOLOGY database. This
     can take a few seconds.
@@ -29,7 +48,23 @@ def get_all_targets():
     :returns: list of :py:class:`Target` objects"""
 
     json_data = gtop.get_json_from_gtop("targets")
-    return [Target(t) for t in json_data]
+    gtop.record_ids("targets", [t["targetId"] for t in json_data])
+    return [canonical(Target, t["targetId"], t) for t in json_data]
+
+
+def iter_all_targets():
+    """Yields every target in the Guide to PHARMACOLOGY database, one at a
+    time as they are read from the network, so that the full list never has to
+    be held in memory.
+
+    :returns: generator of :py:class:`Target` objects"""
+
+    target_ids = []
+    for json_data in gtop.iter_json_from_gtop("targets"):
+        target_ids.append(json_data["targetId"])
+        yield canonical(Target, json_data["targetId"], json_data)
+    if target_ids:
+        gtop.record_ids("targets", target_ids)
 
 
 def get_targets_by(criteria):
@@ -46,7 +81,7 @@ def get_targets_by(criteria):
     search_string = "&".join(["%s=%s" % (key, criteria[key]) for key in criteria])
     json_data = gtop.get_json_from_gtop("targets?%s" % search_string)
     if json_data:
-        return [Target(t) for t in json_data]
+        return [canonical(Target, t["targetId"], t) for t in json_data]
     else:
         return []
 
@@ -77,20 +112,40 @@ def get_target_family_by_id(family_id):
 
     if not isinstance(family_id, int):
         raise TypeError("family_id must be int, not '%s'" % str(family_id))
+    family = live_object(TargetFamily, family_id)
+    if family is not None:
+        return family
     json_data = gtop.get_json_from_gtop("targets/families/%i" % family_id)
     if json_data:
-        return TargetFamily(json_data)
+        return canonical(TargetFamily, family_id, json_data)
     else:
         raise NoSuchTargetFamilyError("There is no Target Family with ID %i" % family_id)
 
 
+def get_target_families_by_ids(family_ids, max_workers=None):
+    """Returns the target families with the given IDs, fetching them
+    concurrently. Families are returned in the order their IDs were given, with
+    repeated IDs only fetched once. Missing families do not cause an exception
+    - their IDs are available from the result's ``missing_ids`` method.
+
+    :param family_ids: The GtoP IDs of the TargetFamilies desired.
+    :param int max_workers: The number of requests to have in progress at once.
+    :rtype: :py:class:`.BatchResult` of :py:class:`TargetFamily` objects"""
+
+    return fetch_by_ids(
+     get_target_family_by_id, family_ids, NoSuchTargetFamilyError,
+     max_workers=max_workers
+    )
+
+
 def get_all_target_families():
     """Returns a list of all target families in the Guide to PHARMACOLOGY database.
 
     :returns: list of :py:class:`TargetFamily` objects"""
 
     json_data = gtop.get_json_from_gtop("targets/families")
-    return [TargetFamily(f) for f in json_data]
+    gtop.record_ids("targets/families", [f["familyId"] for f in json_data])
+    return [canonical(TargetFamily, f["familyId"], f) for f in json_data]
 
 
 
@@ -109,12 +164,30 @@ class Target:
         self._family_ids = json_data["familyIds"]
         self._subunit_ids = json_data["subunitIds"]
         self._complex_ids = json_data["complexIds"]
+        self._memos = {}
 
 
     def __repr__(self):
         return "<Target %i (%s)>" % (self._target_id, self._name)
 
 
+    def __eq__(self, other):
+        return isinstance(other, Target) and other._target_id == self._target_id
+
+
+    def __hash__(self):
+        return hash((Target, self._target_id))
+
+
+    def refresh(self):
+        """Forgets the target's synonyms, database links, genes, interactions
+        and PDB structures, so that they are fetched from the web services
+        again the next time they are needed. Otherwise each is only fetched
+        once per target object, however many species it is filtered by."""
+
+        self._memos.clear()
+
+
     def target_id(self):
         """Returns the target's GtoP ID.
 
@@ -270,17 +343,18 @@ class Target:
 
 
     def ligands(self, species=None):
-        """Returns any ligands that this target interacts with.
+        """Returns any ligands that this target interacts with. Each distinct
+        ligand is fetched once, concurrently, however many interactions it has
+        with the target.
 
         :param str species: If given, only ligands belonging to this species will be returned.
-        :returns: list of  :class:`.DatabaseLink` objects."""
+        :returns: list of  :class:`.Ligand` objects."""
 
-        ligands = []
-        for interaction in self.interactions(species=species):
-            ligand = interaction.ligand()
-            if ligand not in ligands:
-                ligands.append(ligand)
-        return ligands
+        from .ligands import get_ligands_by_ids
+        return list(get_ligands_by_ids(
+         [interaction.ligand_id() for interaction in self.interactions(species=species)
+          if interaction.ligand_id() is not None]
+        ))
 
 
     @pdb.ask_about_molecupy
@@ -321,54 +395,56 @@ class Target:
 
 
     @pdb.ask_about_molecupy
-    def all_pdbs(self, species=None):
+    def all_pdbs(self, species=None, partial=False):
         """Get a list of PDB codes using all means available - annotated and
         external.
 
         :param bool as_molecupy: Returns the PDBs as \
         `molecuPy <http://molecupy.readthedocs.io>`_ PDB objects.
         :param str species: If given, only PDBs belonging to this species will be returned.
+        :param bool partial: If ``True``, return the PDBs from whichever \
+        searches finished before the current :py:func:`.deadline`.
         :returns: list of ``str`` PDB codes"""
 
-        return list(set(
-         self.gtop_pdbs(species=species) +
-         self.uniprot_pdbs(species=species)
-        ))
+        return pdb.gather_pdbs([
+         lambda: self.gtop_pdbs(species=species),
+         lambda: self.uniprot_pdbs(species=species)
+        ], partial=partial)
 
 
+    @memoise(list)
     def _get_synonym_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "targets/%i/synonyms" % self._target_id
+        return gtop.get_json_from_gtop(
+         "targets/%i/synonyms" % self._target_id, raise_errors=True
         )
-        return json_object if json_object else []
 
 
+    @memoise(list)
     def _get_database_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "targets/%i/databaseLinks" % self._target_id
+        return gtop.get_json_from_gtop(
+         "targets/%i/databaseLinks" % self._target_id, raise_errors=True
         )
-        return json_object if json_object else []
 
 
+    @memoise(list)
     def _get_gene_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "targets/%i/geneProteinInformation" % self._target_id
+        return gtop.get_json_from_gtop(
+         "targets/%i/geneProteinInformation" % self._target_id, raise_errors=True
         )
-        return json_object if json_object else []
 
 
+    @memoise(list)
     def _get_interactions_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "targets/%i/interactions" % self._target_id
+        return gtop.get_json_from_gtop(
+         "targets/%i/interactions" % self._target_id, raise_errors=True
         )
-        return json_object if json_object else []
 
 
+    @memoise(list)
     def _get_pdb_json(self):
-        json_object = gtop.get_json_from_gtop(
-         "targets/%i/pdbStructure" % self._target_id
+        return gtop.get_json_from_gtop(
+         "targets/%i/pdbStructure" % self._target_id, raise_errors=True
         )
-        return json_object if json_object else []
 
 
 
@@ -391,6 +467,14 @@ class TargetFamily:
         return "<'%s' TargetFamily>" % self._name
 
 
+    def __eq__(self, other):
+        return isinstance(other, TargetFamily) and other._family_id == self._family_id
+
+
+    def __hash__(self):
+        return hash((TargetFamily, self._family_id))
+
+
     def family_id(self):
         """Returns the family's GtoP ID.
 
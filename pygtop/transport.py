@@ -0,0 +1,1654 @@
+"""Functions for sending HTTP requests to the web services pyGtoP uses.
+
+All requests made by pyGtoP - to the Guide to PHARMACOLOGY and to the RSCB
+PDB - go through a single :py:class:`Backend`. By default this is a
+:py:class:`RequestsBackend`, which uses a pooled :py:class:`requests.Session`
+so that connections are kept alive and reused rather than opened afresh for
+every property lookup."""
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import base64
+import contextvars
+import gzip
+import json
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .exceptions import ServiceUnavailableError, DeadlineExceededError
+from .exceptions import UnrecordedRequestError
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+TIMEOUT = (10, 60)
+
+session = None
+session_settings = {}
+request_timeout = TIMEOUT
+cassette = None
+backend = None
+disk_cache = None
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline(seconds):
+    """A context manager which puts a time limit on everything inside it.
+    Every request made within it - however deeply nested, and including those
+    made on worker threads by pyGtoP's batch and asyncio functions - has its
+    timeouts shortened to fit, and once the time is up a
+    :py:class:`.DeadlineExceededError` is raised:
+
+        >>> with pygtop.deadline(5.0):
+        ...     pdbs = ligand.all_pdbs(partial=True)
+
+    Deadlines can be nested, in which case the earliest one applies.
+
+    :param float seconds: The number of seconds allowed."""
+
+    if not isinstance(seconds, (int, float)):
+        raise TypeError("seconds must be numeric, not '%s'" % str(seconds))
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(expires, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """Returns the number of seconds left before the current deadline, or
+    ``None`` if there is no deadline.
+
+    :rtype: float"""
+
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def check_deadline():
+    """Raises :py:class:`.DeadlineExceededError` if the current deadline has
+    passed."""
+
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError("Deadline exceeded by %.2fs" % -remaining)
+
+
+def sleep(seconds):
+    """Sleeps for a number of seconds, unless that would take it past the
+    current deadline, in which case :py:class:`.DeadlineExceededError` is
+    raised straight away.
+
+    :param float seconds: The number of seconds to sleep for."""
+
+    remaining = remaining_time()
+    if remaining is not None and seconds >= remaining:
+        raise DeadlineExceededError(
+         "Waiting %.2fs would exceed the deadline" % seconds
+        )
+    time.sleep(seconds)
+
+
+def set_timeout(connect=TIMEOUT[0], read=TIMEOUT[1]):
+    """Sets the timeouts applied to every request.
+
+    :param float connect: The number of seconds allowed to connect to a \
+    server (default is 10).
+    :param float read: The number of seconds allowed between bytes received \
+    from a server (default is 60)."""
+
+    for name, value in (("connect", connect), ("read", read)):
+        if not isinstance(value, (int, float)):
+            raise TypeError("%s must be numeric, not '%s'" % (name, str(value)))
+        if value <= 0:
+            raise ValueError("%s must be greater than zero, not %s" % (name, str(value)))
+    global request_timeout
+    request_timeout = (connect, read)
+
+
+def effective_timeout(timeout=None):
+    """Returns the ``(connect, read)`` timeouts to use for a request - the
+    ones given, or the defaults - shortened to fit within the current deadline.
+
+    :param timeout: The timeouts asked for, if any.
+    :raises: :class:`.DeadlineExceededError` if the deadline has passed.
+    :rtype: tuple"""
+
+    if timeout is None:
+        timeout = request_timeout
+    remaining = remaining_time()
+    if remaining is not None:
+        check_deadline()
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        timeout = tuple(
+         remaining if limit is None else min(limit, remaining) for limit in timeout
+        )
+    return timeout
+
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """A connection pool adapter which applies the default timeouts to every
+    request sent through it, shortened to fit within the current deadline."""
+
+    def send(self, request, timeout=None, **kwargs):
+        try:
+            return HTTPAdapter.send(
+             self, request, timeout=effective_timeout(timeout), **kwargs
+            )
+        except requests.Timeout as e:
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceededError("Deadline exceeded during request") from e
+            raise
+
+
+def configure_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+ pool_block=False, keep_alive=True, host_limits=None):
+    """Replaces the shared session with a new one configured as specified.
+    The settings used are kept in ``session_settings``.
+
+    :param int pool_connections: The number of per-host connection pools to \
+    keep (default is 10).
+    :param int pool_maxsize: The maximum number of connections to keep open to \
+    any one host (default is 10).
+    :param bool pool_block: If ``True``, requests will wait for a connection \
+    to become free rather than opening one beyond the pool size.
+    :param bool keep_alive: If ``False``, connections will be closed after \
+    each request.
+    :param dict host_limits: A dictionary of ``host=maxsize`` pairs giving \
+    connection limits for specific hosts which override ``pool_maxsize``.
+    :rtype: ``requests.Session``"""
+
+    for name, value in (("pool_connections", pool_connections),
+     ("pool_maxsize", pool_maxsize)):
+        if not isinstance(value, int):
+            raise TypeError("%s must be int, not '%s'" % (name, str(value)))
+        if value < 1:
+            raise ValueError("%s must be greater than zero, not %i" % (name, value))
+    if host_limits is not None and not isinstance(host_limits, dict):
+        raise TypeError("host_limits must be dict, not '%s'" % str(host_limits))
+
+    global session, session_settings
+    session_settings = {
+     "pool_connections": pool_connections, "pool_maxsize": pool_maxsize,
+     "pool_block": pool_block, "keep_alive": keep_alive,
+     "host_limits": host_limits
+    }
+    new_session = requests.Session()
+    adapter = TimeoutAdapter(
+     pool_connections=pool_connections,
+     pool_maxsize=pool_maxsize,
+     pool_block=pool_block
+    )
+    new_session.mount("http://", adapter)
+    new_session.mount("https://", adapter)
+    for host, limit in (host_limits or {}).items():
+        host_adapter = TimeoutAdapter(
+         pool_connections=1, pool_maxsize=limit, pool_block=pool_block
+        )
+        new_session.mount("http://%s/" % host, host_adapter)
+        new_session.mount("https://%s/" % host, host_adapter)
+    if not keep_alive:
+        new_session.headers["Connection"] = "close"
+    old_session, session = session, new_session
+    if old_session is not None:
+        old_session.close()
+    return session
+
+
+class RetryPolicy:
+    """Decides how failed requests to the web services are retried.
+
+    Failures are retried after an exponentially increasing, jittered delay,
+    unless the server sends a ``Retry-After`` header, in which case that is
+    used instead. Responses with a definitive status code (by default 400 and
+    404) are not retried at all, as asking again will not change the answer.
+
+    The policy keeps running counts of what it has done, which can be read
+    with :py:meth:`stats`. Subclass it and override :py:meth:`should_retry` or
+    :py:meth:`backoff` to change its behaviour, and install it with
+    :py:func:`set_retry_policy`.
+
+    :param float base_delay: The delay in seconds before the first retry.
+    :param float max_delay: The longest delay in seconds that will be used.
+    :param bool jitter: If ``True``, each delay is a random value between zero \
+    and the exponential delay, to stop many clients retrying in lockstep.
+    :param fail_fast_codes: The status codes which should never be retried."""
+
+    def __init__(self, base_delay=0.5, max_delay=30, jitter=True,
+     fail_fast_codes=(400, 404)):
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._jitter = jitter
+        self._fail_fast_codes = tuple(fail_fast_codes)
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.reset_stats()
+
+
+    def __repr__(self):
+        return "<RetryPolicy (base %ss, max %ss)>" % (
+         self._base_delay, self._max_delay
+        )
+
+
+    def should_retry(self, response):
+        """Returns ``False`` if the response is a definitive answer which a
+        retry would not change.
+
+        :param response: The failed ``requests.Response``.
+        :rtype: bool"""
+
+        return response.status_code not in self._fail_fast_codes
+
+
+    def backoff(self, attempt, response=None):
+        """Returns the number of seconds to wait before the given retry.
+
+        :param int attempt: The number of attempts made so far.
+        :param response: The failed ``requests.Response``, if there was one.
+        :rtype: float"""
+
+        retry_after = self.retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self._max_delay)
+        delay = min(self._base_delay * (2 ** (attempt - 1)), self._max_delay)
+        return random.uniform(0, delay) if self._jitter else delay
+
+
+    def retry_after(self, response):
+        """Returns the delay in seconds requested by a response's
+        ``Retry-After`` header, or ``None`` if there isn't a usable one.
+
+        :param response: The ``requests.Response`` to inspect.
+        :rtype: float"""
+
+        value = response.headers.get("Retry-After")
+        if not isinstance(value, str):
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max((when - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+    def record(self, event, count=1):
+        """Adds to one of the policy's running counts.
+
+        :param str event: The name of the count.
+        :param int count: The amount to add (default is 1)."""
+
+        with self._lock:
+            self._stats[event] = self._stats.get(event, 0) + count
+
+
+    def stats(self):
+        """Returns the policy's running counts - the number of ``requests``
+        made, ``retries`` issued, ``fast_failures`` given up on immediately,
+        and queries ``exhausted`` after every attempt failed.
+
+        :rtype: dict"""
+
+        with self._lock:
+            return dict(self._stats)
+
+
+    def reset_stats(self):
+        """Sets all the policy's running counts back to zero."""
+
+        with self._lock:
+            self._stats = {
+             "requests": 0, "retries": 0, "fast_failures": 0, "exhausted": 0
+            }
+
+
+
+retry_policy = RetryPolicy()
+
+def set_retry_policy(policy):
+    """Replaces the retry policy used for web service requests.
+
+    :param policy: The new :py:class:`RetryPolicy`.
+    :rtype: :py:class:`RetryPolicy`"""
+
+    if not isinstance(policy, RetryPolicy):
+        raise TypeError("policy must be RetryPolicy, not '%s'" % str(policy))
+    global retry_policy
+    retry_policy = policy
+    return policy
+
+
+class RateLimiter:
+    """A thread-safe token bucket rate limiter, with a separate budget for
+    each host. Hosts without a budget are not limited.
+
+    Each host's bucket holds up to ``burst`` tokens and refills at ``rate``
+    tokens per second. Every request takes a token, and if there are none left
+    it reserves the next one and sleeps until it is due, so waiting requests
+    are served in the order they arrived.
+
+    :param dict rates: A dictionary of ``host=rate`` pairs giving the number \
+    of requests per second allowed to each host."""
+
+    def __init__(self, rates=None):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        for host, rate in (rates or {}).items():
+            self.set_rate(host, rate)
+
+
+    def __repr__(self):
+        return "<RateLimiter (%i hosts)>" % len(self._buckets)
+
+
+    def set_rate(self, host, rate, burst=None):
+        """Sets the budget for a host.
+
+        :param str host: The host to limit, such as ``"www.rcsb.org"``.
+        :param float rate: The number of requests per second allowed, or \
+        ``None`` to remove the limit.
+        :param int burst: The number of requests which can be sent at once \
+        after a quiet period (default is one second's worth, minimum 1)."""
+
+        with self._lock:
+            if rate is None:
+                self._buckets.pop(host, None)
+                return
+            if not isinstance(rate, (int, float)):
+                raise TypeError("rate must be numeric, not '%s'" % str(rate))
+            if rate <= 0:
+                raise ValueError("rate must be greater than zero, not %s" % str(rate))
+            burst = max(1, int(rate)) if burst is None else burst
+            self._buckets[host] = {
+             "rate": float(rate), "burst": burst, "tokens": float(burst),
+             "updated": time.monotonic(), "waiting": 0, "waited": 0.0
+            }
+
+
+    def acquire(self, host):
+        """Takes a token for a host, sleeping until one is available.
+
+        :param str host: The host a request is about to be sent to.
+        :returns: The number of seconds spent waiting."""
+
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                return 0
+            self._refill(bucket)
+            bucket["tokens"] -= 1
+            delay = -bucket["tokens"] / bucket["rate"] if bucket["tokens"] < 0 else 0
+            remaining = remaining_time()
+            if delay and remaining is not None and delay >= remaining:
+                bucket["tokens"] += 1
+                raise DeadlineExceededError(
+                 "Waiting %.2fs for %s would exceed the deadline" % (delay, host)
+                )
+            if delay:
+                bucket["waiting"] += 1
+                bucket["waited"] += delay
+        if delay:
+            try:
+                time.sleep(delay)
+            finally:
+                with self._lock:
+                    bucket["waiting"] -= 1
+        return delay
+
+
+    def queue_depth(self, host):
+        """Returns the number of requests currently waiting for a token.
+
+        :param str host: The host to check.
+        :rtype: int"""
+
+        with self._lock:
+            bucket = self._buckets.get(host)
+            return bucket["waiting"] if bucket else 0
+
+
+    def wait_time(self, host):
+        """Returns how long a request sent to a host now would have to wait.
+
+        :param str host: The host to check.
+        :rtype: float"""
+
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                return 0
+            self._refill(bucket)
+            return max(1 - bucket["tokens"], 0) / bucket["rate"]
+
+
+    def stats(self):
+        """Returns the state of every host's budget - its ``rate``, ``burst``,
+        ``tokens`` available now, requests ``waiting``, and total seconds
+        ``waited`` so far.
+
+        :rtype: dict"""
+
+        with self._lock:
+            stats = {}
+            for host, bucket in self._buckets.items():
+                self._refill(bucket)
+                stats[host] = {key: bucket[key] for key in (
+                 "rate", "burst", "tokens", "waiting", "waited"
+                )}
+            return stats
+
+
+    def _refill(self, bucket):
+        now = time.monotonic()
+        bucket["tokens"] = min(
+         bucket["burst"],
+         bucket["tokens"] + (now - bucket["updated"]) * bucket["rate"]
+        )
+        bucket["updated"] = now
+
+
+
+rate_limiter = RateLimiter()
+
+def set_rate_limit(host, rate, burst=None):
+    """Sets the number of requests per second pyGtoP may send to a host, across
+    all threads.
+
+    :param str host: The host to limit, such as ``"www.guidetopharmacology.org"``.
+    :param float rate: The number of requests per second allowed, or ``None`` \
+    to remove the limit.
+    :param int burst: The number of requests which can be sent at once after a \
+    quiet period."""
+
+    rate_limiter.set_rate(host, rate, burst=burst)
+
+
+class RequestCoalescer:
+    """Makes concurrent identical requests share a single network call. The
+    first thread to ask for something sends the request, and any thread which
+    asks for the same thing before it has finished waits for, and is given,
+    that same response (or exception).
+
+    The one exception is a failure caused by the first thread's
+    :py:func:`deadline`: a waiting thread whose own deadline is later, or
+    which has none, sends the request again instead."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {"sent": 0, "coalesced": 0}
+
+
+    def __repr__(self):
+        return "<RequestCoalescer (%i in flight)>" % len(self._in_flight)
+
+
+    def call(self, key, func):
+        """Calls ``func`` unless a call with the same key is already in
+        progress, in which case that call's result is waited for and returned.
+
+        :param key: A hashable description of the request.
+        :param func: The function which makes the request."""
+
+        expires = _deadline.get()
+        while True:
+            with self._lock:
+                flight = self._in_flight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._in_flight[key] = {
+                     "done": threading.Event(), "result": None, "error": None,
+                     "deadline": expires
+                    }
+                    self._stats["sent"] += 1
+                else:
+                    self._stats["coalesced"] += 1
+            if leader:
+                try:
+                    flight["result"] = func()
+                except BaseException as e:
+                    flight["error"] = e
+                finally:
+                    with self._lock:
+                        del self._in_flight[key]
+                    flight["done"].set()
+            elif not flight["done"].wait(remaining_time()):
+                raise DeadlineExceededError("Deadline exceeded waiting for %s" % str(key))
+            if not leader and self._failed_by_leader_deadline(flight, expires):
+                continue
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["result"]
+
+
+    def _failed_by_leader_deadline(self, flight, expires):
+        if not isinstance(flight["error"], (DeadlineExceededError, requests.Timeout)):
+            return False
+        return flight["deadline"] is not None and (
+         expires is None or flight["deadline"] < expires
+        )
+
+
+    def stats(self):
+        """Returns the number of requests ``sent``, and the number which were
+        ``coalesced`` into one already in progress - each of which is a request
+        saved.
+
+        :rtype: dict"""
+
+        with self._lock:
+            return dict(self._stats)
+
+
+
+coalescer = RequestCoalescer()
+
+def _send_get(url, kwargs):
+    rate_limiter.acquire(urlparse(url).netloc)
+    response = _send("get", url, kwargs)
+    # Read the body now, so that threads sharing the response don't race to do it
+    response.content
+    if disk_cache is not None:
+        disk_cache.store("get", url, None, response)
+    return response
+
+
+def get(url, **kwargs):
+    """Sends a GET request through the current :py:class:`Backend`, once the
+    rate limiter allows it. If an identical request is already in progress on another
+    thread, its response is shared rather than a new request being sent, and
+    if a :py:class:`DiskCache` is set, responses in it are used instead -
+    unless the request has a ``Cache-Control: no-cache`` header.
+
+    :param str url: The full URL to request.
+    :rtype: ``requests.Response``"""
+
+    check_deadline()
+    if disk_cache is not None and not _no_cache(kwargs):
+        response = disk_cache.load("get", url, None)
+        if response is not None:
+            return response
+    if kwargs.get("stream"):
+        rate_limiter.acquire(urlparse(url).netloc)
+        return _send("get", url, kwargs)
+    key = (url, repr(sorted(kwargs.items())))
+    return coalescer.call(key, lambda: _send_get(url, kwargs))
+
+
+def post(url, **kwargs):
+    """Sends a POST request through the current :py:class:`Backend`, once the
+    rate limiter allows it - unless the response is in the :py:class:`DiskCache`.
+
+    :param str url: The full URL to request.
+    :rtype: ``requests.Response``"""
+
+    check_deadline()
+    if disk_cache is not None:
+        response = disk_cache.load("post", url, kwargs.get("data"))
+        if response is not None:
+            return response
+    rate_limiter.acquire(urlparse(url).netloc)
+    response = _send("post", url, kwargs)
+    if disk_cache is not None:
+        disk_cache.store("post", url, kwargs.get("data"), response)
+    return response
+
+
+def _no_cache(kwargs):
+    headers = kwargs.get("headers") or {}
+    return any(name.lower() == "cache-control" and value.lower() == "no-cache"
+     for name, value in headers.items())
+
+
+def _send(method, url, kwargs):
+    if cassette is not None:
+        return cassette.send(method, url, kwargs)
+    return backend.send(method, url, **kwargs)
+
+
+
+class Backend:
+    """The interface every transport backend provides. A backend is what
+    actually sends pyGtoP's requests, once they have been through the rate
+    limiter, coalescing, failover and circuit breakers.
+
+    To add caching or instrumentation, or to use a different HTTP client,
+    subclass this (or an existing backend), override :py:meth:`send`, and
+    install it with :py:func:`set_backend` - or give it a name with
+    :py:func:`register_backend` first."""
+
+    def __repr__(self):
+        return "<%s>" % type(self).__name__
+
+
+    def send(self, method, url, **kwargs):
+        """Sends a request and returns its response.
+
+        :param str method: ``"get"`` or ``"post"``.
+        :param str url: The full URL to request.
+        :param kwargs: The other arguments for the request, as for \
+        ``requests`` - ``headers``, ``data`` and ``stream``.
+        :rtype: ``requests.Response``"""
+
+        raise NotImplementedError
+
+
+    def close(self):
+        """Releases any connections the backend holds."""
+
+        pass
+
+
+
+class RequestsBackend(Backend):
+    """The default backend, which sends requests over the shared pooled
+    :py:class:`requests.Session` set up by :py:func:`configure_session`."""
+
+    def send(self, method, url, **kwargs):
+        return getattr(session, method)(url, **kwargs)
+
+
+
+class HttpxBackend(Backend):
+    """A backend which uses `httpx <https://www.python-httpx.org>`_, and by
+    default HTTP/2, so that concurrent requests to the same host - such as the
+    property lookups made by the batch and asyncio functions - are multiplexed
+    over a single connection. It needs ``httpx`` installed, with the
+    ``http2`` extra for HTTP/2 - ``pip install pygtop[httpx]`` installs both.
+
+    :param bool http2: Whether to use HTTP/2 where servers support it \
+    (default is ``True``).
+    :param int max_connections: The most connections to open in total \
+    (default is 10)."""
+
+    def __init__(self, http2=True, max_connections=POOL_MAXSIZE):
+        if httpx is None:
+            raise ImportError("HttpxBackend needs httpx - pip install pygtop[httpx]")
+        self._client = httpx.Client(
+         http2=http2, limits=httpx.Limits(max_connections=max_connections)
+        )
+
+
+    def send(self, method, url, stream=False, data=None, headers=None, **kwargs):
+        connect, read = self._timeouts(kwargs.pop("timeout", None))
+        request = self._client.build_request(
+         method.upper(), url, content=data, headers=headers,
+         timeout=httpx.Timeout(read, connect=connect)
+        )
+        try:
+            response = self._client.send(request, stream=stream)
+        except httpx.TimeoutException as e:
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceededError("Deadline exceeded during request") from e
+            raise requests.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return self._to_requests_response(response, stream)
+
+
+    def close(self):
+        self._client.close()
+
+
+    def _timeouts(self, timeout):
+        timeout = effective_timeout(timeout)
+        return timeout if isinstance(timeout, tuple) else (timeout, timeout)
+
+
+    def _to_requests_response(self, response, stream):
+        converted = requests.Response()
+        converted.status_code = response.status_code
+        converted.url = str(response.url)
+        converted.reason = response.reason_phrase
+        converted.headers = requests.structures.CaseInsensitiveDict(response.headers)
+        converted.encoding = requests.utils.get_encoding_from_headers(converted.headers)
+        if stream:
+            converted.raw = _HttpxStream(response)
+        else:
+            converted._content = response.content
+            converted._content_consumed = True
+        return converted
+
+
+
+class _HttpxStream:
+    """Presents a streamed httpx response as the file-like object requests
+    reads streamed bodies from."""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._buffer = b""
+
+
+    def read(self, size=-1, **kwargs):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+    def close(self):
+        self._response.close()
+
+
+
+backends = {"requests": RequestsBackend, "httpx": HttpxBackend}
+
+def register_backend(name, factory):
+    """Registers a backend under a name, so that it can be installed with
+    ``set_backend(name)``.
+
+    :param str name: The name to register it as.
+    :param factory: A :py:class:`Backend` subclass, or any callable which \
+    returns a :py:class:`Backend`."""
+
+    if not isinstance(name, str):
+        raise TypeError("name must be str, not '%s'" % str(name))
+    if not callable(factory):
+        raise TypeError("factory must be callable, not '%s'" % str(factory))
+    backends[name] = factory
+
+
+def set_backend(new_backend, **kwargs):
+    """Sets the backend every request is sent through. The previous backend
+    is closed.
+
+    :param new_backend: A :py:class:`Backend`, or the name of a registered \
+    backend - ``"requests"`` (the default), ``"httpx"``, or one added with \
+    :py:func:`register_backend`.
+    :param kwargs: Arguments for the backend, if it is given by name.
+    :rtype: :py:class:`Backend`"""
+
+    if isinstance(new_backend, str):
+        if new_backend not in backends:
+            raise ValueError("'%s' is not a registered backend - use one of %s" % (
+             new_backend, ", ".join(sorted(backends))
+            ))
+        new_backend = backends[new_backend](**kwargs)
+    if not isinstance(new_backend, Backend):
+        raise TypeError("backend must be Backend, not '%s'" % str(new_backend))
+    global backend
+    old_backend, backend = backend, new_backend
+    if old_backend is not None and old_backend is not new_backend:
+        old_backend.close()
+    return new_backend
+
+
+configure_session()
+set_backend("requests")
+
+
+
+class Cassette:
+    """A recording of every exchange with the web services, which can be
+    replayed later instead of sending any requests - so that a pipeline can be
+    benchmarked or tested reproducibly with no network access.
+
+    In ``"record"`` mode, requests are sent as normal and each request and its
+    response are remembered, to be written to ``path`` by :py:meth:`save`. In
+    ``"replay"`` mode the recording at ``path`` is loaded, and every request is
+    answered from it. If the same request was recorded more than once, the
+    responses are replayed in the order they were recorded, and the last one is
+    repeated after that.
+
+    Cassettes are stored as compact JSON, compressed with gzip if ``path``
+    ends in ``.gz``. Usually they are used through :py:func:`use_cassette`.
+
+    :param str path: The cassette file.
+    :param str mode: ``"record"`` or ``"replay"`` (the default).
+    :param latency: In replay mode, the number of seconds to wait before each \
+    response, to simulate the network - or ``"recorded"`` to wait as long as \
+    the original response took. By default there is no wait.
+    :raises: :class:`.UnrecordedRequestError` in replay mode if a request is \
+    made which was not recorded."""
+
+    RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+    def __init__(self, path, mode="replay", latency=None):
+        if not isinstance(path, str):
+            raise TypeError("path must be str, not '%s'" % str(path))
+        if mode not in ("record", "replay"):
+            raise ValueError("'%s' is not a valid cassette mode" % str(mode))
+        if latency is not None and latency != "recorded":
+            if not isinstance(latency, (int, float)):
+                raise TypeError("latency must be numeric, not '%s'" % str(latency))
+            if latency < 0:
+                raise ValueError("latency cannot be negative, not %s" % str(latency))
+        self._path = path
+        self._mode = mode
+        self._latency = latency
+        self._lock = threading.Lock()
+        self._exchanges = []
+        self._replays = {}
+        self._stats = {"recorded": 0, "replayed": 0}
+        if mode == "replay":
+            with self._open("rt") as f:
+                self._exchanges = json.load(f)["exchanges"]
+            for exchange in self._exchanges:
+                key = self._key(exchange["method"], exchange["url"], exchange["body"])
+                self._replays.setdefault(key, [[], 0])[0].append(exchange)
+
+
+    def __repr__(self):
+        return "<Cassette '%s' (%s, %i exchanges)>" % (
+         self._path, self._mode, len(self._exchanges)
+        )
+
+
+    def __len__(self):
+        return len(self._exchanges)
+
+
+    def mode(self):
+        """Returns the cassette's mode - ``"record"`` or ``"replay"``.
+
+        :rtype: str"""
+
+        return self._mode
+
+
+    def send(self, method, url, kwargs):
+        """Sends a request through the current :py:class:`Backend` and
+        records the exchange, or answers it from the recording, depending on
+        the mode.
+
+        :param str method: ``"get"`` or ``"post"``.
+        :param str url: The full URL to request.
+        :param dict kwargs: The other arguments for the request.
+        :rtype: ``requests.Response``"""
+
+        body = self._body(kwargs.get("data"))
+        if self._mode == "replay":
+            return self._replay(method, url, body)
+        start = time.monotonic()
+        response = backend.send(method, url, **kwargs)
+        content = response.content
+        try:
+            encoded, encoding = content.decode("utf-8"), "text"
+        except UnicodeDecodeError:
+            encoded, encoding = base64.b64encode(content).decode(), "base64"
+        exchange = {
+         "method": method.upper(), "url": url, "body": body,
+         "status": response.status_code,
+         "headers": {header: response.headers[header]
+          for header in self.RECORDED_HEADERS if header in response.headers},
+         "content": encoded, "encoding": encoding,
+         "elapsed": round(time.monotonic() - start, 4)
+        }
+        with self._lock:
+            self._exchanges.append(exchange)
+            self._stats["recorded"] += 1
+        return response
+
+
+    def save(self):
+        """Writes the recorded exchanges to the cassette file."""
+
+        with self._lock:
+            exchanges = list(self._exchanges)
+        with self._open("wt") as f:
+            json.dump({"version": 1, "exchanges": exchanges}, f, separators=(",", ":"))
+
+
+    def stats(self):
+        """Returns the number of exchanges ``recorded`` and ``replayed``.
+
+        :rtype: dict"""
+
+        with self._lock:
+            return dict(self._stats)
+
+
+    def _replay(self, method, url, body):
+        key = self._key(method.upper(), url, body)
+        with self._lock:
+            if key not in self._replays:
+                raise UnrecordedRequestError(
+                 "%s %s is not in the cassette" % (method.upper(), url)
+                )
+            exchanges, position = self._replays[key]
+            exchange = exchanges[min(position, len(exchanges) - 1)]
+            self._replays[key][1] += 1
+            self._stats["replayed"] += 1
+        if self._latency == "recorded":
+            sleep(exchange["elapsed"])
+        elif self._latency:
+            sleep(self._latency)
+        if exchange["encoding"] == "base64":
+            content = base64.b64decode(exchange["content"])
+        else:
+            content = exchange["content"].encode("utf-8")
+        return _make_response(
+         url, exchange["status"], exchange["headers"], content, exchange["elapsed"]
+        )
+
+
+    def _open(self, mode):
+        if self._path.endswith(".gz"):
+            return gzip.open(self._path, mode, encoding="utf-8")
+        return open(self._path, mode[0], encoding="utf-8")
+
+
+    def _key(self, method, url, body):
+        return (method, url, body)
+
+
+    def _body(self, data):
+        if isinstance(data, bytes):
+            return data.decode("utf-8", errors="replace")
+        return data
+
+
+
+def set_cassette(new_cassette):
+    """Sets the :py:class:`Cassette` which every request goes through. Pass
+    ``None`` to send requests normally again.
+
+    :param new_cassette: The new :py:class:`Cassette`, or ``None``.
+    :rtype: :py:class:`Cassette`"""
+
+    if new_cassette is not None and not isinstance(new_cassette, Cassette):
+        raise TypeError("cassette must be Cassette, not '%s'" % str(new_cassette))
+    global cassette
+    cassette = new_cassette
+    return new_cassette
+
+
+@contextmanager
+def use_cassette(path, mode="replay", latency=None):
+    """A context manager which records every request made inside it to a
+    cassette file, or replays them from one:
+
+        >>> with transport.use_cassette("pipeline.json.gz", mode="record"):
+        ...     ligands = pygtop.get_all_ligands()
+        >>> with transport.use_cassette("pipeline.json.gz", latency=0.05):
+        ...     ligands = pygtop.get_all_ligands() # No network needed
+
+    A recording is saved when the block exits. The arguments are as for
+    :py:class:`Cassette`, which is what the context manager gives.
+
+    :param str path: The cassette file.
+    :param str mode: ``"record"`` or ``"replay"`` (the default).
+    :param latency: The simulated latency when replaying."""
+
+    new_cassette = Cassette(path, mode=mode, latency=latency)
+    previous = cassette
+    set_cassette(new_cassette)
+    try:
+        yield new_cassette
+    finally:
+        set_cassette(previous)
+        if mode == "record":
+            new_cassette.save()
+
+
+def _make_response(url, status, headers, content, elapsed=0):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response.headers = requests.structures.CaseInsensitiveDict(headers)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.elapsed = timedelta(seconds=elapsed)
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+
+class DiskCache:
+    """A persistent cache of successful responses from the web services,
+    kept in a single SQLite file, so that a job which is restarted doesn't
+    download everything again.
+
+    The database runs in WAL mode, so several processes can share one cache
+    file - reading from it while another process writes. Responses are kept
+    until they expire, or until the cache grows beyond ``max_bytes``, when
+    the least recently used are evicted. Access times are only recorded to
+    the nearest ``ACCESS_RESOLUTION`` seconds, so most reads write nothing.
+
+    :param str path: The SQLite file to use, which is created if needed.
+    :param int max_bytes: The most bytes of response body to keep (default \
+    is 1 GB).
+    :param float ttl: The number of seconds a response is kept for, or \
+    ``None`` (the default) to keep responses until they are evicted.
+    :param dict ttls: Time-to-live values for particular hosts, which \
+    override ``ttl`` - such as ``{"www.rcsb.org": 86400}``.
+
+    The cache file can be tagged with the GtoP release its responses came
+    from (see :py:meth:`set_release`), so that it is emptied when a new
+    release comes out rather than going stale."""
+
+    SCHEMA = """CREATE TABLE IF NOT EXISTS responses (
+     key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT,
+     content BLOB, size INTEGER, expires REAL, accessed REAL
+    )"""
+
+    META_SCHEMA = """CREATE TABLE IF NOT EXISTS meta (
+     name TEXT PRIMARY KEY, value TEXT
+    )"""
+
+    # The total size of the responses is kept in the meta table as they are
+    # added and deleted, so that it never has to be summed over the table
+    TRIGGERS = (
+     """CREATE TRIGGER IF NOT EXISTS responses_added AFTER INSERT ON responses
+     BEGIN UPDATE meta SET value=CAST(value AS INTEGER) + NEW.size
+     WHERE name='bytes'; END""",
+     """CREATE TRIGGER IF NOT EXISTS responses_deleted AFTER DELETE ON responses
+     BEGIN UPDATE meta SET value=CAST(value AS INTEGER) - OLD.size
+     WHERE name='bytes'; END"""
+    )
+
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, path, max_bytes=1024 ** 3, ttl=None, ttls=None):
+        if not isinstance(path, str):
+            raise TypeError("path must be str, not '%s'" % str(path))
+        if not isinstance(max_bytes, int):
+            raise TypeError("max_bytes must be int, not '%s'" % str(max_bytes))
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be greater than zero, not %i" % max_bytes)
+        if ttls is not None and not isinstance(ttls, dict):
+            raise TypeError("ttls must be dict, not '%s'" % str(ttls))
+        for value in [ttl] + list((ttls or {}).values()):
+            if value is not None and not isinstance(value, (int, float)):
+                raise TypeError("TTLs must be numeric, not '%s'" % str(value))
+        self._path = path
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._ttls = dict(ttls or {})
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "evictions": 0}
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(self.SCHEMA)
+            connection.execute(self.META_SCHEMA)
+            connection.execute(
+             "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            connection.execute(
+             "INSERT OR IGNORE INTO meta SELECT 'bytes', COALESCE(SUM(size), 0) FROM responses"
+            )
+            for trigger in self.TRIGGERS:
+                connection.execute(trigger)
+
+
+    def __repr__(self):
+        return "<DiskCache '%s'>" % self._path
+
+
+    def load(self, method, url, body):
+        """Returns the cached response to a request as a ``requests.Response``,
+        or ``None`` if it is not cached or has expired.
+
+        :param str method: ``"get"`` or ``"post"``.
+        :param str url: The full URL requested.
+        :param body: The body of the request, if any."""
+
+        key = self._key(method, url, body)
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+         "SELECT status, headers, content, expires, accessed FROM responses WHERE key=?",
+         (key,)
+        ).fetchone()
+        if row is None or (row[3] is not None and row[3] <= now):
+            self._record("misses")
+            return None
+        # Recording every access would make every read a write, so that
+        # processes sharing the file queue on the write lock
+        if now - row[4] >= self.ACCESS_RESOLUTION:
+            connection.execute("UPDATE responses SET accessed=? WHERE key=?", (now, key))
+        self._record("hits")
+        return _make_response(url, row[0], json.loads(row[1]), bytes(row[2]))
+
+
+    def store(self, method, url, body, response):
+        """Caches the response to a request, if it was successful, and evicts
+        the least recently used responses if the cache is now too big.
+
+        :param str method: ``"get"`` or ``"post"``.
+        :param str url: The full URL requested.
+        :param body: The body of the request, if any.
+        :param response: The ``requests.Response`` received."""
+
+        if response.status_code != 200:
+            return
+        ttl = self._ttls.get(urlparse(url).netloc, self._ttl)
+        if ttl == 0:
+            return
+        content = response.content
+        if len(content) > self._max_bytes:
+            return
+        now = time.time()
+        headers = {header: response.headers[header]
+         for header in Cassette.RECORDED_HEADERS if header in response.headers}
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            key = self._key(method, url, body)
+            # Deleted explicitly, as a REPLACE wouldn't fire the delete trigger
+            connection.execute("DELETE FROM responses WHERE key=?", (key,))
+            connection.execute(
+             "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+              key, url, response.status_code,
+              json.dumps(headers), content, len(content),
+              None if ttl is None else now + ttl, now
+             )
+            )
+            self._evict(connection)
+        self._record("stored")
+
+
+    def expire(self):
+        """Deletes every response which has expired.
+
+        :returns: The number of responses deleted."""
+
+        connection = self._connection()
+        with connection:
+            return connection.execute(
+             "DELETE FROM responses WHERE expires IS NOT NULL AND expires <= ?",
+             (time.time(),)
+            ).rowcount
+
+
+    def stats(self):
+        """Returns the number of cache ``hits`` and ``misses``, responses
+        ``stored`` and ``evictions`` made by this process, and the number of
+        ``entries`` and ``bytes`` in the cache file.
+
+        :rtype: dict"""
+
+        connection = self._connection()
+        entries = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        size = self._size(connection)
+        with self._lock:
+            stats = dict(self._stats)
+        stats["entries"], stats["bytes"] = entries, size
+        return stats
+
+
+    def clear(self):
+        """Deletes every cached response."""
+
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM responses")
+
+
+    def release(self):
+        """Returns the GtoP release the cached responses came from, or
+        ``None`` if the cache has not been tagged with one.
+
+        :rtype: str"""
+
+        row = self._connection().execute(
+         "SELECT value FROM meta WHERE name='release'"
+        ).fetchone()
+        return row[0] if row else None
+
+
+    def set_release(self, release):
+        """Tags the cache with the GtoP release currently being served. If it
+        was tagged with a different release, every cached response is deleted
+        first - so that processes sharing the file all see the new release.
+
+        :param str release: The release identifier.
+        :returns: ``True`` if the cache was emptied."""
+
+        if not isinstance(release, str):
+            raise TypeError("release must be str, not '%s'" % str(release))
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+             "SELECT value FROM meta WHERE name='release'"
+            ).fetchone()
+            changed = row is not None and row[0] != release
+            if changed:
+                connection.execute("DELETE FROM responses")
+            connection.execute(
+             "INSERT OR REPLACE INTO meta VALUES ('release', ?)", (release,)
+            )
+        return changed
+
+
+    def close(self):
+        """Closes this thread's connection to the cache file."""
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+
+    def _size(self, connection):
+        return connection.execute(
+         "SELECT CAST(value AS INTEGER) FROM meta WHERE name='bytes'"
+        ).fetchone()[0]
+
+
+    def _evict(self, connection):
+        size = self._size(connection)
+        if size <= self._max_bytes:
+            return
+        keys = []
+        for key, entry_size in connection.execute(
+         "SELECT key, size FROM responses ORDER BY accessed"):
+            if size <= self._max_bytes:
+                break
+            keys.append((key,))
+            size -= entry_size
+        connection.executemany("DELETE FROM responses WHERE key=?", keys)
+        self._record("evictions", len(keys))
+
+
+    def _key(self, method, url, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return hashlib.sha1(
+         method.upper().encode() + b" " + url.encode() + b"\n" + (body or b"")
+        ).hexdigest()
+
+
+    def _record(self, event, count=1):
+        with self._lock:
+            self._stats[event] += count
+
+
+
+def set_disk_cache(cache):
+    """Sets the :py:class:`DiskCache` which successful responses are kept
+    in. Pass ``None`` to stop using it.
+
+    :param cache: The new :py:class:`DiskCache`, or ``None``.
+    :rtype: :py:class:`DiskCache`"""
+
+    if cache is not None and not isinstance(cache, DiskCache):
+        raise TypeError("cache must be DiskCache, not '%s'" % str(cache))
+    global disk_cache
+    disk_cache = cache
+    return cache
+
+
+
+class EndpointPool:
+    """An ordered list of base URLs which all serve the same web service -
+    such as a local mirror and the public service - with health tracking.
+
+    Endpoints which fail ``failure_threshold`` times in a row are treated as
+    down for ``cooldown`` seconds, after which they are tried again. The
+    response time of each endpoint is tracked as a moving average.
+
+    :param urls: The base URLs, in order of preference.
+    :param str selection: ``"ordered"`` (the default) to always prefer the \
+    earliest healthy endpoint in the list, or ``"latency"`` to prefer whichever \
+    healthy endpoint has been responding fastest.
+    :param int failure_threshold: The number of consecutive failures after \
+    which an endpoint is considered down (default is 3).
+    :param float cooldown: The number of seconds an endpoint which is down is \
+    avoided for (default is 30)."""
+
+    def __init__(self, urls, selection="ordered", failure_threshold=3, cooldown=30):
+        urls = list(urls)
+        if not urls:
+            raise ValueError("An EndpointPool needs at least one URL")
+        for url in urls:
+            if not isinstance(url, str):
+                raise TypeError("URLs must be str, not '%s'" % str(url))
+        if selection not in ("ordered", "latency"):
+            raise ValueError("'%s' is not a valid selection" % str(selection))
+        self._selection = selection
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+        self._endpoints = OrderedDict((url if url.endswith("/") else url + "/", {
+         "failures": 0, "down_until": 0, "latency": None,
+         "requests": 0, "errors": 0
+        }) for url in urls)
+
+
+    def __repr__(self):
+        return "<EndpointPool (%i endpoints)>" % len(self._endpoints)
+
+
+    def urls(self):
+        """Returns the pool's base URLs, in order of preference.
+
+        :returns: list of ``str``"""
+
+        return list(self._endpoints)
+
+
+    def candidates(self):
+        """Returns the base URLs in the order they should be tried for the
+        next request - healthy endpoints first, then any which are down.
+
+        :returns: list of ``str``"""
+
+        now = time.monotonic()
+        with self._lock:
+            healthy = [url for url, endpoint in self._endpoints.items()
+             if endpoint["down_until"] <= now]
+            down = [url for url in self._endpoints if url not in healthy]
+            if self._selection == "latency":
+                healthy.sort(key=lambda url: self._endpoints[url]["latency"] or 0)
+        return healthy + down
+
+
+    def record_success(self, url, elapsed):
+        """Records that an endpoint answered successfully.
+
+        :param str url: The endpoint's base URL.
+        :param float elapsed: The number of seconds the response took."""
+
+        with self._lock:
+            endpoint = self._endpoints[url]
+            endpoint["requests"] += 1
+            endpoint["failures"] = 0
+            endpoint["down_until"] = 0
+            endpoint["latency"] = elapsed if endpoint["latency"] is None else (
+             0.7 * endpoint["latency"] + 0.3 * elapsed
+            )
+
+
+    def record_failure(self, url):
+        """Records that an endpoint failed to answer, marking it as down if it
+        has now failed too many times in a row.
+
+        :param str url: The endpoint's base URL."""
+
+        with self._lock:
+            endpoint = self._endpoints[url]
+            endpoint["requests"] += 1
+            endpoint["errors"] += 1
+            endpoint["failures"] += 1
+            if endpoint["failures"] >= self._failure_threshold:
+                endpoint["down_until"] = time.monotonic() + self._cooldown
+
+
+    def stats(self):
+        """Returns the health of each endpoint - whether it is ``up``, its
+        average ``latency`` in seconds, and the number of ``requests`` sent to
+        it and ``errors`` received.
+
+        :rtype: dict"""
+
+        now = time.monotonic()
+        with self._lock:
+            return {url: {
+             "up": endpoint["down_until"] <= now,
+             "latency": endpoint["latency"],
+             "requests": endpoint["requests"],
+             "errors": endpoint["errors"]
+            } for url, endpoint in self._endpoints.items()}
+
+
+
+endpoint_pools = {}
+
+def configure_endpoints(service, urls, **kwargs):
+    """Sets the base URLs used for a web service, in order of preference.
+    Requests will fail over from one to the next if an endpoint can't be
+    reached or returns a server error. Keyword arguments are passed to
+    :py:class:`EndpointPool`.
+
+    :param str service: The service - ``"gtop"`` or ``"rcsb"``.
+    :param urls: The base URLs. Pass ``None`` to go back to the default.
+    :rtype: :py:class:`EndpointPool`"""
+
+    if urls is None:
+        return endpoint_pools.pop(service, None)
+    endpoint_pools[service] = EndpointPool(urls, **kwargs)
+    return endpoint_pools[service]
+
+
+def service_get(service, root_url, path, **kwargs):
+    """Sends a GET request to a web service, failing over between its
+    configured endpoints. If no endpoints are configured for the service, the
+    request is sent to ``root_url``.
+
+    :param str service: The service - ``"gtop"`` or ``"rcsb"``.
+    :param str root_url: The service's default base URL.
+    :param str path: The path to request, relative to the base URL.
+    :rtype: ``requests.Response``"""
+
+    return _send_to_service(get, service, root_url, path, kwargs)
+
+
+def service_post(service, root_url, path, **kwargs):
+    """Sends a POST request to a web service, failing over between its
+    configured endpoints. If no endpoints are configured for the service, the
+    request is sent to ``root_url``.
+
+    :param str service: The service - ``"gtop"`` or ``"rcsb"``.
+    :param str root_url: The service's default base URL.
+    :param str path: The path to request, relative to the base URL.
+    :rtype: ``requests.Response``"""
+
+    return _send_to_service(post, service, root_url, path, kwargs)
+
+
+class CircuitBreaker:
+    """Stops requests being sent to a web service which appears to be down.
+
+    The breaker starts closed, letting requests through. After
+    ``failure_threshold`` consecutive failures - connection errors or server
+    errors - it opens, and every request is refused immediately with a
+    :py:class:`.ServiceUnavailableError`. Once ``reset_timeout`` seconds have
+    passed it becomes half-open, and lets a single probe request through: if
+    that succeeds the breaker closes again, and if not it reopens.
+
+    :param int failure_threshold: The number of consecutive failures which \
+    opens the breaker (default is 5).
+    :param float reset_timeout: The number of seconds to stay open before \
+    probing the service again (default is 30)."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        if not isinstance(failure_threshold, int):
+            raise TypeError(
+             "failure_threshold must be int, not '%s'" % str(failure_threshold)
+            )
+        if failure_threshold < 1:
+            raise ValueError(
+             "failure_threshold must be greater than zero, not %i" % failure_threshold
+            )
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0
+        self._probing = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+
+    def __repr__(self):
+        return "<CircuitBreaker (%s)>" % self.state()
+
+
+    def state(self):
+        """Returns the breaker's state - ``"closed"``, ``"open"`` or
+        ``"half-open"``.
+
+        :rtype: str"""
+
+        with self._lock:
+            self._check_timeout()
+            return self._state
+
+
+    def before_request(self):
+        """Checks that a request may be sent, and raises
+        :py:class:`.ServiceUnavailableError` if not."""
+
+        with self._lock:
+            self._check_timeout()
+            if self._state == "closed":
+                return
+            if self._state == "half-open" and not self._probing:
+                self._probing = True
+                return
+            self._stats["rejected"] += 1
+            retry_in = max(self._opened_at + self._reset_timeout - time.monotonic(), 0)
+        raise ServiceUnavailableError(
+         "Service is unavailable after %i consecutive failures - retrying in %.0fs" % (
+          self._failures, retry_in
+         )
+        )
+
+
+    def record_success(self):
+        """Records a successful request, closing the breaker."""
+
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+
+
+    def record_failure(self):
+        """Records a failed request, opening the breaker if there have now been
+        too many in a row or if it was a probe."""
+
+        with self._lock:
+            self._failures += 1
+            if self._state == "half-open" or (
+             self._state == "closed" and self._failures >= self._failure_threshold):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._stats["opened"] += 1
+            self._probing = False
+
+
+    def record_abandoned(self):
+        """Records that a request was given up on by the caller, which says
+        nothing about the service's health."""
+
+        with self._lock:
+            self._probing = False
+
+
+    def stats(self):
+        """Returns the breaker's ``state``, its current run of consecutive
+        ``failures``, the number of times it has ``opened``, and the number of
+        requests it has ``rejected``.
+
+        :rtype: dict"""
+
+        with self._lock:
+            self._check_timeout()
+            return dict(self._stats, state=self._state, failures=self._failures)
+
+
+    def _check_timeout(self):
+        if self._state == "open" and (
+         time.monotonic() >= self._opened_at + self._reset_timeout):
+            self._state = "half-open"
+            self._probing = False
+
+
+
+circuit_breakers = {}
+
+def configure_circuit_breaker(service, failure_threshold=5, reset_timeout=30):
+    """Puts a circuit breaker around a web service, so that when it goes down
+    requests fail fast with a :py:class:`.ServiceUnavailableError` instead of
+    each being retried.
+
+    :param str service: The service - ``"gtop"`` or ``"rcsb"``.
+    :param int failure_threshold: The number of consecutive failures which \
+    opens the breaker. Pass ``None`` to remove the breaker.
+    :param float reset_timeout: The number of seconds to stay open before \
+    probing the service again.
+    :rtype: :py:class:`CircuitBreaker`"""
+
+    if failure_threshold is None:
+        return circuit_breakers.pop(service, None)
+    circuit_breakers[service] = CircuitBreaker(
+     failure_threshold=failure_threshold, reset_timeout=reset_timeout
+    )
+    return circuit_breakers[service]
+
+
+def _send_to_service(send, service, root_url, path, kwargs):
+    breaker = circuit_breakers.get(service)
+    if breaker is None:
+        return _send_with_failover(send, service, root_url, path, kwargs)
+    breaker.before_request()
+    try:
+        response = _send_with_failover(send, service, root_url, path, kwargs)
+    except DeadlineExceededError:
+        breaker.record_abandoned()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def _send_with_failover(send, service, root_url, path, kwargs):
+    pool = endpoint_pools.get(service)
+    if pool is None:
+        return send(root_url + path, **kwargs)
+    response, error = None, None
+    for url in pool.candidates():
+        start = time.monotonic()
+        try:
+            response = send(url + path, **kwargs)
+        except requests.RequestException as e:
+            pool.record_failure(url)
+            error = e
+            continue
+        if response.status_code >= 500:
+            pool.record_failure(url)
+            continue
+        pool.record_success(url, time.monotonic() - start)
+        return response
+    if response is not None:
+        return response
+    raise error
@@ -24,5 +24,6 @@ setup(
  ],
  keywords="pharmacology drugs chemistry bioinformatics",
  packages=["pygtop"],
- install_requires=["requests", "molecupy"]
+ install_requires=["requests", "molecupy"],
+ extras_require={"httpx": ["httpx[http2]"]}
 )
@@ -0,0 +1,127 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import patch
+from pygtop import aio
+import pygtop.ligands as ligands
+import pygtop.exceptions as exceptions
+
+class AsyncTest(TestCase):
+
+    def setUp(self):
+        self.ligand_json = {
+         "ligandId": 1,
+         "name": "flesinoxan",
+         "abbreviation": "flexo",
+         "inn": "flesinoxan",
+         "type": "Synthetic organic",
+         "species": None,
+         "radioactive": False,
+         "labelled": True,
+         "approved": True,
+         "withdrawn": False,
+         "approvalSource": "FDA (1997)",
+         "subunitIds": [2, 3],
+         "complexIds": [5],
+         "prodrugIds": [7],
+         "activeDrugIds": [9, 10]
+        }
+
+        self.structure_json = {
+         "isoSmiles": "CC",
+         "smiles": "CCC",
+         "inchi": "InChI=1S/C6H6",
+         "inchiKey": "UHOVQNZJYSORNB-UHFFFAOYSA-N"
+        }
+
+
+
+class AsyncLigandTests(AsyncTest):
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_get_ligand_by_id(self, mock_json_retriever):
+        mock_json_retriever.return_value = self.ligand_json
+        ligand = asyncio.run(aio.get_ligand_by_id(1))
+        self.assertIsInstance(ligand, aio.Ligand)
+        self.assertEqual(ligand.name(), "flesinoxan")
+        self.assertEqual(ligand.ligand_id(), 1)
+        self.assertEqual(repr(ligand), "<Ligand 1 (flesinoxan)>")
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_missing_ligand_raises(self, mock_json_retriever):
+        mock_json_retriever.return_value = None
+        with self.assertRaises(exceptions.NoSuchLigandError):
+            asyncio.run(aio.get_ligand_by_id(1))
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_network_properties_are_awaited(self, mock_json_retriever):
+        mock_json_retriever.return_value = self.structure_json
+        ligand = aio.Ligand(ligands.Ligand(self.ligand_json))
+        async def get_properties():
+            return await asyncio.gather(ligand.smiles(), ligand.inchi())
+        self.assertEqual(asyncio.run(get_properties()), ["CCC", "InChI=1S/C6H6"])
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_related_objects_are_asynchronous(self, mock_json_retriever):
+        mock_json_retriever.return_value = self.ligand_json
+        ligand = aio.Ligand(ligands.Ligand(self.ligand_json))
+        subunits = asyncio.run(ligand.subunits())
+        self.assertEqual(len(subunits), 2)
+        for subunit in subunits:
+            self.assertIsInstance(subunit, aio.Ligand)
+
+
+
+class AsyncResultsTests(AsyncTest):
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_await_all_ligands(self, mock_json_retriever):
+        mock_json_retriever.return_value = [self.ligand_json, self.ligand_json]
+        async def fetch():
+            return await aio.get_all_ligands()
+        ligands_ = asyncio.run(fetch())
+        self.assertEqual(len(ligands_), 2)
+        self.assertIsInstance(ligands_[0], aio.Ligand)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_iterate_over_all_ligands(self, mock_json_retriever):
+        mock_json_retriever.return_value = [self.ligand_json, self.ligand_json]
+        async def collect():
+            return [ligand async for ligand in aio.get_all_ligands()]
+        ligands_ = asyncio.run(collect())
+        self.assertEqual(len(ligands_), 2)
+        self.assertIsInstance(ligands_[1], aio.Ligand)
+
+
+
+class ConcurrencyTests(TestCase):
+
+    def tearDown(self):
+        aio.set_max_concurrency(10)
+
+
+    def test_can_set_max_concurrency(self):
+        executor = aio.set_max_concurrency(200)
+        self.assertEqual(executor._max_workers, 200)
+        adapter = aio.transport.session.get_adapter("http://www.rcsb.org/")
+        self.assertEqual(adapter._pool_maxsize, 200)
+
+
+    def test_resizing_pool_keeps_session_settings(self):
+        aio.transport.configure_session(keep_alive=False, host_limits={"www.rcsb.org": 2})
+        self.addCleanup(aio.transport.configure_session)
+        aio.set_max_concurrency(50)
+        session = aio.transport.session
+        self.assertEqual(session.headers["Connection"], "close")
+        self.assertEqual(session.get_adapter("http://www.rcsb.org/")._pool_maxsize, 2)
+        self.assertEqual(session.get_adapter("http://example.com/")._pool_maxsize, 50)
+
+
+    def test_max_concurrency_must_be_positive_int(self):
+        with self.assertRaises(TypeError):
+            aio.set_max_concurrency("many")
+        with self.assertRaises(ValueError):
+            aio.set_max_concurrency(0)
@@ -1,17 +1,26 @@
 from unittest import TestCase
+import json
 import unittest.mock
+import requests
 from unittest.mock import patch
-from pygtop.gtop import get_json_from_gtop
+from pygtop.gtop import get_json_from_gtop, iter_json_from_gtop, iter_json_array
+from pygtop import gtop
+from pygtop import transport
+from pygtop.exceptions import NoResponseError
 
 class JsonTests(TestCase):
 
     def setUp(self):
         self.mock_response = unittest.mock.Mock()
-        self.mock_response.text = '{"name": "superdrug", "ligandId": 1}'
+        self.mock_response.content = b'{"name": "superdrug", "ligandId": 1}'
         self.mock_response.status_code = 200
+        self.mock_response.headers = {}
+        sleep_patcher = patch("time.sleep")
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_can_process_json(self, mock_get):
         mock_get.return_value = self.mock_response
         result = get_json_from_gtop("ligands/x/")
@@ -19,18 +28,31 @@ class JsonTests(TestCase):
         self.assertEqual(result, {"name": "superdrug", "ligandId": 1})
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_can_process_json_with_strange_response(self, mock_get):
-        self.mock_response.text = ""
+        self.mock_response.content = b""
         mock_get.return_value = self.mock_response
         result = get_json_from_gtop("ligands/1/")
         self.assertIs(result, None)
-        self.mock_response.text = "A non-JSON sentence"
+        self.mock_response.content = b"A non-JSON sentence"
         result = get_json_from_gtop("ligands/x/")
         self.assertIs(result, None)
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
+    def test_errors_can_be_raised_instead_of_returning_none(self, mock_get):
+        self.mock_response.status_code = 503
+        mock_get.return_value = self.mock_response
+        with self.assertRaises(NoResponseError):
+            get_json_from_gtop("ligands/1", attempts=2, raise_errors=True)
+        with self.assertRaises(NoResponseError):
+            list(iter_json_from_gtop("ligands", attempts=2, raise_errors=True))
+        self.mock_response.status_code = 404
+        self.assertIsNone(get_json_from_gtop("ligands/1", raise_errors=True))
+        self.assertEqual(list(iter_json_from_gtop("ligands", raise_errors=True)), [])
+
+
+    @patch("requests.Session.get")
     def test_can_process_json_500_error(self, mock_get):
         self.mock_response.status_code = 500
         mock_get.return_value = self.mock_response
@@ -39,22 +61,57 @@ class JsonTests(TestCase):
 
 
 
+class DecoderTests(TestCase):
+
+    def tearDown(self):
+        gtop.set_json_decoder(gtop.json_decoder_default)
+
+
+    def test_every_available_decoder_parses_bytes(self):
+        for name in gtop.JSON_DECODERS:
+            gtop.set_json_decoder(name)
+            self.assertEqual(
+             gtop.decode_json('{"name": "\u00e9", "ids": [1, 2.5]}'.encode()),
+             {"name": "\u00e9", "ids": [1, 2.5]}
+            )
+            with self.assertRaises(ValueError):
+                gtop.decode_json(b"A non-JSON sentence")
+
+
+    def test_fastest_decoder_is_default(self):
+        if "orjson" in gtop.JSON_DECODERS:
+            self.assertEqual(gtop.json_decoder_default, "orjson")
+        elif "ujson" not in gtop.JSON_DECODERS:
+            self.assertEqual(gtop.json_decoder_default, "json")
+
+
+    def test_unavailable_decoder_raises(self):
+        with self.assertRaises(ValueError):
+            gtop.set_json_decoder("fastjson")
+
+
+
 class RetryTests(TestCase):
 
     def setUp(self):
         self.mock_response = unittest.mock.Mock()
-        self.mock_response.text = ""
+        self.mock_response.content = b""
         self.mock_response.status_code = 500
+        self.mock_response.headers = {}
+        sleep_patcher = patch("time.sleep")
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+        transport.retry_policy.reset_stats()
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_json_retriever_will_try_five_times(self, mock_get):
         mock_get.return_value = self.mock_response
         result = get_json_from_gtop("ligands/x/")
         self.assertEqual(mock_get.call_count, 5)
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_json_retriever_attempt_number_can_be_varied(self, mock_get):
         mock_get.return_value = self.mock_response
         result = get_json_from_gtop("ligands/x/", attempts=3)
@@ -65,7 +122,7 @@ class RetryTests(TestCase):
         self.assertEqual(mock_get.call_count, 9 + 1 + 3)
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_attempts_must_be_int(self, mock_get):
         mock_get.return_value = self.mock_response
         with self.assertRaises(TypeError):
@@ -74,7 +131,7 @@ class RetryTests(TestCase):
             get_json_from_gtop("ligands/x/", attempts="x")
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_attempts_must_be_positive(self, mock_get):
         mock_get.return_value = self.mock_response
         with self.assertRaises(ValueError):
@@ -83,11 +140,12 @@ class RetryTests(TestCase):
             get_json_from_gtop("ligands/x/", attempts=0)
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_can_get_correct_value_on_last_attempt(self, mock_get):
         ok_response = unittest.mock.Mock()
         ok_response.status_code = 200
-        ok_response.text = '{"name": "superdrug", "ligandId": 1}'
+        ok_response.content = b'{"name": "superdrug", "ligandId": 1}'
+        ok_response.headers = {}
         mock_get.side_effect = [
          self.mock_response, self.mock_response, self.mock_response, ok_response
         ]
@@ -96,3 +154,488 @@ class RetryTests(TestCase):
          {"name": "superdrug", "ligandId": 1}
         )
         self.assertEqual(mock_get.call_count, 4)
+
+
+    @patch("requests.Session.get")
+    def test_retries_wait_between_attempts(self, mock_get):
+        mock_get.return_value = self.mock_response
+        get_json_from_gtop("ligands/x/")
+        self.assertEqual(self.mock_sleep.call_count, 4)
+
+
+    @patch("requests.Session.get")
+    def test_404_is_not_retried(self, mock_get):
+        self.mock_response.status_code = 404
+        mock_get.return_value = self.mock_response
+        self.assertIs(get_json_from_gtop("ligands/0/"), None)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(self.mock_sleep.called)
+        self.mock_response.status_code = 400
+        self.assertIs(get_json_from_gtop("ligands/0/"), None)
+        self.assertEqual(mock_get.call_count, 2)
+
+
+    @patch("requests.Session.get")
+    def test_retry_after_is_honoured(self, mock_get):
+        self.mock_response.status_code = 503
+        self.mock_response.headers = {"Retry-After": "7"}
+        mock_get.return_value = self.mock_response
+        get_json_from_gtop("ligands/x/", attempts=2)
+        self.mock_sleep.assert_called_once_with(7.0)
+
+
+    @patch("requests.Session.get")
+    def test_retry_counts_are_recorded(self, mock_get):
+        not_found = unittest.mock.Mock()
+        not_found.status_code = 404
+        not_found.content = b""
+        not_found.headers = {}
+        mock_get.side_effect = [
+         self.mock_response, self.mock_response, self.mock_response, not_found
+        ]
+        get_json_from_gtop("ligands/x/", attempts=3)
+        get_json_from_gtop("ligands/x/")
+        self.assertEqual(transport.retry_policy.stats(), {
+         "requests": 4, "retries": 2, "fast_failures": 1, "exhausted": 1
+        })
+
+
+
+class RetryPolicyTests(TestCase):
+
+    def setUp(self):
+        self.response = unittest.mock.Mock()
+        self.response.status_code = 500
+        self.response.headers = {}
+
+
+    def test_backoff_is_exponential_without_jitter(self):
+        policy = transport.RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+        self.assertEqual(
+         [policy.backoff(attempt) for attempt in range(1, 6)], [1, 2, 4, 5, 5]
+        )
+
+
+    def test_jitter_stays_within_exponential_delay(self):
+        policy = transport.RetryPolicy(base_delay=1, max_delay=30)
+        for attempt in range(1, 6):
+            self.assertTrue(0 <= policy.backoff(attempt) <= 2 ** (attempt - 1))
+
+
+    def test_can_read_retry_after_date(self):
+        policy = transport.RetryPolicy()
+        self.response.headers = {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        self.assertEqual(policy.retry_after(self.response), 0)
+        self.response.headers = {"Retry-After": "soon"}
+        self.assertIs(policy.retry_after(self.response), None)
+
+
+    def test_retry_after_is_capped(self):
+        policy = transport.RetryPolicy(max_delay=10)
+        self.response.headers = {"Retry-After": "3600"}
+        self.assertEqual(policy.backoff(1, self.response), 10)
+
+
+    def test_can_set_custom_fail_fast_codes(self):
+        policy = transport.RetryPolicy(fail_fast_codes=[410])
+        self.response.status_code = 410
+        self.assertFalse(policy.should_retry(self.response))
+        self.response.status_code = 404
+        self.assertTrue(policy.should_retry(self.response))
+
+
+    def test_can_replace_retry_policy(self):
+        original = transport.retry_policy
+        try:
+            policy = transport.set_retry_policy(transport.RetryPolicy(base_delay=2))
+            self.assertIs(transport.retry_policy, policy)
+        finally:
+            transport.set_retry_policy(original)
+        with self.assertRaises(TypeError):
+            transport.set_retry_policy("policy")
+
+
+
+
+class RevalidationTests(TestCase):
+
+    def setUp(self):
+        self.store = gtop.set_response_store(gtop.ResponseStore())
+        self.addCleanup(gtop.set_response_store, None)
+        self.response = unittest.mock.Mock()
+        self.response.status_code = 200
+        self.response.content = b'{"name": "superdrug", "ligandId": 1}'
+        self.response.headers = {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2018"}
+        self.not_modified = unittest.mock.Mock()
+        self.not_modified.status_code = 304
+        self.not_modified.content = b""
+        self.not_modified.headers = {}
+
+
+    @patch("requests.Session.get")
+    def test_validators_are_sent_back(self, mock_get):
+        mock_get.return_value = self.response
+        get_json_from_gtop("ligands/1")
+        mock_get.assert_called_with(
+         "http://www.guidetopharmacology.org/services/ligands/1"
+        )
+        get_json_from_gtop("ligands/1")
+        mock_get.assert_called_with(
+         "http://www.guidetopharmacology.org/services/ligands/1",
+         headers={"If-None-Match": '"abc"', "If-Modified-Since": "Mon, 01 Jan 2018"}
+        )
+
+
+    @patch("requests.Session.get")
+    def test_304_returns_stored_json(self, mock_get):
+        mock_get.side_effect = [self.response, self.not_modified]
+        first = get_json_from_gtop("ligands/1")
+        second = get_json_from_gtop("ligands/1")
+        self.assertEqual(second, {"name": "superdrug", "ligandId": 1})
+        self.assertIs(first, second)
+        self.assertEqual(self.store.stats()["not_modified"], 1)
+
+
+    @patch("pygtop.gtop.decode_json")
+    @patch("requests.Session.get")
+    def test_unchanged_body_is_not_parsed_again(self, mock_get, mock_loads):
+        self.response.headers = {}
+        mock_loads.return_value = {"ligandId": 1}
+        mock_get.return_value = self.response
+        get_json_from_gtop("ligands/1")
+        self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+        self.assertEqual(mock_loads.call_count, 1)
+        self.assertEqual(self.store.stats()["unchanged"], 1)
+        self.response.content = b'{"ligandId": 2}'
+        get_json_from_gtop("ligands/1")
+        self.assertEqual(mock_loads.call_count, 2)
+
+
+    def test_store_forgets_least_recently_used(self):
+        store = gtop.ResponseStore(max_entries=2)
+        for url in ["a", "b", "c"]:
+            store.load(url, self.response)
+        self.assertEqual(len(store), 2)
+        self.assertIs(store.revalidated("a"), None)
+        self.assertEqual(store.conditional_headers("c")["If-None-Match"], '"abc"')
+
+
+    def test_store_must_be_response_store(self):
+        with self.assertRaises(TypeError):
+            gtop.set_response_store({})
+
+
+
+
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = gtop.set_response_cache(gtop.ResponseCache())
+        self.addCleanup(gtop.set_response_cache, None)
+        self.response = unittest.mock.Mock()
+        self.response.status_code = 200
+        self.response.content = b'{"ligandId": 1}'
+
+
+    @patch("requests.Session.get")
+    def test_repeated_queries_are_cached(self, mock_get):
+        mock_get.return_value = self.response
+        first = get_json_from_gtop("ligands/1")
+        second = get_json_from_gtop("/ligands/1")
+        self.assertIs(first, second)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(self.cache.stats(), {
+         "hits": 1, "misses": 1, "evictions": 0, "expirations": 0,
+         "entries": 1, "bytes": 15
+        })
+
+
+    def test_queries_are_normalised(self):
+        self.assertEqual(
+         gtop.normalise_query("/ligands?type=Peptide&name=x"), "ligands?name=x&type=Peptide"
+        )
+        self.assertEqual(gtop.normalise_query("ligands/1/"), "ligands/1")
+
+
+    @patch("requests.Session.get")
+    def test_failures_are_not_cached(self, mock_get):
+        self.response.status_code = 404
+        mock_get.return_value = self.response
+        get_json_from_gtop("ligands/1")
+        get_json_from_gtop("ligands/1")
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(len(self.cache), 0)
+
+
+    @patch("time.monotonic")
+    def test_entries_expire_after_endpoint_ttl(self, mock_time):
+        mock_time.return_value = 0
+        cache = gtop.ResponseCache(ttl=100, ttls={"ligands/*/interactions": 10})
+        cache.put("ligands/1", {}, 2)
+        cache.put("ligands/1/interactions", [], 2)
+        self.assertEqual(cache.ttl("ligands/1/structure"), 100)
+        mock_time.return_value = 50
+        self.assertEqual(cache.get("ligands/1"), {})
+        self.assertIsNone(cache.get("ligands/1/interactions"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(cache.stats()["bytes"], 2)
+
+
+    def test_cache_is_bounded_by_entries_and_bytes(self):
+        cache = gtop.ResponseCache(max_entries=3, max_bytes=100)
+        for n in range(4):
+            cache.put("ligands/%i" % n, n, 10)
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get("ligands/0"))
+        cache.put("ligands/4", 4, 90)
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.stats()["bytes"], 100)
+        self.assertEqual(cache.stats()["evictions"], 3)
+        cache.put("ligands/5", 5, 101)
+        self.assertIsNone(cache.get("ligands/5"))
+
+
+    @patch("requests.Session.get")
+    def test_streaming_uses_cached_response(self, mock_get):
+        self.cache.put("ligands", [{"ligandId": 1}], 17)
+        self.assertEqual(list(gtop.iter_json_from_gtop("ligands")), [{"ligandId": 1}])
+        self.assertFalse(mock_get.called)
+
+
+    def test_cache_validation(self):
+        with self.assertRaises(TypeError):
+            gtop.ResponseCache(max_bytes=1.5)
+        with self.assertRaises(TypeError):
+            gtop.ResponseCache(ttls={"ligands": "1 hour"})
+        with self.assertRaises(TypeError):
+            gtop.set_response_cache({})
+
+
+
+class NegativeCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = gtop.set_negative_cache(gtop.NegativeCache())
+        self.addCleanup(gtop.set_negative_cache, None)
+
+
+    @patch("requests.Session.get")
+    def test_404s_are_remembered(self, mock_get):
+        mock_get.return_value = unittest.mock.Mock(status_code=404, content=b"")
+        self.assertIsNone(get_json_from_gtop("ligands/1"))
+        self.assertIsNone(get_json_from_gtop("ligands/1"))
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "recorded": 1})
+
+
+    @patch("time.sleep")
+    @patch("requests.Session.get")
+    def test_other_failures_are_not_remembered(self, mock_get, mock_sleep):
+        mock_get.return_value = unittest.mock.Mock(status_code=503, content=b"", headers={})
+        get_json_from_gtop("ligands/1", attempts=2)
+        self.assertFalse(self.cache.is_missing("ligands/1"))
+
+
+    def test_ids_missing_from_collection_are_missing(self):
+        self.cache.record_ids("ligands", [1, 2])
+        self.assertFalse(self.cache.is_missing("ligands/1"))
+        self.assertTrue(self.cache.is_missing("ligands/3"))
+        self.assertFalse(self.cache.is_missing("ligands/3/structure"))
+        self.assertFalse(self.cache.is_missing("targets/3"))
+
+
+    @patch("time.monotonic")
+    def test_entries_expire(self, mock_time):
+        mock_time.return_value = 0
+        cache = gtop.NegativeCache(ttl=60)
+        cache.record_missing("targets/9")
+        cache.record_ids("targets/families", [1])
+        mock_time.return_value = 61
+        self.assertFalse(cache.is_missing("targets/9"))
+        self.assertFalse(cache.is_missing("targets/families/2"))
+
+
+    def test_negative_cache_validation(self):
+        with self.assertRaises(ValueError):
+            gtop.NegativeCache(ttl=0)
+        with self.assertRaises(TypeError):
+            gtop.set_negative_cache(set())
+
+
+
+class ReleaseTrackerTests(TestCase):
+
+    def setUp(self):
+        self.releases = ["2024.1"]
+        self.tracker = gtop.set_release_tracker(
+         gtop.ReleaseTracker(probe=lambda: self.releases[0], interval=60)
+        )
+        self.addCleanup(gtop.set_release_tracker, None)
+        self.cache = gtop.set_response_cache(gtop.ResponseCache())
+        self.addCleanup(gtop.set_response_cache, None)
+        self.response = unittest.mock.Mock(status_code=200, content=b'{"ligandId": 1}', headers={})
+
+
+    @patch("time.monotonic")
+    @patch("requests.Session.get")
+    def test_release_is_probed_once_per_interval(self, mock_get, mock_time):
+        mock_get.return_value = self.response
+        mock_time.return_value = 0
+        get_json_from_gtop("ligands/1")
+        self.assertEqual(self.tracker.release(), "2024.1")
+        mock_time.return_value = 30
+        get_json_from_gtop("ligands/2")
+        self.assertEqual(self.tracker.stats(), {"probes": 1, "changes": 0, "errors": 0})
+        mock_time.return_value = 61
+        get_json_from_gtop("ligands/3")
+        self.assertEqual(self.tracker.stats(), {"probes": 2, "changes": 0, "errors": 0})
+
+
+    @patch("requests.Session.get")
+    def test_caches_survive_while_release_is_unchanged(self, mock_get):
+        mock_get.return_value = self.response
+        get_json_from_gtop("ligands/1")
+        self.assertFalse(self.tracker.check())
+        get_json_from_gtop("ligands/1")
+        self.assertEqual(mock_get.call_count, 1)
+
+
+    @patch("requests.Session.get")
+    def test_caches_are_cleared_when_release_changes(self, mock_get):
+        mock_get.return_value = self.response
+        missing = gtop.set_negative_cache(gtop.NegativeCache())
+        self.addCleanup(gtop.set_negative_cache, None)
+        missing.record_missing("ligands/9")
+        changes = []
+        self.tracker.on_change(lambda old, new: changes.append((old, new)))
+        get_json_from_gtop("ligands/1")
+        self.releases[0] = "2024.2"
+        self.assertTrue(self.tracker.check())
+        self.assertEqual(changes, [("2024.1", "2024.2")])
+        self.assertEqual(self.cache.stats()["entries"], 0)
+        self.assertFalse(missing.is_missing("ligands/9"))
+        get_json_from_gtop("ligands/1")
+        self.assertEqual(mock_get.call_count, 2)
+
+
+    def test_disk_cache_is_tagged_with_release(self):
+        with patch("pygtop.transport.disk_cache") as mock_disk_cache:
+            self.tracker.check()
+            mock_disk_cache.set_release.assert_called_with("2024.1")
+
+
+    def test_failed_probe_keeps_known_release(self):
+        self.tracker.check()
+        self.releases[0] = None
+        self.assertFalse(self.tracker.check())
+        self.assertEqual(self.tracker.release(), "2024.1")
+
+
+    @patch("requests.Session.get")
+    def test_probe_errors_fall_through_to_cache(self, mock_get):
+        mock_get.return_value = self.response
+        get_json_from_gtop("ligands/1")
+        def probe():
+            raise requests.ConnectionError("unreachable")
+        self.tracker._probe = probe
+        self.tracker._checked = None
+        self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(self.tracker.release(), "2024.1")
+        self.assertEqual(self.tracker.stats()["errors"], 1)
+
+
+    @patch("requests.Session.get")
+    def test_default_probe_hashes_response(self, mock_get):
+        mock_get.return_value = self.response
+        release = gtop.probe_release()
+        self.assertEqual(len(release), 16)
+        self.assertEqual(gtop.probe_release(), release)
+        self.assertEqual(
+         mock_get.call_args[1]["headers"], {"Cache-Control": "no-cache"}
+        )
+        mock_get.return_value = unittest.mock.Mock(status_code=200, content=b"[1]", headers={})
+        self.assertNotEqual(gtop.probe_release(), release)
+        mock_get.return_value = unittest.mock.Mock(status_code=503, content=b"", headers={})
+        self.assertIsNone(gtop.probe_release())
+
+
+    def test_release_tracker_validation(self):
+        with self.assertRaises(TypeError):
+            gtop.ReleaseTracker(probe="2024.1")
+        with self.assertRaises(ValueError):
+            gtop.ReleaseTracker(interval=0)
+        with self.assertRaises(TypeError):
+            gtop.set_release_tracker(lambda: "2024.1")
+
+
+
+class StreamingTests(TestCase):
+
+    def setUp(self):
+        self.items = [{"ligandId": n, "name": "drug \u00e9%i" % n} for n in range(20)]
+        self.body = json.dumps(self.items + [2.5, -3e5, None]).encode()
+        self.mock_response = unittest.mock.Mock()
+        self.mock_response.status_code = 200
+        self.mock_response.headers = {}
+        self.mock_response.iter_content.side_effect = lambda size: (
+         self.body[i:i + size] for i in range(0, len(self.body), size)
+        )
+        sleep_patcher = patch("time.sleep")
+        sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+
+    def test_can_parse_array_from_any_chunk_size(self):
+        for size in [1, 2, 3, 7, 64, 100000]:
+            chunks = [self.body[i:i + size] for i in range(0, len(self.body), size)]
+            self.assertEqual(
+             list(iter_json_array(chunks)), self.items + [2.5, -3e5, None]
+            )
+
+
+    def test_invalid_arrays_raise_value_error(self):
+        for body in [b'{"ligandId": 1}', b'[1, 2', b'[1, }', b'[1 2]']:
+            with self.assertRaises(ValueError):
+                list(iter_json_array([body]))
+        self.assertEqual(list(iter_json_array([b" [ ] "])), [])
+
+
+    def test_misplaced_commas_raise_value_error(self):
+        for body in [b'[1,,2]', b'[,1]', b'[1,]', b'[,]']:
+            with self.assertRaises(ValueError):
+                json.loads(body)
+            for size in [1, 100]:
+                chunks = [body[i:i + size] for i in range(0, len(body), size)]
+                with self.assertRaises(ValueError):
+                    list(iter_json_array(chunks))
+
+
+    def test_items_are_yielded_before_response_finishes(self):
+        chunks = iter([b'[{"a": 1}, {"b"', b': 2}]'])
+        items = iter_json_array(chunks)
+        self.assertEqual(next(items), {"a": 1})
+        self.assertEqual(next(chunks), b': 2}]')
+
+
+    @patch("requests.Session.get")
+    def test_can_stream_from_gtop(self, mock_get):
+        mock_get.return_value = self.mock_response
+        items = list(iter_json_from_gtop("ligands", chunk_size=5))
+        self.assertEqual(items[:20], self.items)
+        mock_get.assert_called_with(
+         "http://www.guidetopharmacology.org/services/ligands", stream=True
+        )
+        self.assertTrue(self.mock_response.close.called)
+
+
+    @patch("requests.Session.get")
+    def test_streaming_retries_before_yielding(self, mock_get):
+        failed = unittest.mock.Mock()
+        failed.status_code = 503
+        failed.headers = {}
+        mock_get.side_effect = [failed, self.mock_response]
+        self.assertEqual(len(list(iter_json_from_gtop("ligands"))), 23)
+        failed.status_code = 404
+        mock_get.side_effect = [failed]
+        self.assertEqual(list(iter_json_from_gtop("ligands")), [])
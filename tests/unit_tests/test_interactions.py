@@ -1,7 +1,7 @@
 from unittest import TestCase
 import unittest.mock
 from unittest.mock import patch
-from pygtop.interactions import Interaction, get_all_interactions
+from pygtop.interactions import Interaction, get_all_interactions, iter_all_interactions
 from pygtop.ligands import Ligand
 from pygtop.targets import Target
 import pygtop.exceptions as exceptions
@@ -117,6 +117,16 @@ class InteractionRetrievalTests(InteractionTest):
 
 
 
+    @patch("pygtop.gtop.iter_json_from_gtop")
+    def test_can_iterate_over_all_interactions(self, mock_json_iterator):
+        interaction_json = dict(self.interaction_json, affinityParameter="pKi")
+        mock_json_iterator.return_value = iter([interaction_json] * 3)
+        interactions = iter_all_interactions()
+        self.assertIsInstance(next(interactions), Interaction)
+        self.assertEqual(len(list(interactions)), 2)
+        mock_json_iterator.assert_called_with("interactions")
+
+
 class InteractionCreationTests(InteractionTest):
 
     def test_can_create_interaction(self):
@@ -162,6 +172,17 @@ class InteractionCreationTests(InteractionTest):
 
 
 
+class InteractionEqualityTests(InteractionTest):
+
+    def test_interactions_with_same_id_are_equal(self):
+        interaction_json = dict(self.interaction_json, affinityParameter="pKi")
+        interaction = Interaction(interaction_json)
+        self.assertEqual(interaction, Interaction(dict(interaction_json)))
+        self.assertNotEqual(interaction, Interaction(dict(interaction_json, interactionId=1)))
+        self.assertEqual(len({interaction, Interaction(dict(interaction_json))}), 1)
+
+
+
 class InteractionPropertyTests(InteractionTest):
 
     def test_basic_property_methods(self):
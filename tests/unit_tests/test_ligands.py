@@ -1,13 +1,17 @@
 from collections import Counter
+import gc
+import json
 from unittest import TestCase
 import unittest.mock
 from unittest.mock import patch
-from pygtop.ligands import Ligand, get_ligand_by_id, get_all_ligands
+from pygtop.ligands import Ligand, get_ligand_by_id, get_all_ligands, get_ligands_by_ids
 from pygtop.ligands import get_ligands_by, get_ligand_by_name, get_ligands_by_smiles
+from pygtop.ligands import iter_all_ligands
 from pygtop.interactions import Interaction
-from pygtop.targets import Target
+from pygtop.targets import Target, get_target_by_id
 import pygtop.exceptions as exceptions
-from pygtop.shared import DatabaseLink
+from pygtop import gtop
+from pygtop.shared import DatabaseLink, IdentityMap, set_identity_map
 import xml.etree.ElementTree as ElementTree
 
 class LigandTest(TestCase):
@@ -572,6 +576,20 @@ class LigandPropertyTests(LigandTest):
             self.assertIn(code, pdbs)
 
 
+    @patch("pygtop.gtop.get_json_from_gtop")
+    @patch("pygtop.pdb.query_rcsb_advanced")
+    def test_can_get_partial_external_pdbs(self, mock_xml_retriever, mock_json_retriever):
+        mock_json_retriever.side_effect = lambda query, **kwargs: (
+         {"inchi": "CCC"} if query.endswith("structure") else []
+        )
+        mock_xml_retriever.side_effect = [["1xxx"], exceptions.DeadlineExceededError]
+        ligand = Ligand(self.ligand_json)
+        self.assertEqual(ligand.all_external_pdbs(partial=True), ["1xxx"])
+        mock_xml_retriever.side_effect = exceptions.DeadlineExceededError
+        with self.assertRaises(exceptions.DeadlineExceededError):
+            ligand.all_external_pdbs()
+
+
     @patch("pygtop.gtop.get_json_from_gtop")
     @patch("pygtop.pdb.query_rcsb")
     @patch("pygtop.pdb.query_rcsb_advanced")
@@ -615,6 +633,66 @@ class LigandPropertyTests(LigandTest):
 
 
 
+class LigandMemoisationTests(LigandTest):
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_sub_resources_are_fetched_once(self, mock_json_retriever):
+        mock_json_retriever.return_value = {}
+        ligand = Ligand(self.ligand_json)
+        for _ in range(2):
+            ligand.iupac_name(), ligand.smiles(), ligand.inchi()
+            ligand.molecular_weight(), ligand.log_p(), ligand.clinical_use_comments()
+            ligand.general_comments()
+        self.assertEqual(
+         sorted(call[0][0] for call in mock_json_retriever.call_args_list),
+         ["ligands/1/comments", "ligands/1/molecularProperties", "ligands/1/structure"]
+        )
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    @patch("pygtop.pdb.query_rcsb")
+    def test_smiles_pdbs_fetches_structure_once(self, mock_xml_retriever, mock_json_retriever):
+        mock_json_retriever.return_value = {"smiles": "CCC"}
+        mock_xml_retriever.return_value = None
+        Ligand(self.ligand_json).smiles_pdbs()
+        self.assertEqual(mock_json_retriever.call_count, 1)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_refresh_sub_resources(self, mock_json_retriever):
+        mock_json_retriever.side_effect = [[{"name": "flexo"}], [{"name": "flexi"}]]
+        ligand = Ligand(self.ligand_json)
+        self.assertEqual(ligand.synonyms(), ["flexo"])
+        self.assertEqual(ligand.synonyms(), ["flexo"])
+        ligand.refresh()
+        self.assertEqual(ligand.synonyms(), ["flexi"])
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_failed_fetches_are_not_memoised(self, mock_json_retriever):
+        mock_json_retriever.side_effect = [
+         exceptions.NoResponseError, {"smiles": "CCC"}, {"smiles": "CCCC"}
+        ]
+        ligand = Ligand(self.ligand_json)
+        self.assertIsNone(ligand.smiles())
+        self.assertEqual(ligand.smiles(), "CCC")
+        self.assertEqual(ligand.smiles(), "CCC")
+        self.assertEqual(mock_json_retriever.call_count, 2)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_missing_sub_resources_are_memoised(self, mock_json_retriever):
+        mock_json_retriever.return_value = None
+        ligand = Ligand(self.ligand_json)
+        for _ in range(3):
+            self.assertIsNone(ligand.smiles())
+            self.assertIsNone(ligand.molecular_weight())
+            self.assertEqual(ligand.synonyms(), [])
+        self.assertEqual(mock_json_retriever.call_count, 3)
+        mock_json_retriever.assert_called_with("ligands/1/synonyms", raise_errors=True)
+
+
+
 class LigandInPdbTests(LigandTest):
 
     def setUp(self):
@@ -681,6 +759,76 @@ class LigandInPdbTests(LigandTest):
 
 
 
+class LigandIdentityTests(LigandTest):
+
+    def tearDown(self):
+        set_identity_map(None)
+
+
+    def test_ligands_with_same_id_are_equal(self):
+        ligand = Ligand(self.ligand_json)
+        same = Ligand(dict(self.ligand_json))
+        other = Ligand(dict(self.ligand_json, ligandId=2))
+        self.assertEqual(ligand, same)
+        self.assertNotEqual(ligand, other)
+        self.assertEqual(len({ligand, same, other}), 2)
+        self.assertNotEqual(ligand, Target({
+         "targetId": 1, "name": "", "abbreviation": "", "systematicName": None,
+         "type": "GPCR", "familyIds": [], "subunitIds": [], "complexIds": []
+        }))
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_identity_map_gives_one_live_object_per_id(self, mock_json_retriever):
+        mock_json_retriever.return_value = self.ligand_json
+        set_identity_map(IdentityMap())
+        ligand = get_ligand_by_id(1)
+        self.assertIs(get_ligand_by_id(1), ligand)
+        self.assertEqual(mock_json_retriever.call_count, 1)
+        mock_json_retriever.return_value = [self.ligand_json]
+        self.assertIs(get_all_ligands()[0], ligand)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_identity_map_forgets_unused_objects(self, mock_json_retriever):
+        mock_json_retriever.return_value = self.ligand_json
+        identity_map = set_identity_map(IdentityMap())
+        get_ligand_by_id(1)
+        gc.collect()
+        self.assertEqual(len(identity_map), 0)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_without_identity_map_objects_are_new(self, mock_json_retriever):
+        mock_json_retriever.return_value = self.ligand_json
+        self.assertIsNot(get_ligand_by_id(1), get_ligand_by_id(1))
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_targets_are_fetched_once_per_distinct_target(self, mock_json_retriever):
+        interaction_json = dict(self.interaction_json, affinityParameter="pKi")
+        interactions = [dict(
+         interaction_json, interactionId=i, targetId=1 + i % 3
+        ) for i in range(30)]
+        queries = []
+        def respond(query, **kwargs):
+            queries.append(query)
+            if query == "ligands/1/interactions":
+                return interactions
+            target_id = int(query.split("/")[1])
+            return None if target_id == 3 else dict(self.target_json, targetId=target_id)
+        mock_json_retriever.side_effect = respond
+        set_identity_map(IdentityMap())
+        known = get_target_by_id(2)
+        targets = Ligand(self.ligand_json).targets()
+        self.assertEqual([target.target_id() for target in targets], [1, 2])
+        self.assertIs(targets[1], known)
+        self.assertEqual(sorted(queries), [
+         "ligands/1/interactions", "targets/1", "targets/2", "targets/3"
+        ])
+
+
+
 class LigandAccessTests(LigandTest):
 
     @patch("pygtop.gtop.get_json_from_gtop")
@@ -705,6 +853,41 @@ class LigandAccessTests(LigandTest):
             ligand = get_ligand_by_id("1")
 
 
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_get_ligands_by_ids(self, mock_json_retriever):
+        def ligand_json(query):
+            ligand_id = int(query.split("/")[1])
+            if ligand_id != 4:
+                return dict(self.ligand_json, ligandId=ligand_id)
+        mock_json_retriever.side_effect = ligand_json
+        ligands = get_ligands_by_ids([3, 1, 4, 3, 2, 1], max_workers=3)
+        self.assertEqual([ligand.ligand_id() for ligand in ligands], [3, 1, 2])
+        self.assertEqual(ligands.missing_ids(), [4])
+        self.assertEqual(mock_json_retriever.call_count, 4)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_ligand_ids_must_be_int(self, mock_json_retriever):
+        mock_json_retriever.return_value = self.ligand_json
+        with self.assertRaises(TypeError):
+            get_ligands_by_ids([1, "2"])
+        with self.assertRaises(ValueError):
+            get_ligands_by_ids([1, 2], max_workers=0)
+
+
+    @patch("requests.Session.get")
+    def test_ids_absent_from_all_ligands_are_missing(self, mock_get):
+        gtop.set_negative_cache(gtop.NegativeCache())
+        self.addCleanup(gtop.set_negative_cache, None)
+        mock_get.return_value = unittest.mock.Mock(
+         status_code=200, content=json.dumps([self.ligand_json]).encode()
+        )
+        get_all_ligands()
+        with self.assertRaises(exceptions.NoSuchLigandError):
+            get_ligand_by_id(2)
+        self.assertEqual(mock_get.call_count, 1)
+
+
     @patch("pygtop.gtop.get_json_from_gtop")
     def test_can_get_all_ligands(self, mock_json_retriever):
         mock_json_retriever.return_value = [self.ligand_json, self.ligand_json]
@@ -715,6 +898,17 @@ class LigandAccessTests(LigandTest):
         self.assertIsInstance(ligands[1], Ligand)
 
 
+    @patch("pygtop.gtop.iter_json_from_gtop")
+    def test_can_iterate_over_all_ligands(self, mock_json_iterator):
+        mock_json_iterator.return_value = iter([self.ligand_json, self.ligand_json])
+        ligands = iter_all_ligands()
+        self.assertIsInstance(next(ligands), Ligand)
+        self.assertIsInstance(next(ligands), Ligand)
+        with self.assertRaises(StopIteration):
+            next(ligands)
+        mock_json_iterator.assert_called_with("ligands")
+
+
     @patch("pygtop.gtop.get_json_from_gtop")
     def test_can_get_ligand_by_query(self, mock_json_retriever):
         mock_json_retriever.return_value = [self.ligand_json, self.ligand_json]
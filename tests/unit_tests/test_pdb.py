@@ -31,7 +31,7 @@ class SimpleQueryTest(TestCase):
         self.mock_response.headers = {"Content-Type": "xml"}
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_can_produce_xml(self, mock_get):
         mock_get.return_value = self.mock_response
         result = query_rcsb("smilesQuery", {
@@ -41,7 +41,7 @@ class SimpleQueryTest(TestCase):
         self.assertIsInstance(result, ElementTree.Element)
 
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_can_produce_none_from_invalid_search(self, mock_get):
         self.mock_response.headers["Content-Type"] = "html"
         mock_get.return_value = self.mock_response
@@ -61,7 +61,7 @@ class AdvancedQueryTests(TestCase):
         self.mock_response.text = "1LS6:1 1Z28:1 2D06:1 3QVU:1 3QVV:1 3U3J:1"
 
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_can_produce_codes(self, mock_post):
         mock_post.return_value = self.mock_response
         results = query_rcsb_advanced("ChemCompDescriptorQuery", {
@@ -74,7 +74,7 @@ class AdvancedQueryTests(TestCase):
         )
 
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_can_produce_none_from_invalid_search(self, mock_post):
         self.mock_response.text = "null"
         mock_post.return_value = self.mock_response
@@ -0,0 +1,165 @@
+from unittest import TestCase
+import json
+import os
+import tempfile
+from unittest.mock import patch
+import requests
+import pygtop
+from pygtop import server, transport
+import pygtop.exceptions as exceptions
+
+class StandInServerTest(TestCase):
+
+    def setUp(self):
+        self.data = server.SyntheticData(ligands=50, targets=10, families=2, interactions=100)
+        self.server = server.StandInServer(self.data).start()
+        transport.configure_endpoints("gtop", [self.server.url()])
+
+
+    def tearDown(self):
+        transport.configure_endpoints("gtop", None)
+        self.server.stop()
+
+
+
+class SyntheticServerTests(StandInServerTest):
+
+    def test_can_get_ligand(self):
+        ligand = pygtop.get_ligand_by_id(7)
+        self.assertEqual(ligand.name(), "Synthetic ligand 7")
+        self.assertTrue(ligand.smiles().startswith("C"))
+        self.assertIsInstance(ligand.molecular_weight(), float)
+        self.assertEqual(ligand.synonyms(), ["SL-7"])
+
+
+    def test_can_get_target_and_family(self):
+        target = pygtop.get_target_by_id(3)
+        self.assertEqual(len(target.genes()), 3)
+        family = target.families()[0]
+        self.assertIn(3, family.target_ids())
+
+
+    def test_interactions_are_consistent(self):
+        interactions = pygtop.get_all_interactions()
+        self.assertEqual(len(interactions), 100)
+        interaction = interactions[0]
+        target = pygtop.get_target_by_id(interaction.target_id())
+        self.assertIn(interaction.interaction_id(),
+         [i.interaction_id() for i in target.interactions()])
+
+
+    def test_can_filter_collections(self):
+        peptides = pygtop.get_ligands_by({"type": "peptide"})
+        self.assertTrue(peptides)
+        for ligand in peptides:
+            self.assertEqual(ligand.ligand_type(), "Peptide")
+
+
+    def test_missing_documents_are_404(self):
+        with self.assertRaises(exceptions.NoSuchLigandError):
+            pygtop.get_ligand_by_id(51)
+        self.assertEqual(self.server.stats()["not_found"], 1)
+
+
+    def test_keeps_connections_alive(self):
+        response = requests.get(self.server.url() + "ligands/1")
+        self.assertEqual(response.headers["Connection"], "keep-alive")
+        self.assertEqual(response.json()["ligandId"], 1)
+
+
+
+class ErrorInjectionTests(TestCase):
+
+    def tearDown(self):
+        transport.configure_endpoints("gtop", None)
+
+
+    @patch("time.sleep")
+    def test_can_inject_errors(self, mock_sleep):
+        data = server.SyntheticData(ligands=5, targets=1, families=1, interactions=1)
+        with server.StandInServer(data, error_rate=1) as stand_in:
+            transport.configure_endpoints("gtop", [stand_in.url()])
+            self.assertIsNone(pygtop.gtop.get_json_from_gtop("ligands/1", attempts=2))
+            self.assertEqual(stand_in.stats()["errors_injected"], 2)
+
+
+    def test_server_validation(self):
+        with self.assertRaises(TypeError):
+            server.StandInServer({})
+        with self.assertRaises(ValueError):
+            server.StandInServer(server.ServerData(), error_rate=2)
+        with self.assertRaises(ValueError):
+            server.StandInServer(server.ServerData(), latency=(-1, 1))
+        with self.assertRaises(ValueError):
+            server.SyntheticData(ligands=0)
+
+
+
+class SnapshotServerTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = server.snapshot_file(self.directory.name, "ligands/1")
+        os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            json.dump(server.SyntheticData(ligands=1).document("ligands/1"), f)
+
+
+    def tearDown(self):
+        transport.configure_endpoints("gtop", None)
+        self.directory.cleanup()
+
+
+    def test_can_serve_snapshot_directory(self):
+        data = server.SnapshotData(self.directory.name)
+        with server.StandInServer(data) as stand_in:
+            transport.configure_endpoints("gtop", [stand_in.url()])
+            self.assertEqual(pygtop.get_ligand_by_id(1).ligand_id(), 1)
+            with self.assertRaises(exceptions.NoSuchLigandError):
+                pygtop.get_ligand_by_id(2)
+
+
+    def test_snapshot_must_be_directory(self):
+        with self.assertRaises(ValueError):
+            server.SnapshotData(os.path.join(self.directory.name, "missing"))
+
+
+
+class ServerDataTests(TestCase):
+
+    def test_encoded_responses_are_bounded(self):
+        data = server.ServerData({"ligands/%i" % i: {"ligandId": i} for i in range(10)})
+        data.MAX_ENCODED = 3
+        for i in range(10):
+            self.assertEqual(json.loads(data.respond("ligands/%i" % i)), {"ligandId": i})
+        for i in range(100, 200):
+            self.assertIsNone(data.respond("ligands/%i" % i))
+        self.assertEqual(list(data._encoded), [
+         ("ligands/7", ""), ("ligands/8", ""), ("ligands/9", "")
+        ])
+
+
+
+class InProcessBackendTests(TestCase):
+
+    def setUp(self):
+        data = server.SyntheticData(ligands=5, targets=2, families=1, interactions=10)
+        transport.set_backend(server.InProcessBackend(data))
+
+
+    def tearDown(self):
+        transport.set_backend("requests")
+
+
+    @patch("requests.Session.get")
+    def test_serves_gtop_without_network(self, mock_get):
+        self.assertEqual(pygtop.get_ligand_by_id(2).name(), "Synthetic ligand 2")
+        self.assertEqual(len(list(pygtop.iter_all_ligands())), 5)
+        with self.assertRaises(exceptions.NoSuchLigandError):
+            pygtop.get_ligand_by_id(6)
+        self.assertFalse(mock_get.called)
+
+
+    def test_other_services_are_not_found(self):
+        response = transport.get("http://www.rcsb.org/pdb/rest/search")
+        self.assertEqual(response.status_code, 404)
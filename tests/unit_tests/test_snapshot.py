@@ -0,0 +1,281 @@
+from unittest import TestCase
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+import pygtop
+from pygtop import gtop, server, snapshot, transport
+import pygtop.exceptions as exceptions
+
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        self.data = server.SyntheticData(ligands=20, targets=5, families=2, interactions=30)
+        transport.set_backend(server.InProcessBackend(self.data))
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+
+    def tearDown(self):
+        transport.set_backend("requests")
+        self.directory.cleanup()
+
+
+
+class FlakyBackend(server.InProcessBackend):
+
+    def __init__(self, data):
+        server.InProcessBackend.__init__(self, data)
+        self.failing = set()
+
+
+    def send(self, method, url, **kwargs):
+        response = server.InProcessBackend.send(self, method, url, **kwargs)
+        if url.split("/services/")[-1] in self.failing:
+            response.status_code, response._content = 503, b""
+        return response
+
+
+
+class SnapshotDownloadTests(SnapshotTest):
+
+    def setUp(self):
+        SnapshotTest.setUp(self)
+        sleep_patcher = patch("time.sleep")
+        sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+
+    def test_downloads_every_record(self):
+        manifest = snapshot.download(self.path, workers=4, progress=False)
+        self.assertTrue(manifest["complete"])
+        self.assertEqual(manifest["format"], snapshot.FORMAT)
+        self.assertEqual(manifest["counts"], {
+         "ligands": 20, "targets": 5, "families": 2, "interactions": 30
+        })
+        ligands = list(snapshot.iter_records(self.path, "ligands"))
+        self.assertEqual(sorted(l["ligandId"] for l in ligands), list(range(1, 21)))
+        ligand = [l for l in ligands if l["ligandId"] == 7][0]
+        self.assertEqual(ligand["ligand"]["name"], "Synthetic ligand 7")
+        self.assertEqual(ligand["synonyms"], self.data.document("ligands/7/synonyms"))
+        for resource in snapshot.LIGAND_RESOURCES:
+            self.assertIn(resource, ligand)
+        target = list(snapshot.iter_records(self.path, "targets"))[0]
+        for resource in snapshot.TARGET_RESOURCES:
+            self.assertIn(resource, target)
+        self.assertEqual(
+         list(snapshot.iter_records(self.path, "families")),
+         self.data.document("targets/families")
+        )
+
+
+    def test_files_are_compressed_when_complete(self):
+        snapshot.download(self.path, progress=False)
+        self.assertEqual(sorted(os.listdir(self.path)), [
+         "families.jsonl.gz", "interactions.jsonl.gz", "ligands.jsonl.gz",
+         "manifest.json", "targets.jsonl.gz"
+        ])
+        self.assertEqual(snapshot.read_manifest(self.path)["counts"]["ligands"], 20)
+
+
+    def test_files_can_be_left_uncompressed(self):
+        snapshot.download(self.path, progress=False, compress=False)
+        self.assertIn("ligands.jsonl", os.listdir(self.path))
+        self.assertEqual(len(list(snapshot.iter_records(self.path, "ligands"))), 20)
+
+
+    def test_complete_snapshot_is_not_downloaded_again(self):
+        snapshot.download(self.path, progress=False)
+        with patch("pygtop.gtop.get_json_from_gtop") as mock_json:
+            snapshot.download(self.path, progress=False)
+            self.assertFalse(mock_json.called)
+
+
+    def test_download_resumes_after_interruption(self):
+        snapshot.download(self.path, progress=False, compress=False)
+        filename = os.path.join(self.path, "ligands.jsonl")
+        with open(filename) as f:
+            lines = f.readlines()
+        with open(filename, "w") as f:
+            f.writelines(lines[:12])
+            f.write(lines[12][:15])
+        manifest = json.load(open(os.path.join(self.path, "manifest.json")))
+        manifest["complete"] = False
+        json.dump(manifest, open(os.path.join(self.path, "manifest.json"), "w"))
+        fetched = []
+        original = snapshot.gtop.get_json_from_gtop
+        def record(query, **kwargs):
+            fetched.append(query)
+            return original(query, **kwargs)
+        with patch("pygtop.gtop.get_json_from_gtop", side_effect=record):
+            manifest = snapshot.download(self.path, progress=False)
+        ligand_queries = [q for q in fetched if q.startswith("ligands/")]
+        self.assertEqual(len(ligand_queries), 8 * len(snapshot.LIGAND_RESOURCES))
+        self.assertFalse([q for q in fetched if q.startswith("targets/1/")])
+        ligands = list(snapshot.iter_records(self.path, "ligands"))
+        self.assertEqual(sorted(l["ligandId"] for l in ligands), list(range(1, 21)))
+        self.assertEqual(manifest["counts"]["ligands"], 20)
+
+
+    def test_progress_shows_throughput_and_eta(self):
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            snapshot.download(self.path, progress=True)
+        output = stderr.getvalue()
+        self.assertIn("ligands: 20/20 (100%)", output)
+        self.assertIn("targets: 5/5 (100%)", output)
+        self.assertIn("/s ETA ", output)
+
+
+    def test_snapshot_is_tagged_with_release(self):
+        manifest = snapshot.download(self.path, progress=False)
+        self.assertEqual(manifest["release"], gtop.probe_release())
+        self.assertEqual(snapshot.load(self.path).release(), manifest["release"])
+
+
+    def test_snapshot_of_old_release_is_downloaded_again(self):
+        snapshot.download(self.path, progress=False)
+        tracker = gtop.set_release_tracker(gtop.ReleaseTracker(probe=lambda: "new"))
+        self.addCleanup(gtop.set_release_tracker, None)
+        with patch("pygtop.gtop.get_json_from_gtop", wraps=gtop.get_json_from_gtop) as mock_json:
+            manifest = snapshot.download(self.path, progress=False)
+            self.assertTrue(mock_json.called)
+        self.assertEqual(manifest["release"], "new")
+        self.assertEqual(manifest["counts"]["ligands"], 20)
+        self.assertEqual(len(list(snapshot.iter_records(self.path, "ligands"))), 20)
+
+
+    def test_failed_list_is_not_written(self):
+        backend = transport.set_backend(FlakyBackend(self.data))
+        backend.failing.add("interactions")
+        with self.assertRaises(exceptions.NoResponseError):
+            snapshot.download(self.path, progress=False)
+        self.assertFalse(snapshot.read_manifest(self.path)["complete"])
+        self.assertNotIn("interactions.jsonl", os.listdir(self.path))
+        backend.failing.clear()
+        manifest = snapshot.download(self.path, progress=False)
+        self.assertTrue(manifest["complete"])
+        self.assertEqual(manifest["counts"]["interactions"], 30)
+
+
+    def test_failed_hydrations_are_fetched_on_resume(self):
+        backend = transport.set_backend(FlakyBackend(self.data))
+        backend.failing.update(["ligands/7/structure", "targets/2/pdbStructure"])
+        with self.assertRaises(exceptions.NoResponseError):
+            snapshot.download(self.path, progress=False)
+        manifest = snapshot.read_manifest(self.path)
+        self.assertFalse(manifest["complete"])
+        self.assertEqual(manifest["failed"], {"ligands": 1, "targets": 1})
+        self.assertEqual(manifest["counts"]["ligands"], 19)
+        ligand_ids = [l["ligandId"] for l in snapshot.iter_records(self.path, "ligands")]
+        self.assertNotIn(7, ligand_ids)
+        backend.failing.clear()
+        manifest = snapshot.download(self.path, progress=False)
+        self.assertTrue(manifest["complete"])
+        self.assertNotIn("failed", manifest)
+        ligand = [l for l in snapshot.iter_records(self.path, "ligands") if l["ligandId"] == 7][0]
+        self.assertEqual(ligand["structure"], self.data.document("ligands/7/structure"))
+
+
+    def test_missing_sub_resources_are_not_failures(self):
+        transport.set_backend(FlakyBackend(server.ServerData(dict(
+         self.data._documents, **{"ligands/7/structure": None}
+        ))))
+        manifest = snapshot.download(self.path, progress=False)
+        self.assertTrue(manifest["complete"])
+        ligand = [l for l in snapshot.iter_records(self.path, "ligands") if l["ligandId"] == 7][0]
+        self.assertIsNone(ligand["structure"])
+
+
+    def test_workers_are_validated(self):
+        with self.assertRaises(TypeError):
+            snapshot.download(self.path, workers=1.5)
+        with self.assertRaises(ValueError):
+            snapshot.download(self.path, workers=0)
+
+
+    def test_unknown_format_is_refused(self):
+        with open(os.path.join(self.path, "manifest.json"), "w") as f:
+            json.dump({"format": 99}, f)
+        with self.assertRaises(ValueError):
+            snapshot.read_manifest(self.path)
+
+
+
+class OfflineModeTests(SnapshotTest):
+
+    def setUp(self):
+        SnapshotTest.setUp(self)
+        snapshot.download(self.path, progress=False)
+        transport.set_backend("requests")
+        self.snapshot = pygtop.use_snapshot(self.path)
+
+
+    def tearDown(self):
+        pygtop.use_snapshot(None)
+        SnapshotTest.tearDown(self)
+
+
+    @patch("requests.Session.get")
+    def test_public_api_needs_no_network(self, mock_get):
+        ligand = pygtop.get_ligand_by_id(7)
+        self.assertEqual(ligand.name(), "Synthetic ligand 7")
+        self.assertEqual(ligand.smiles(), self.data.document("ligands/7/structure")["smiles"])
+        self.assertEqual(ligand.synonyms(), ["SL-7"])
+        target = pygtop.get_target_by_id(3)
+        self.assertEqual(len(target.genes()), 3)
+        family = target.families()[0]
+        self.assertIn(3, family.target_ids())
+        self.assertEqual(len(pygtop.get_all_ligands()), 20)
+        self.assertEqual(len(list(pygtop.iter_all_targets())), 5)
+        self.assertEqual(len(pygtop.get_all_interactions()), 30)
+        self.assertEqual(len(pygtop.get_all_target_families()), 2)
+        self.assertFalse(mock_get.called)
+
+
+    @patch("requests.Session.get")
+    def test_missing_objects_are_missing(self, mock_get):
+        with self.assertRaises(exceptions.NoSuchLigandError):
+            pygtop.get_ligand_by_id(21)
+        with self.assertRaises(exceptions.NoSuchTargetError):
+            pygtop.get_target_by_id(6)
+        self.assertEqual(pygtop.get_ligands_by_smiles("CCC"), [])
+        self.assertFalse(mock_get.called)
+
+
+    @patch("requests.Session.get")
+    def test_searches_filter_the_snapshot(self, mock_get):
+        ligands = pygtop.get_ligands_by({"name": "synthetic LIGAND 4"})
+        self.assertEqual([l.ligand_id() for l in ligands], [4])
+        self.assertFalse(mock_get.called)
+
+
+    def test_snapshot_is_indexed_by_path(self):
+        self.assertEqual(self.snapshot.document("ligands/3"), self.data.document("ligands/3"))
+        self.assertEqual(
+         self.snapshot.document("targets/2/geneProteinInformation"),
+         self.data.document("targets/2/geneProteinInformation")
+        )
+        self.assertEqual(self.snapshot.manifest()["counts"]["targets"], 5)
+
+
+    def test_snapshot_can_be_served(self):
+        backend = server.InProcessBackend(self.snapshot)
+        response = backend.send("get", "http://www.guidetopharmacology.org/services/ligands/5")
+        self.assertEqual(json.loads(response.content)["ligandId"], 5)
+
+
+    def test_can_go_back_online(self):
+        pygtop.use_snapshot(None)
+        self.assertIsNone(gtop.offline_data)
+
+
+    def test_incomplete_snapshot_cannot_be_used(self):
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(ValueError):
+                pygtop.use_snapshot(path)
+
+
+    def test_offline_data_must_be_server_data(self):
+        with self.assertRaises(TypeError):
+            gtop.set_offline_data({"ligands": []})
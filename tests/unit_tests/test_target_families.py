@@ -3,6 +3,7 @@ import unittest.mock
 from unittest.mock import patch
 from pygtop.targets import TargetFamily, get_target_family_by_id
 from pygtop.targets import get_all_target_families, Target
+from pygtop.targets import get_target_families_by_ids
 import pygtop.exceptions as exceptions
 
 class TargetFamilyTest(TestCase):
@@ -41,6 +42,13 @@ class TargetFamilyreationTests(TargetFamilyTest):
         self.assertEqual(family._sub_family_ids, [9])
 
 
+    def test_target_families_with_same_id_are_equal(self):
+        family = TargetFamily(self.family_json)
+        self.assertEqual(family, TargetFamily(dict(self.family_json)))
+        self.assertNotEqual(family, TargetFamily(dict(self.family_json, familyId=2)))
+        self.assertEqual(hash(family), hash(TargetFamily(dict(self.family_json))))
+
+
     def test_target_family_repr(self):
         family = TargetFamily(self.family_json)
         self.assertEqual(str(family), "<'5-Hydroxytryptamine receptors' TargetFamily>")
@@ -116,6 +124,18 @@ class TargetFamilyAccessTests(TargetFamilyTest):
             target_family = get_target_family_by_id("1")
 
 
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_get_target_families_by_ids(self, mock_json_retriever):
+        def family_json(query):
+            family_id = int(query.split("/")[2])
+            if family_id:
+                return dict(self.family_json, familyId=family_id)
+        mock_json_retriever.side_effect = family_json
+        families = get_target_families_by_ids([0, 8, 6, 8])
+        self.assertEqual([family.family_id() for family in families], [8, 6])
+        self.assertEqual(families.missing_ids(), [0])
+
+
     @patch("pygtop.gtop.get_json_from_gtop")
     def test_can_get_all_target_families(self, mock_json_retriever):
         mock_json_retriever.return_value = [self.family_json, self.family_json]
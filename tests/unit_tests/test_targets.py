@@ -2,11 +2,12 @@ from unittest import TestCase
 import unittest.mock
 from unittest.mock import patch
 from pygtop.targets import Target, get_target_by_id, get_all_targets, get_targets_by
-from pygtop.targets import get_target_by_name, TargetFamily
+from pygtop.targets import get_target_by_name, TargetFamily, get_targets_by_ids
+from pygtop.targets import iter_all_targets
 from pygtop.interactions import Interaction
 from pygtop.ligands import Ligand
 import pygtop.exceptions as exceptions
-from pygtop.shared import DatabaseLink, Gene
+from pygtop.shared import DatabaseLink, Gene, IdentityMap, set_identity_map
 
 class TargetTest(TestCase):
 
@@ -442,6 +443,112 @@ class TargetPropertyTests(TargetTest):
 
 
 
+class TargetMemoisationTests(TargetTest):
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    @patch("pygtop.pdb.query_rcsb_advanced")
+    def test_multi_species_report_fetches_each_endpoint_once(self, mock_xml, mock_json):
+        interaction_json = dict(self.interaction_json, affinityParameter="pKi")
+        responses = {
+         "targets/1/synonyms": [{"name": "5-HT1A"}],
+         "targets/1/databaseLinks": self.database_json,
+         "targets/1/geneProteinInformation": self.gene_json,
+         "targets/1/interactions": [interaction_json],
+         "targets/1/pdbStructure": self.pdb_json
+        }
+        mock_json.side_effect = lambda query, **kwargs: responses[query]
+        mock_xml.return_value = None
+        target = Target(self.target_json)
+        for species in ("Human", "Mouse", "Rat"):
+            target.synonyms()
+            target.database_links(species=species)
+            target.genes(species=species)
+            target.interactions(species=species)
+            target.all_pdbs(species=species)
+        self.assertEqual(mock_json.call_count, 5)
+        self.assertEqual(len(target.genes(species="Mouse")), 1)
+        self.assertEqual(target.gtop_pdbs(species="Rat"), ["4IAR"])
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    @patch("pygtop.pdb.query_rcsb_advanced")
+    def test_missing_endpoints_are_fetched_once(self, mock_xml, mock_json):
+        interaction_json = dict(self.interaction_json, affinityParameter="pKi")
+        responses = {
+         "targets/1/synonyms": [{"name": "5-HT1A"}],
+         "targets/1/databaseLinks": self.database_json,
+         "targets/1/geneProteinInformation": self.gene_json,
+         "targets/1/interactions": [interaction_json],
+         "targets/1/pdbStructure": None
+        }
+        mock_json.side_effect = lambda query, **kwargs: responses[query]
+        mock_xml.return_value = None
+        target = Target(self.target_json)
+        for species in ("Human", "Mouse", "Rat"):
+            target.synonyms()
+            target.database_links(species=species)
+            target.genes(species=species)
+            target.interactions(species=species)
+            target.all_pdbs(species=species)
+        self.assertEqual(mock_json.call_count, 5)
+        self.assertEqual(target.gtop_pdbs(species="Rat"), [])
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_failed_fetches_are_not_memoised(self, mock_json):
+        mock_json.side_effect = [exceptions.NoResponseError, self.gene_json, []]
+        target = Target(self.target_json)
+        self.assertEqual(target.genes(), [])
+        self.assertEqual(len(target.genes(species="Human")), 1)
+        self.assertEqual(len(target.genes()), len(self.gene_json))
+        self.assertEqual(mock_json.call_count, 2)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_refresh_sub_resources(self, mock_json):
+        mock_json.side_effect = [self.gene_json, self.gene_json[:1]]
+        target = Target(self.target_json)
+        self.assertEqual(len(target.genes()), 3)
+        self.assertEqual(len(target.genes()), 3)
+        target.refresh()
+        self.assertEqual(len(target.genes()), 1)
+
+
+
+class TargetIdentityTests(TargetTest):
+
+    def tearDown(self):
+        set_identity_map(None)
+
+
+    def test_targets_with_same_id_are_equal(self):
+        target = Target(self.target_json)
+        self.assertEqual(target, Target(dict(self.target_json)))
+        self.assertNotEqual(target, Target(dict(self.target_json, targetId=2)))
+        self.assertEqual(len({target, Target(dict(self.target_json))}), 1)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_identity_map_gives_one_live_object_per_id(self, mock_json):
+        mock_json.return_value = self.target_json
+        set_identity_map(IdentityMap())
+        target = get_target_by_id(1)
+        self.assertIs(get_target_by_id(1), target)
+        self.assertEqual(mock_json.call_count, 1)
+
+
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_ligands_are_deduplicated(self, mock_json):
+        interaction_json = dict(self.interaction_json, affinityParameter="pKi")
+        mock_json.side_effect = lambda query, **kwargs: {
+         "targets/1/interactions": [interaction_json, dict(interaction_json, interactionId=2)],
+         "ligands/7191": dict(self.ligand_json, ligandId=7191)
+        }[query]
+        ligands = Target(self.target_json).ligands()
+        self.assertEqual([ligand.ligand_id() for ligand in ligands], [7191])
+
+
+
 class TargetAccessTests(TargetTest):
 
     @patch("pygtop.gtop.get_json_from_gtop")
@@ -466,6 +573,20 @@ class TargetAccessTests(TargetTest):
             target = get_target_by_id("1")
 
 
+    @patch("pygtop.gtop.get_json_from_gtop")
+    def test_can_get_targets_by_ids(self, mock_json_retriever):
+        def target_json(query):
+            target_id = int(query.split("/")[1])
+            if target_id < 10:
+                return dict(self.target_json, targetId=target_id)
+        mock_json_retriever.side_effect = target_json
+        targets = get_targets_by_ids([5, 12, 5, 2])
+        self.assertIsInstance(targets, list)
+        self.assertEqual([target.target_id() for target in targets], [5, 2])
+        self.assertEqual(targets.missing_ids(), [12])
+        self.assertEqual(mock_json_retriever.call_count, 3)
+
+
     @patch("pygtop.gtop.get_json_from_gtop")
     def test_can_get_all_targets(self, mock_json_retriever):
         mock_json_retriever.return_value = [self.target_json, self.target_json]
@@ -476,6 +597,15 @@ class TargetAccessTests(TargetTest):
         self.assertIsInstance(targets[1], Target)
 
 
+    @patch("pygtop.gtop.iter_json_from_gtop")
+    def test_can_iterate_over_all_targets(self, mock_json_iterator):
+        mock_json_iterator.return_value = iter([self.target_json, self.target_json])
+        targets = list(iter_all_targets())
+        self.assertEqual(len(targets), 2)
+        self.assertIsInstance(targets[0], Target)
+        mock_json_iterator.assert_called_with("targets")
+
+
     @patch("pygtop.gtop.get_json_from_gtop")
     def test_can_get_target_by_query(self, mock_json_retriever):
         mock_json_retriever.return_value = [self.target_json, self.target_json]
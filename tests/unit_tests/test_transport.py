@@ -0,0 +1,866 @@
+from unittest import TestCase
+import gzip
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest.mock
+from unittest.mock import patch
+import requests
+from pygtop import transport
+from pygtop.gtop import get_json_from_gtop, iter_json_array
+from pygtop.pdb import query_rcsb_advanced, gather_pdbs
+from pygtop.exceptions import ServiceUnavailableError, DeadlineExceededError
+from pygtop.exceptions import UnrecordedRequestError
+
+class SessionTests(TestCase):
+
+    def tearDown(self):
+        transport.configure_session()
+
+
+    def test_shared_session_exists(self):
+        self.assertIsInstance(transport.session, requests.Session)
+
+
+    def test_can_configure_pool_size(self):
+        session = transport.configure_session(pool_connections=4, pool_maxsize=20)
+        self.assertIs(session, transport.session)
+        adapter = session.get_adapter("http://www.guidetopharmacology.org/")
+        self.assertEqual(adapter._pool_connections, 4)
+        self.assertEqual(adapter._pool_maxsize, 20)
+
+
+    def test_can_set_per_host_limits(self):
+        session = transport.configure_session(host_limits={"www.rcsb.org": 3})
+        adapter = session.get_adapter("http://www.rcsb.org/pdb/rest/search")
+        self.assertEqual(adapter._pool_maxsize, 3)
+        adapter = session.get_adapter("http://www.guidetopharmacology.org/")
+        self.assertEqual(adapter._pool_maxsize, transport.POOL_MAXSIZE)
+
+
+    def test_can_disable_keep_alive(self):
+        session = transport.configure_session(keep_alive=False)
+        self.assertEqual(session.headers["Connection"], "close")
+
+
+    def test_pool_sizes_must_be_positive_int(self):
+        with self.assertRaises(TypeError):
+            transport.configure_session(pool_maxsize=1.5)
+        with self.assertRaises(ValueError):
+            transport.configure_session(pool_connections=0)
+        with self.assertRaises(TypeError):
+            transport.configure_session(host_limits=["www.rcsb.org"])
+
+
+    @patch("requests.Session.get")
+    def test_gtop_requests_use_shared_session(self, mock_get):
+        mock_response = unittest.mock.Mock()
+        mock_response.status_code = 200
+        mock_response.content = b'{"ligandId": 1}'
+        mock_get.return_value = mock_response
+        get_json_from_gtop("ligands/1")
+        mock_get.assert_called_with(
+         "http://www.guidetopharmacology.org/services/ligands/1"
+        )
+
+
+
+class RateLimiterTests(TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        clock_patcher = patch("time.monotonic", side_effect=lambda: self.now)
+        clock_patcher.start()
+        self.addCleanup(clock_patcher.stop)
+        sleep_patcher = patch("time.sleep")
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+
+    def test_unlimited_hosts_do_not_wait(self):
+        limiter = transport.RateLimiter()
+        for _ in range(100):
+            self.assertEqual(limiter.acquire("www.rcsb.org"), 0)
+        self.assertFalse(self.mock_sleep.called)
+
+
+    def test_burst_then_waits_at_rate(self):
+        limiter = transport.RateLimiter({"www.rcsb.org": 2})
+        self.assertEqual(limiter.acquire("www.rcsb.org"), 0)
+        self.assertEqual(limiter.acquire("www.rcsb.org"), 0)
+        self.assertEqual(limiter.acquire("www.rcsb.org"), 0.5)
+        self.assertEqual(limiter.acquire("www.rcsb.org"), 1.0)
+        self.mock_sleep.assert_called_with(1.0)
+        self.assertEqual(limiter.stats()["www.rcsb.org"]["waited"], 1.5)
+
+
+    def test_tokens_refill_over_time(self):
+        limiter = transport.RateLimiter()
+        limiter.set_rate("www.rcsb.org", 1, burst=1)
+        limiter.acquire("www.rcsb.org")
+        self.assertEqual(limiter.wait_time("www.rcsb.org"), 1)
+        self.now += 0.25
+        self.assertEqual(limiter.wait_time("www.rcsb.org"), 0.75)
+        self.now += 10
+        self.assertEqual(limiter.wait_time("www.rcsb.org"), 0)
+        self.assertEqual(limiter.acquire("www.rcsb.org"), 0)
+
+
+    def test_hosts_have_separate_budgets(self):
+        limiter = transport.RateLimiter({"a.org": 1, "b.org": 1})
+        limiter.acquire("a.org")
+        self.assertEqual(limiter.wait_time("a.org"), 1)
+        self.assertEqual(limiter.wait_time("b.org"), 0)
+        self.assertEqual(limiter.wait_time("c.org"), 0)
+
+
+    def test_queue_depth_counts_sleeping_requests(self):
+        limiter = transport.RateLimiter({"a.org": 1})
+        depths = []
+        self.mock_sleep.side_effect = lambda delay: depths.append(limiter.queue_depth("a.org"))
+        limiter.acquire("a.org")
+        limiter.acquire("a.org")
+        self.assertEqual(depths, [1])
+        self.assertEqual(limiter.queue_depth("a.org"), 0)
+
+
+    def test_can_remove_limit(self):
+        limiter = transport.RateLimiter({"a.org": 1})
+        limiter.set_rate("a.org", None)
+        self.assertEqual(limiter.stats(), {})
+
+
+    def test_rate_must_be_positive_number(self):
+        limiter = transport.RateLimiter()
+        with self.assertRaises(TypeError):
+            limiter.set_rate("a.org", "fast")
+        with self.assertRaises(ValueError):
+            limiter.set_rate("a.org", 0)
+
+
+    @patch("requests.Session.post")
+    def test_requests_go_through_shared_limiter(self, mock_post):
+        transport.set_rate_limit("www.rcsb.org", 1)
+        self.addCleanup(transport.set_rate_limit, "www.rcsb.org", None)
+        transport.post("http://www.rcsb.org/pdb/rest/search")
+        transport.post("http://www.rcsb.org/pdb/rest/search")
+        self.mock_sleep.assert_called_once_with(1.0)
+        self.assertEqual(mock_post.call_count, 2)
+
+
+
+class CoalescingTests(TestCase):
+
+    def test_sequential_calls_are_not_coalesced(self):
+        coalescer = transport.RequestCoalescer()
+        self.assertEqual(coalescer.call("a", lambda: 1), 1)
+        self.assertEqual(coalescer.call("a", lambda: 2), 2)
+        self.assertEqual(coalescer.stats(), {"sent": 2, "coalesced": 0})
+
+
+    def test_concurrent_identical_calls_share_one_request(self):
+        coalescer = transport.RequestCoalescer()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+        def slow_request():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "response"
+        results = []
+        leader = threading.Thread(
+         target=lambda: results.append(coalescer.call("a", slow_request))
+        )
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(
+         target=lambda: results.append(coalescer.call("a", slow_request))
+        ) for _ in range(5)]
+        for follower in followers:
+            follower.start()
+        while coalescer.stats()["coalesced"] < 5:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        self.assertEqual(results, ["response"] * 6)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(coalescer.stats(), {"sent": 1, "coalesced": 5})
+
+
+    def test_leader_deadline_failures_are_not_shared(self):
+        coalescer = transport.RequestCoalescer()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+        def request():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                release.wait()
+                raise DeadlineExceededError("Deadline exceeded by 0.30s")
+            return "response"
+        errors, results = [], []
+        def lead():
+            with transport.deadline(60):
+                try:
+                    coalescer.call("a", request)
+                except DeadlineExceededError as e:
+                    errors.append(e)
+        leader = threading.Thread(target=lead)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(
+         target=lambda: results.append(coalescer.call("a", request))
+        )
+        follower.start()
+        while coalescer.stats()["coalesced"] < 1:
+            time.sleep(0.001)
+        release.set()
+        for thread in (leader, follower):
+            thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(results, ["response"])
+        self.assertEqual(len(calls), 2)
+
+
+    def test_errors_are_shared(self):
+        coalescer = transport.RequestCoalescer()
+        def failing_request():
+            raise requests.ConnectionError
+        with self.assertRaises(requests.ConnectionError):
+            coalescer.call("a", failing_request)
+        self.assertEqual(coalescer.call("a", lambda: 1), 1)
+
+
+    @patch("requests.Session.get")
+    def test_streamed_requests_are_not_coalesced(self, mock_get):
+        sent = transport.coalescer.stats()["sent"]
+        transport.get("http://www.guidetopharmacology.org/services/ligands", stream=True)
+        self.assertEqual(transport.coalescer.stats()["sent"], sent)
+        transport.get("http://www.guidetopharmacology.org/services/ligands")
+        self.assertEqual(transport.coalescer.stats()["sent"], sent + 1)
+
+
+
+class EndpointTests(TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        clock_patcher = patch("time.monotonic", side_effect=lambda: self.now)
+        clock_patcher.start()
+        self.addCleanup(clock_patcher.stop)
+        self.addCleanup(transport.configure_endpoints, "gtop", None)
+        self.ok_response = unittest.mock.Mock()
+        self.ok_response.status_code = 200
+        self.ok_response.content = b'{"ligandId": 1}'
+        self.error_response = unittest.mock.Mock()
+        self.error_response.status_code = 503
+        self.error_response.content = b""
+        self.error_response.headers = {}
+
+
+    def test_pool_normalises_urls(self):
+        pool = transport.EndpointPool(["http://mirror/services", "http://public/services/"])
+        self.assertEqual(pool.urls(), ["http://mirror/services/", "http://public/services/"])
+
+
+    def test_pool_needs_valid_urls(self):
+        with self.assertRaises(ValueError):
+            transport.EndpointPool([])
+        with self.assertRaises(TypeError):
+            transport.EndpointPool([1])
+        with self.assertRaises(ValueError):
+            transport.EndpointPool(["http://a/"], selection="random")
+
+
+    def test_failing_endpoint_goes_down_then_recovers(self):
+        pool = transport.EndpointPool(["http://a/", "http://b/"], failure_threshold=2, cooldown=10)
+        pool.record_failure("http://a/")
+        self.assertEqual(pool.candidates(), ["http://a/", "http://b/"])
+        pool.record_failure("http://a/")
+        self.assertEqual(pool.candidates(), ["http://b/", "http://a/"])
+        self.assertFalse(pool.stats()["http://a/"]["up"])
+        self.now += 10
+        self.assertEqual(pool.candidates(), ["http://a/", "http://b/"])
+
+
+    def test_latency_selection_prefers_fastest(self):
+        pool = transport.EndpointPool(["http://a/", "http://b/"], selection="latency")
+        pool.record_success("http://a/", 0.5)
+        pool.record_success("http://b/", 0.1)
+        self.assertEqual(pool.candidates(), ["http://b/", "http://a/"])
+        pool.record_success("http://b/", 2.0)
+        self.assertEqual(pool.stats()["http://b/"]["latency"], 0.7 * 0.1 + 0.3 * 2.0)
+        self.assertEqual(pool.candidates(), ["http://a/", "http://b/"])
+
+
+    @patch("requests.Session.get")
+    def test_requests_fail_over_to_next_endpoint(self, mock_get):
+        transport.configure_endpoints("gtop", ["http://mirror/", "http://public/"])
+        mock_get.side_effect = [requests.ConnectionError, self.ok_response]
+        self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+        self.assertEqual(
+         [call[0][0] for call in mock_get.call_args_list],
+         ["http://mirror/ligands/1", "http://public/ligands/1"]
+        )
+        mock_get.side_effect = [self.error_response, self.ok_response]
+        get_json_from_gtop("ligands/2")
+        self.assertEqual(mock_get.call_args[0][0], "http://public/ligands/2")
+        self.assertEqual(transport.endpoint_pools["gtop"].stats()["http://mirror/"]["errors"], 2)
+
+
+    @patch("requests.Session.get")
+    def test_last_error_is_raised_when_all_endpoints_fail(self, mock_get):
+        transport.configure_endpoints("gtop", ["http://mirror/", "http://public/"])
+        mock_get.side_effect = requests.ConnectionError
+        with self.assertRaises(requests.ConnectionError):
+            transport.service_get("gtop", "http://default/", "ligands")
+
+
+    @patch("requests.Session.post")
+    def test_unconfigured_service_uses_root_url(self, mock_post):
+        transport.service_post("rcsb", "http://www.rcsb.org/pdb/rest/", "search", data=b"")
+        mock_post.assert_called_with("http://www.rcsb.org/pdb/rest/search", data=b"")
+
+
+
+class CircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        clock_patcher = patch("time.monotonic", side_effect=lambda: self.now)
+        clock_patcher.start()
+        self.addCleanup(clock_patcher.stop)
+        sleep_patcher = patch("time.sleep")
+        sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+        self.addCleanup(transport.configure_circuit_breaker, "gtop", None)
+        self.addCleanup(transport.configure_circuit_breaker, "rcsb", None)
+        self.error_response = unittest.mock.Mock()
+        self.error_response.status_code = 500
+        self.error_response.content = b""
+        self.error_response.headers = {}
+        self.ok_response = unittest.mock.Mock()
+        self.ok_response.status_code = 200
+        self.ok_response.content = b'{"ligandId": 1}'
+
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        breaker = transport.CircuitBreaker(failure_threshold=3)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), "open")
+        with self.assertRaises(ServiceUnavailableError):
+            breaker.before_request()
+        self.assertEqual(breaker.stats(), {
+         "state": "open", "failures": 3, "opened": 1, "rejected": 1
+        })
+
+
+    def test_breaker_lets_one_probe_through_when_half_open(self):
+        breaker = transport.CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        breaker.record_failure()
+        self.now += 10
+        self.assertEqual(breaker.state(), "half-open")
+        breaker.before_request()
+        with self.assertRaises(ServiceUnavailableError):
+            breaker.before_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state(), "open")
+        self.now += 10
+        breaker.before_request()
+        breaker.record_success()
+        self.assertEqual(breaker.state(), "closed")
+        breaker.before_request()
+        breaker.before_request()
+
+
+    def test_breaker_needs_positive_threshold(self):
+        with self.assertRaises(TypeError):
+            transport.CircuitBreaker(failure_threshold="5")
+        with self.assertRaises(ValueError):
+            transport.CircuitBreaker(failure_threshold=0)
+
+
+    @patch("requests.Session.get")
+    def test_gtop_requests_fail_fast_when_open(self, mock_get):
+        breaker = transport.configure_circuit_breaker("gtop", failure_threshold=3)
+        mock_get.return_value = self.error_response
+        with self.assertRaises(ServiceUnavailableError):
+            get_json_from_gtop("ligands/1")
+        self.assertEqual(mock_get.call_count, 3)
+        with self.assertRaises(ServiceUnavailableError):
+            get_json_from_gtop("ligands/2")
+        self.assertEqual(mock_get.call_count, 3)
+        self.now += 30
+        mock_get.return_value = self.ok_response
+        self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+        self.assertEqual(breaker.state(), "closed")
+
+
+    @patch("requests.Session.post")
+    def test_rcsb_connection_errors_open_breaker(self, mock_post):
+        transport.configure_circuit_breaker("rcsb", failure_threshold=2)
+        mock_post.side_effect = requests.ConnectionError
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                query_rcsb_advanced("ChemCompIdQuery", {"chemCompId": "ATP"})
+        with self.assertRaises(ServiceUnavailableError):
+            query_rcsb_advanced("ChemCompIdQuery", {"chemCompId": "ATP"})
+        self.assertEqual(mock_post.call_count, 2)
+
+
+
+class TimeoutTests(TestCase):
+
+    def tearDown(self):
+        transport.set_timeout()
+
+
+    def test_adapter_applies_default_timeout(self):
+        adapter = transport.session.get_adapter("http://www.rcsb.org/")
+        self.assertIsInstance(adapter, transport.TimeoutAdapter)
+        with patch("requests.adapters.HTTPAdapter.send") as mock_send:
+            adapter.send(unittest.mock.Mock())
+            self.assertEqual(mock_send.call_args[1]["timeout"], transport.TIMEOUT)
+            transport.set_timeout(connect=2, read=5)
+            adapter.send(unittest.mock.Mock())
+            self.assertEqual(mock_send.call_args[1]["timeout"], (2, 5))
+
+
+    def test_timeouts_must_be_positive_numbers(self):
+        with self.assertRaises(TypeError):
+            transport.set_timeout(connect="2")
+        with self.assertRaises(ValueError):
+            transport.set_timeout(read=0)
+
+
+    def test_deadline_shortens_timeouts(self):
+        adapter = transport.session.get_adapter("http://www.rcsb.org/")
+        with patch("requests.adapters.HTTPAdapter.send") as mock_send:
+            with transport.deadline(3):
+                adapter.send(unittest.mock.Mock())
+            connect, read = mock_send.call_args[1]["timeout"]
+            self.assertTrue(2 < connect <= 3)
+            self.assertTrue(2 < read <= 3)
+
+
+    def test_timeout_after_deadline_becomes_deadline_error(self):
+        adapter = transport.session.get_adapter("http://www.rcsb.org/")
+        with patch("requests.adapters.HTTPAdapter.send") as mock_send:
+            mock_send.side_effect = requests.ReadTimeout
+            with transport.deadline(0.01):
+                time.sleep(0.02)
+                with self.assertRaises(DeadlineExceededError):
+                    adapter.send(unittest.mock.Mock(), timeout=1)
+            with self.assertRaises(requests.ReadTimeout):
+                adapter.send(unittest.mock.Mock())
+
+
+
+class DeadlineTests(TestCase):
+
+    def test_no_deadline_by_default(self):
+        self.assertIs(transport.remaining_time(), None)
+        transport.check_deadline()
+
+
+    def test_nested_deadlines_use_earliest(self):
+        with transport.deadline(10):
+            with transport.deadline(1):
+                self.assertTrue(transport.remaining_time() <= 1)
+            with transport.deadline(100):
+                self.assertTrue(1 < transport.remaining_time() <= 10)
+        self.assertIs(transport.remaining_time(), None)
+
+
+    def test_deadline_must_be_numeric(self):
+        with self.assertRaises(TypeError):
+            with transport.deadline("5"):
+                pass
+
+
+    @patch("requests.Session.get")
+    def test_expired_deadline_stops_requests(self, mock_get):
+        with transport.deadline(0):
+            with self.assertRaises(DeadlineExceededError):
+                get_json_from_gtop("ligands/1")
+        self.assertFalse(mock_get.called)
+
+
+    @patch("time.sleep")
+    @patch("requests.Session.get")
+    def test_backoff_longer_than_deadline_is_not_waited(self, mock_get, mock_sleep):
+        mock_response = unittest.mock.Mock()
+        mock_response.status_code = 503
+        mock_response.content = b""
+        mock_response.headers = {"Retry-After": "20"}
+        mock_get.return_value = mock_response
+        with transport.deadline(5):
+            with self.assertRaises(DeadlineExceededError):
+                get_json_from_gtop("ligands/1")
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
+
+    def test_deadline_reaches_batch_worker_threads(self):
+        from pygtop.ligands import get_ligands_by_ids
+        with transport.deadline(0):
+            with self.assertRaises(DeadlineExceededError):
+                get_ligands_by_ids([1, 2])
+
+
+    def test_rate_limiter_refuses_waits_past_deadline(self):
+        limiter = transport.RateLimiter({"a.org": 1})
+        limiter.acquire("a.org")
+        with transport.deadline(0.5):
+            with self.assertRaises(DeadlineExceededError):
+                limiter.acquire("a.org")
+        self.assertTrue(limiter.wait_time("a.org") <= 1)
+
+
+    def test_partial_pdb_lookups_skip_those_out_of_time(self):
+        def slow_lookup():
+            raise DeadlineExceededError
+        lookups = [lambda: ["1ABC", "2DEF"], slow_lookup, lambda: ["1ABC"]]
+        self.assertEqual(
+         sorted(gather_pdbs(lookups, partial=True)), ["1ABC", "2DEF"]
+        )
+        with self.assertRaises(DeadlineExceededError):
+            gather_pdbs(lookups)
+
+
+
+class CassetteTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cassette.json")
+        self.response = unittest.mock.Mock()
+        self.response.status_code = 200
+        self.response.content = b'{"ligandId": 1}'
+        self.response.headers = {"Content-Type": "application/json", "Server": "x"}
+
+
+    def tearDown(self):
+        transport.set_cassette(None)
+        self.directory.cleanup()
+
+
+    def record(self, path=None):
+        with patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.response
+            with transport.use_cassette(path or self.path, mode="record") as cassette:
+                get_json_from_gtop("ligands/1")
+        return cassette
+
+
+    @patch("requests.Session.get")
+    def test_can_record_and_replay_without_network(self, mock_get):
+        cassette = self.record()
+        self.assertEqual(len(cassette), 1)
+        self.assertEqual(cassette.stats(), {"recorded": 1, "replayed": 0})
+        mock_get.side_effect = requests.ConnectionError
+        with transport.use_cassette(self.path) as cassette:
+            self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+            self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+        self.assertFalse(mock_get.called)
+        self.assertEqual(cassette.stats()["replayed"], 2)
+
+
+    def test_only_useful_headers_are_recorded(self):
+        self.record()
+        with transport.use_cassette(self.path):
+            response = transport.get("http://www.guidetopharmacology.org/services/ligands/1")
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertNotIn("Server", response.headers)
+
+
+    def test_can_use_compressed_cassettes(self):
+        path = self.path + ".gz"
+        self.record(path)
+        with gzip.open(path, "rt") as f:
+            self.assertIn("ligands/1", f.read())
+        with transport.use_cassette(path):
+            self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+
+
+    def test_repeated_requests_are_replayed_in_order(self):
+        failure = unittest.mock.Mock(status_code=503, content=b"", headers={})
+        with patch("requests.Session.get") as mock_get, patch("time.sleep"):
+            mock_get.side_effect = [failure, self.response]
+            with transport.use_cassette(self.path, mode="record"):
+                get_json_from_gtop("ligands/1")
+        with transport.use_cassette(self.path), patch("time.sleep"):
+            self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+            self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+
+
+    def test_posts_are_matched_on_body(self):
+        text = unittest.mock.Mock(status_code=200, text="1XYZ", content=b"1XYZ", headers={})
+        with patch("requests.Session.post") as mock_post:
+            mock_post.return_value = text
+            with transport.use_cassette(self.path, mode="record"):
+                query_rcsb_advanced("ChemSmilesQuery", {"smiles": "C"})
+        with transport.use_cassette(self.path):
+            self.assertEqual(
+             query_rcsb_advanced("ChemSmilesQuery", {"smiles": "C"}), ["1XYZ"]
+            )
+            with self.assertRaises(UnrecordedRequestError):
+                query_rcsb_advanced("ChemSmilesQuery", {"smiles": "CC"})
+
+
+    def test_unrecorded_request_raises_error(self):
+        self.record()
+        with transport.use_cassette(self.path):
+            with self.assertRaises(UnrecordedRequestError):
+                get_json_from_gtop("ligands/2")
+
+
+    @patch("time.sleep")
+    def test_can_simulate_latency(self, mock_sleep):
+        self.record()
+        with transport.use_cassette(self.path, latency=0.25):
+            get_json_from_gtop("ligands/1")
+        mock_sleep.assert_called_with(0.25)
+        with transport.use_cassette(self.path, latency="recorded"):
+            get_json_from_gtop("ligands/1")
+        self.assertEqual(mock_sleep.call_count, 2)
+
+
+    def test_replayed_responses_can_be_streamed(self):
+        self.response.content = b'[{"ligandId": 1}, {"ligandId": 2}]'
+        with patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.response
+            with transport.use_cassette(self.path, mode="record"):
+                transport.get("http://localhost/ligands")
+        with transport.use_cassette(self.path):
+            response = transport.get("http://localhost/ligands", stream=True)
+            self.assertEqual(len(list(iter_json_array(response.iter_content(5)))), 2)
+
+
+    def test_cassette_validation(self):
+        with self.assertRaises(TypeError):
+            transport.Cassette(1)
+        with self.assertRaises(ValueError):
+            transport.Cassette(self.path, mode="rewind")
+        with self.assertRaises(ValueError):
+            transport.Cassette(self.path, mode="record", latency=-1)
+        with self.assertRaises(TypeError):
+            transport.set_cassette("cassette.json")
+
+
+
+class BackendTests(TestCase):
+
+    def tearDown(self):
+        transport.set_backend("requests")
+        transport.backends.pop("counting", None)
+
+
+    def test_requests_backend_is_default(self):
+        self.assertIsInstance(transport.backend, transport.RequestsBackend)
+
+
+    def test_can_install_custom_backend(self):
+        class CountingBackend(transport.RequestsBackend):
+            def __init__(self):
+                self.count = 0
+            def send(self, method, url, **kwargs):
+                self.count += 1
+                return transport.RequestsBackend.send(self, method, url, **kwargs)
+        transport.register_backend("counting", CountingBackend)
+        backend = transport.set_backend("counting")
+        with patch("requests.Session.get") as mock_get:
+            mock_get.return_value = unittest.mock.Mock(
+             status_code=200, content=b'{"ligandId": 1}'
+            )
+            self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+        self.assertEqual(backend.count, 1)
+
+
+    def test_previous_backend_is_closed(self):
+        backend = transport.Backend()
+        backend.close = unittest.mock.Mock()
+        transport.set_backend(backend)
+        transport.set_backend("requests")
+        self.assertTrue(backend.close.called)
+
+
+    def test_backend_validation(self):
+        with self.assertRaises(ValueError):
+            transport.set_backend("carrier pigeon")
+        with self.assertRaises(TypeError):
+            transport.set_backend(requests.Session())
+        with self.assertRaises(TypeError):
+            transport.register_backend("counting", None)
+
+
+    @unittest.skipIf(transport.httpx is None, "httpx is not installed")
+    def test_can_use_httpx_backend(self):
+        backend = transport.set_backend("httpx", http2=False)
+        self.assertIsInstance(backend, transport.HttpxBackend)
+
+
+    @unittest.skipIf(transport.httpx is not None, "httpx is installed")
+    def test_httpx_backend_needs_httpx(self):
+        with self.assertRaises(ImportError):
+            transport.set_backend("httpx")
+        self.assertIsInstance(transport.backend, transport.RequestsBackend)
+
+
+
+class DiskCacheTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+        self.cache = transport.set_disk_cache(transport.DiskCache(self.path))
+        self.response = unittest.mock.Mock()
+        self.response.status_code = 200
+        self.response.content = b'{"ligandId": 1}'
+        self.response.headers = {"Content-Type": "application/json"}
+
+
+    def tearDown(self):
+        transport.set_disk_cache(None)
+        self.cache.close()
+        self.directory.cleanup()
+
+
+    @patch("requests.Session.get")
+    def test_responses_survive_restart(self, mock_get):
+        mock_get.return_value = self.response
+        get_json_from_gtop("ligands/1")
+        restarted = transport.set_disk_cache(transport.DiskCache(self.path))
+        self.assertEqual(get_json_from_gtop("ligands/1"), {"ligandId": 1})
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(restarted.stats()["hits"], 1)
+        restarted.close()
+
+
+    def test_cache_is_emptied_for_new_release(self):
+        self.cache.store("get", "http://x/1", None, self.response)
+        self.assertIsNone(self.cache.release())
+        self.assertFalse(self.cache.set_release("2024.1"))
+        self.assertFalse(self.cache.set_release("2024.1"))
+        self.assertEqual(self.cache.stats()["entries"], 1)
+        restarted = transport.DiskCache(self.path)
+        self.assertEqual(restarted.release(), "2024.1")
+        self.assertTrue(restarted.set_release("2024.2"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+        restarted.close()
+
+
+    @patch("requests.Session.get")
+    def test_no_cache_requests_skip_cache(self, mock_get):
+        mock_get.return_value = self.response
+        transport.get("http://x/1")
+        transport.get("http://x/1", headers={"Cache-Control": "no-cache"})
+        self.assertEqual(mock_get.call_count, 2)
+
+
+    def test_uses_wal_mode(self):
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        connection.close()
+
+
+    @patch("requests.Session.post")
+    def test_posts_are_cached_by_body(self, mock_post):
+        mock_post.return_value = unittest.mock.Mock(
+         status_code=200, content=b"1XYZ", text="1XYZ", headers={}
+        )
+        query_rcsb_advanced("ChemSmilesQuery", {"smiles": "C"})
+        self.assertEqual(query_rcsb_advanced("ChemSmilesQuery", {"smiles": "C"}), ["1XYZ"])
+        self.assertEqual(mock_post.call_count, 1)
+        query_rcsb_advanced("ChemSmilesQuery", {"smiles": "CC"})
+        self.assertEqual(mock_post.call_count, 2)
+
+
+    @patch("requests.Session.get")
+    def test_failures_are_not_cached(self, mock_get):
+        self.response.status_code = 404
+        mock_get.return_value = self.response
+        get_json_from_gtop("ligands/1")
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+
+    @patch("time.time")
+    def test_responses_expire(self, mock_time):
+        mock_time.return_value = 1000
+        cache = transport.DiskCache(self.path, ttl=60, ttls={"www.rcsb.org": 600})
+        cache.store("get", "http://gtop/ligands/1", None, self.response)
+        cache.store("get", "http://www.rcsb.org/pdb", None, self.response)
+        mock_time.return_value = 1100
+        self.assertIsNone(cache.load("get", "http://gtop/ligands/1", None))
+        self.assertEqual(cache.load("get", "http://www.rcsb.org/pdb", None).content, b'{"ligandId": 1}')
+        self.assertEqual(cache.expire(), 1)
+        cache.close()
+
+
+    @patch("time.time")
+    def test_least_recently_used_are_evicted(self, mock_time):
+        cache = transport.DiskCache(self.path, max_bytes=45)
+        for n in range(3):
+            mock_time.return_value = n * 100
+            cache.store("get", "http://gtop/%i" % n, None, self.response)
+        mock_time.return_value = 300
+        cache.load("get", "http://gtop/0", None)
+        mock_time.return_value = 400
+        cache.store("get", "http://gtop/3", None, self.response)
+        self.assertIsNotNone(cache.load("get", "http://gtop/0", None))
+        self.assertIsNone(cache.load("get", "http://gtop/1", None))
+        self.assertEqual(cache.stats()["entries"], 3)
+        self.assertEqual(cache.stats()["bytes"], 45)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.close()
+
+
+    def test_stores_keep_a_running_byte_total(self):
+        cache = transport.DiskCache(self.path, max_bytes=45)
+        statements = []
+        cache._connection().set_trace_callback(statements.append)
+        for n in range(5):
+            cache.store("get", "http://gtop/%i" % n, None, self.response)
+        cache.store("get", "http://gtop/4", None, self.response)
+        self.assertFalse([s for s in statements if "SUM(" in s.upper()])
+        self.assertEqual(cache.stats()["bytes"], 45)
+        self.assertEqual(cache.stats()["entries"], 3)
+        cache.expire()
+        cache.clear()
+        self.assertEqual(cache.stats()["bytes"], 0)
+        cache.store("get", "http://gtop/1", None, self.response)
+        restarted = transport.DiskCache(self.path)
+        self.assertEqual(restarted.stats()["bytes"], 15)
+        restarted.close()
+        cache.close()
+
+
+    @patch("time.time")
+    def test_reads_only_write_access_times_occasionally(self, mock_time):
+        mock_time.return_value = 0
+        self.cache.store("get", "http://gtop/1", None, self.response)
+        connection = self.cache._connection()
+        changes = connection.total_changes
+        for now in (1, 30, 59):
+            mock_time.return_value = now
+            self.assertIsNotNone(self.cache.load("get", "http://gtop/1", None))
+        self.assertEqual(connection.total_changes, changes)
+        mock_time.return_value = 61
+        self.cache.load("get", "http://gtop/1", None)
+        self.assertEqual(connection.total_changes, changes + 1)
+
+
+    def test_disk_cache_validation(self):
+        with self.assertRaises(TypeError):
+            transport.DiskCache(self.path, max_bytes="1GB")
+        with self.assertRaises(TypeError):
+            transport.set_disk_cache(self.path)